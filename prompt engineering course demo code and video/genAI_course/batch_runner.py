@@ -0,0 +1,228 @@
+"""Headless batch runner: ask many questions of the data without the chat box.
+
+Reads a JSONL file of questions, runs each through `generate_sql_from_prompt` and
+`execute_sql_query` (concurrently, with the LLM rate-limited) and streams one JSON line
+per question to the output file as soon as it finishes.
+
+    python batch_runner.py questions.jsonl --output results.jsonl --concurrency 8 --rate 2
+
+Input lines look like {"id": "q1", "question": "...", "expected_sql": "..."}; only
+"question" is required. With "expected_sql", both results are compared ("match").
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import llm_client_service
+from utils.llm_client_service import TokenBucket, RateLimitedBackend
+from utils.schema_service import load_schema, default_schema_path
+from utils.schema_retrieval_service import get_schema_index
+from utils.sql_cache_service import normalize_question
+from utils.tracing_service import start_trace
+from utils.talk_to_your_data_service import (
+    materialize_database,
+    connect_database,
+    ThreadConnections,
+    list_tables,
+    data_fingerprint,
+    generate_sql_from_prompt,
+    execute_sql_query,
+    QueryBudget,
+)
+
+
+# ---------------------------
+# 📥 Questions
+# ---------------------------
+def read_questions(path: str) -> list:
+    """Parse the input JSONL (blank lines skipped); each item gets an id if it has none."""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            if not item.get("question"):
+                raise ValueError(f"{path}:{line_number}: missing \"question\"")
+            item.setdefault("id", str(line_number))
+            questions.append(item)
+    return questions
+
+
+def _same_rows(left, right) -> bool:
+    """Compare two results by their rows, ignoring column names and row order."""
+    if left.shape[1] != right.shape[1]:
+        return False
+    return sorted(map(tuple, left.astype(str).values)) == sorted(map(tuple, right.astype(str).values))
+
+
+# ---------------------------
+# 🏃 Batch Runner
+# ---------------------------
+class BatchRunner:
+    """Answer questions against one data folder with shared, warm resources.
+
+    Each worker thread keeps its own read-only connection (the query governor installs
+    per-connection handlers), while the SQL cache, schema index and LLM client are shared.
+    """
+
+    def __init__(self, data_path: str = "data", schema_path: str = None, query_timeout: float = None,
+                 fresh: bool = False):
+        self.schema = load_schema(schema_path) if schema_path else None
+        self.ddl_schema = self.schema.ddl if self.schema else ""
+        self.db_path = materialize_database(data_path, schema=self.schema)
+        self.data_version = data_fingerprint(data_path)
+        conn = connect_database(self.db_path)
+        self.tables = list_tables(conn)
+        self.schema_index = get_schema_index(self.schema, conn, self.data_version) if self.schema else None
+        # --fresh skips cached answers but stores new ones under the real version, so the shared cache stays warm
+        self.fresh = fresh
+        self.query_timeout = query_timeout
+        self.connections = ThreadConnections()
+
+    def _connection(self):
+        return self.connections.get(self.db_path, self.data_version)
+
+    def _budget(self):
+        return QueryBudget(timeout=self.query_timeout) if self.query_timeout else None
+
+    def answer(self, item: dict) -> dict:
+        """Generate and run the SQL for one question (blocking; called on a worker thread)."""
+        question = item["question"]
+        result = {"id": item["id"], "question": question}
+        with start_trace("batch", question=question) as trace:
+            started = time.perf_counter()
+            sql, error = generate_sql_from_prompt(
+                question, self.tables, self.ddl_schema, data_version=self.data_version,
+                schema_index=self.schema_index, use_cache=not self.fresh
+            )
+            generated = time.perf_counter()
+            result["sql"] = sql
+            df = None
+            if not error:
+                df, error = execute_sql_query(sql, self._connection(), budget=self._budget())
+            executed = time.perf_counter()
+            result["error"] = error
+            if df is not None:
+                result.update(rows=len(df), columns=list(df.columns), truncated=bool(df.attrs.get("truncated")))
+            if item.get("expected_sql"):
+                # The reference query runs outside the timings, which cover the model's answer only
+                expected, expected_error = execute_sql_query(item["expected_sql"], self._connection(), budget=self._budget())
+                if expected_error:
+                    result["expected_error"] = expected_error
+                result["match"] = df is not None and expected is not None and _same_rows(df, expected)
+            result["timings_ms"] = {
+                "generate": round((generated - started) * 1000, 2),
+                "execute": round((executed - generated) * 1000, 2),
+                "total": round((executed - started) * 1000, 2),
+            }
+        spans = getattr(trace, "spans", None)
+        if spans:
+            lookups = [s.attrs["cache_hit"] for s in spans if s.name == "sql_cache_lookup"]
+            result["cache_hit"] = bool(lookups and lookups[0])
+        return result
+
+    async def run(self, questions: list, output, concurrency: int = 8, on_result=None) -> list:
+        """Answer all questions, at most `concurrency` at a time; write each result line as it completes.
+
+        Identical questions (after normalization) are asked once; repeats reuse the answer
+        and name the id they were answered by in "duplicate_of".
+        """
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+        semaphore = asyncio.Semaphore(concurrency)
+        first = {}
+        results = []
+
+        async def answer_once(item):
+            async with semaphore:
+                try:
+                    return await loop.run_in_executor(executor, self.answer, item)
+                except Exception as e:
+                    return {"id": item["id"], "question": item["question"], "sql": None, "error": f"{type(e).__name__}: {e}"}
+
+        async def handle(item):
+            key = normalize_question(item["question"])
+            if key in first:
+                original, task = first[key]
+                result = {**await task, "id": item["id"], "question": item["question"], "duplicate_of": original["id"]}
+                if item.get("expected_sql") != original.get("expected_sql"):
+                    result.pop("match", None)  # compared against another expectation
+            else:
+                task = asyncio.ensure_future(answer_once(item))
+                first[key] = (item, task)
+                result = await task
+            output.write(json.dumps(result, default=str) + "\n")
+            output.flush()
+            results.append(result)
+            if on_result:
+                on_result(result)
+            return result
+
+        try:
+            await asyncio.gather(*(handle(item) for item in questions))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+
+def summarize(results: list, elapsed: float) -> str:
+    answered = [r for r in results if "duplicate_of" not in r]
+    totals = sorted(r["timings_ms"]["total"] for r in answered if "timings_ms" in r)
+    errors = sum(1 for r in results if r.get("error"))
+    compared = [r for r in results if "match" in r]
+    lines = [
+        f"{len(results)} questions ({len(results) - len(answered)} duplicates) in {elapsed:.1f}s, {errors} errors",
+    ]
+    if totals:
+        lines.append(f"latency p50={totals[len(totals) // 2]:.0f}ms p95={totals[min(len(totals) - 1, int(len(totals) * 0.95))]:.0f}ms")
+    if compared:
+        lines.append(f"{sum(r['match'] for r in compared)}/{len(compared)} results match expected_sql")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of questions through text-to-SQL headlessly.")
+    parser.add_argument("input", help="JSONL file with one {\"question\": ...} per line")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file the results stream to")
+    parser.add_argument("--data", default="data", help="data folder (as used by the app)")
+    parser.add_argument("--schema", default=None, help="DDL file (default: the first file in schema/)")
+    parser.add_argument("--concurrency", type=int, default=8, help="questions in flight at once")
+    parser.add_argument("--rate", type=float, default=2.0, help="LLM calls per second (0 = unlimited)")
+    parser.add_argument("--burst", type=float, default=None, help="LLM calls allowed at once before --rate applies")
+    parser.add_argument("--query-timeout", type=float, default=None, help="seconds per SQL query")
+    parser.add_argument("--fresh", action="store_true", help="ignore cached SQL and ask the model again")
+    args = parser.parse_args(argv)
+
+    schema_path = args.schema or default_schema_path()
+    if args.rate > 0:
+        bucket = TokenBucket(args.rate, args.burst or args.concurrency)
+        llm_client_service.set_backend(RateLimitedBackend(llm_client_service.get_backend(), bucket))
+
+    questions = read_questions(args.input)
+    runner = BatchRunner(args.data, schema_path, args.query_timeout, args.fresh)
+    started = time.perf_counter()
+    done = []
+
+    def progress(result):
+        done.append(result)
+        status = "error" if result.get("error") else f"{result.get('rows', 0)} rows"
+        print(f"[{len(done)}/{len(questions)}] {result['id']}: {status}", file=sys.stderr)
+
+    with open(args.output, "w", encoding="utf-8") as output:
+        results = asyncio.run(runner.run(questions, output, args.concurrency, on_result=progress))
+    print(summarize(results, time.perf_counter() - started))
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
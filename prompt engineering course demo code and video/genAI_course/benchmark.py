@@ -0,0 +1,357 @@
+"""Offline end-to-end benchmarks for the data generation and talk-to-your-data pipelines.
+
+Runs headless (no Streamlit, no network): the LLM is replaced by a local backend that
+synthesizes schema-valid answers after a configurable latency.
+
+    python benchmark.py --quick
+    python benchmark.py --widths 7,25,50,100 --rows 10,1000,100000,1000000 --output benchmarks/main.json
+    python benchmark.py --quick --compare benchmarks/main.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import llm_client_service
+from utils.llm_client_service import LocalBackend
+from utils.schema_service import parse_ddl, get_schema, dependency_waves
+from utils.bulk_generation_service import generate_bulk_tables, synthesize_chunk
+from utils.data_generation_service import generate_from_ddl, generate_from_ddl_parallel
+from utils.sql_cache_service import sql_cache
+from utils.modification_service import modify_tables
+from utils.validation_service import validate_tables
+from utils.talk_to_your_data_service import (
+    load_csv_data,
+    initialize_database,
+    materialize_database,
+    connect_database,
+    list_tables,
+    generate_sql_from_prompt,
+    execute_sql_query,
+)
+
+BASE_DDL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "company_employee_schema.ddl")
+LLM_ROWS = 8  # rows per table the fake model returns when the prompt does not ask for a count
+
+
+# ---------------------------
+# 🧪 Fake LLM
+# ---------------------------
+def _records(df) -> list:
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+
+def _fenced(prompt: str) -> str:
+    match = re.search(r"```\n?(.*?)```", prompt, re.DOTALL)
+    return match.group(1) if match else ""
+
+
+class FakeModel:
+    """Deterministic stand-in for the Gemini model, answering each prompt kind the app sends."""
+
+    def __init__(self, answers: dict = None, modification_script: str = "", seed: int = 0):
+        self.answers = answers or {}
+        self.modification_script = modification_script
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, prompt: str, config: dict) -> str:
+        if "Generate sample data for this single table" in prompt:
+            return self._table(prompt)
+        if "generate all the tables in a relational database" in prompt:
+            schema = get_schema(_fenced(prompt))
+            rows = {t.name: _records(synthesize_chunk(t, 1, LLM_ROWS, self.rng, null_fraction=0)) for t in schema}
+            return json.dumps(rows)
+        if "valid SQLite SQL query" in prompt:
+            question = re.search(r"Question: (.*)", prompt).group(1).strip()
+            return self.answers.get(question, "SELECT 1")
+        if "You modify the data of a SQLite database" in prompt:
+            return self.modification_script
+        return "{}"
+
+    def _table(self, prompt: str) -> str:
+        table = next(iter(get_schema(_fenced(prompt))))
+        count = re.search(r"Generate exactly (\d+) records", prompt)
+        parent_keys = {
+            (ref_table, ref_column): np.asarray(json.loads(values), dtype=object)
+            for ref_table, ref_column, values in re.findall(r"-> (\w+)\.(\w+): (\[.*\])", prompt)
+        }
+        chunk = synthesize_chunk(table, 1, int(count.group(1)) if count else LLM_ROWS, self.rng,
+                                 parent_keys=parent_keys, null_fraction=0)
+        return json.dumps({table.name: _records(chunk)})
+
+
+# ---------------------------
+# 🏗️ Workloads
+# ---------------------------
+def widen_ddl(ddl: str, n_tables: int) -> str:
+    """Repeat the base schema with renamed copies and keep the first `n_tables` in dependency order."""
+    base = parse_ddl(ddl)
+    copies = [ddl]
+    for k in range(1, -(-n_tables // len(base.tables))):
+        copy = ddl
+        for name in base.tables:
+            copy = re.sub(rf"\b{re.escape(name)}\b", f"{name}_{k}", copy)
+        copies.append(copy)
+    schema = parse_ddl("\n\n".join(copies))
+    ordered = [name for wave in dependency_waves(schema) for name in wave][:n_tables]
+    return "\n\n".join(schema[name].ddl for name in ordered)
+
+
+def _join_queries(schema, limit: int = 5) -> dict:
+    """Question -> SQL: row counts per table and per-parent counts along foreign keys."""
+    queries = {}
+    for table in schema:
+        queries[f"How many rows are in {table.name}?"] = f'SELECT COUNT(*) FROM "{table.name}"'
+        for fk in table.foreign_keys:
+            on = " AND ".join(f'c."{c}" = p."{r}"' for c, r in zip(fk.columns, fk.ref_columns))
+            key = ", ".join(f'p."{r}"' for r in fk.ref_columns)
+            queries[f"How many {table.name} rows per {fk.ref_table}?"] = (
+                f'SELECT {key}, COUNT(*) AS n FROM "{table.name}" c JOIN "{fk.ref_table}" p ON {on} '
+                f"GROUP BY {key} ORDER BY n DESC LIMIT 10"
+            )
+        if len(queries) >= limit:
+            break
+    return queries
+
+
+def _modification_script(schema) -> str:
+    for table in schema:
+        for column in table.columns:
+            if column.base_type in ("VARCHAR", "TEXT", "CHAR") and not column.unique and not column.primary_key:
+                return f'UPDATE "{table.name}" SET "{column.name}" = UPPER("{column.name}");'
+    return ""
+
+
+# ---------------------------
+# 📏 Measurement
+# ---------------------------
+def _current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return 0.0  # Windows: memory is not measured
+    # No /proc (macOS): fall back to the process high-water mark
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class RssSampler:
+    """Track the peak resident set size while a stage runs."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _current_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = _current_rss_mb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss_mb())
+
+
+def measure(results: list, stage: str, fn, repeats: int, tables: int, rows: int, work: int = 1, unit: str = "ops"):
+    """Run `fn` `repeats` times; record p50/p95 latency, throughput (`work` units per run) and peak RSS."""
+    durations = []
+    with RssSampler() as rss:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            fn()
+            durations.append(time.perf_counter() - started)
+    p50, p95 = np.percentile(durations, [50, 95])
+    result = {
+        "stage": stage,
+        "tables": tables,
+        "rows": rows,
+        "repeats": repeats,
+        "p50_ms": round(p50 * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "throughput": round(work / p50, 2) if p50 else None,
+        "unit": f"{unit}/s",
+        "peak_rss_mb": round(rss.peak, 1),
+    }
+    results.append(result)
+    print(f"{stage:<22} tables={tables:<4} rows={rows:<9} p50={result['p50_ms']:>10.2f}ms "
+          f"p95={result['p95_ms']:>10.2f}ms {result['throughput'] or 0:>12,.1f} {result['unit']:<9} "
+          f"rss={result['peak_rss_mb']:.0f}MB", flush=True)
+
+
+# ---------------------------
+# 🚀 Benchmark Run
+# ---------------------------
+def run_width(results, ddl, width, args):
+    """Stages whose cost grows with the schema: DDL parsing, LLM generation, prompt building."""
+    schema = parse_ddl(ddl)
+    measure(results, "parse_ddl", lambda: parse_ddl(ddl), args.repeats, width, 0)
+    measure(results, "generate_single", lambda: json.loads(generate_from_ddl(ddl, "benchmark", 0.5, 1000)),
+            args.repeats, width, LLM_ROWS, work=width * LLM_ROWS, unit="rows")
+    measure(results, "generate_parallel",
+            lambda: list(generate_from_ddl_parallel(ddl, "benchmark", 0.5, 1000, rows_per_table=LLM_ROWS)),
+            args.repeats, width, LLM_ROWS, work=width * LLM_ROWS, unit="rows")
+    return schema
+
+
+def run_rows(results, ddl, schema, width, rows, args, workdir):
+    """Stages whose cost grows with the data: synthesis, loading, querying, modification."""
+    data_dir = os.path.join(workdir, f"data_{width}_{rows}")
+    total = width * rows
+    repeats = args.repeats if total <= 1_000_000 else 1
+
+    measure(results, "bulk_generate", lambda: list(generate_bulk_tables(schema, rows, data_dir, seed=0)),
+            repeats, width, rows, work=total, unit="rows")
+    measure(results, "load_tables", lambda: load_csv_data(data_dir, schema), repeats, width, rows, work=total, unit="rows")
+    tables = load_csv_data(data_dir, schema)
+    measure(results, "validate_tables", lambda: validate_tables(tables, schema), repeats, width, rows,
+            work=total, unit="rows")
+    measure(results, "initialize_database", lambda: initialize_database(tables, schema).close(),
+            repeats, width, rows, work=total, unit="rows")
+
+    db_path = os.path.join(workdir, f"db_{width}_{rows}.sqlite")
+    measure(results, "materialize_database", lambda: materialize_database(data_dir, db_path, schema), 1, width, rows,
+            work=total, unit="rows")
+    conn = connect_database(db_path)
+    table_names = list_tables(conn)
+    queries = _join_queries(schema)
+    llm_client_service.get_backend().responder.answers = queries
+
+    def ask_all(use_cache: bool):
+        for question, _ in queries.items():
+            if not use_cache:
+                sql_cache.clear()
+            sql, error = generate_sql_from_prompt(question, table_names, ddl, data_version=f"{width}:{rows}")
+            if error:
+                raise RuntimeError(error)
+            _, error = execute_sql_query(sql, conn)
+            if error:
+                raise RuntimeError(error)
+
+    measure(results, "ask_uncached", lambda: ask_all(False), repeats, width, rows, work=len(queries), unit="questions")
+    ask_all(True)  # warm the cache with every question
+    measure(results, "ask_cached", lambda: ask_all(True), repeats, width, rows, work=len(queries), unit="questions")
+    conn.close()
+
+    if total <= args.max_modify_rows:
+        llm_client_service.get_backend().responder.modification_script = _modification_script(schema)
+        measure(results, "modify_all_tables", lambda: modify_tables(tables, "upper-case names", ddl, schema),
+                1, width, rows, work=total, unit="rows")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results: list, baseline_path: str, tolerance: float) -> list:
+    """Print p50 changes against a saved baseline; return the stages that got slower than `tolerance`."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["stage"], r["tables"], r["rows"]): r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        old = baseline.get((result["stage"], result["tables"], result["rows"]))
+        if not old or not old["p50_ms"]:
+            continue
+        change = result["p50_ms"] / old["p50_ms"] - 1
+        slower = change > tolerance and result["p50_ms"] - old["p50_ms"] > 1.0
+        flag = "  <-- regression" if slower else ""
+        print(f"{result['stage']:<22} tables={result['tables']:<4} rows={result['rows']:<9} "
+              f"{old['p50_ms']:>10.2f}ms -> {result['p50_ms']:>10.2f}ms ({change:+.0%}){flag}")
+        if slower:
+            regressions.append(result)
+    return regressions
+
+
+def _int_list(text: str) -> list:
+    return [int(value.replace("_", "")) for value in text.split(",") if value.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks with a fake LLM backend.")
+    parser.add_argument("--ddl", default=BASE_DDL, help="base DDL schema (widened by copying for larger widths)")
+    parser.add_argument("--widths", default="7,25,50,100", help="number of tables to sweep")
+    parser.add_argument("--rows", default="10,1000,100000", help="rows per table to sweep (up to 10000000)")
+    parser.add_argument("--max-total-rows", type=int, default=20_000_000, help="skip width x rows cells above this")
+    parser.add_argument("--max-modify-rows", type=int, default=2_000_000, help="skip Modify All Tables above this")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM call")
+    parser.add_argument("--quick", action="store_true", help="widths 7,25 / rows 10,1000 / 3 repeats")
+    parser.add_argument("--output", default=None, help="where to save the JSON results")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare p50 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown before flagging")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.widths, args.rows, args.repeats = "7,25", "10,1000", 3
+
+    with open(args.ddl, encoding="utf-8") as f:
+        base_ddl = f.read()
+    llm_client_service.set_backend(LocalBackend(FakeModel(), latency=args.llm_latency))
+
+    results = []
+    started = time.time()
+    with tempfile.TemporaryDirectory(prefix="genai-bench-") as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)  # caches and the shared SQLite file use relative paths
+        try:
+            for width in _int_list(args.widths):
+                ddl = widen_ddl(base_ddl, width)
+                schema = run_width(results, ddl, width, args)
+                for rows in _int_list(args.rows):
+                    if width * rows > args.max_total_rows:
+                        print(f"skipping tables={width} rows={rows} (over --max-total-rows)")
+                        continue
+                    run_rows(results, ddl, schema, width, rows, args, workdir)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "duration_s": round(time.time() - started, 1),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "llm_latency_s": args.llm_latency,
+            "repeats": args.repeats,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join("benchmarks", f"benchmark-{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {len(results)} results to {output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
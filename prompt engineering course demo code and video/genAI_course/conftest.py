@@ -0,0 +1 @@
+# Makes `utils` importable for the tests in tests/ (run `python -m pytest` from this folder)
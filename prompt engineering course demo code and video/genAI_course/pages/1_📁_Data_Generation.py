@@ -1,9 +1,14 @@
 import streamlit as st
 import time
 import pandas as pd
-import json
 import os
-from utils.data_generation_service import generate_from_ddl
+from utils.data_generation_service import generate_from_ddl_stream, generate_from_ddl_parallel
+from utils.bulk_generation_service import generate_bulk_tables, seed_vocabularies
+from utils.schema_service import get_schema, default_schema_path
+from utils.modification_service import generate_modification_script, apply_modification_script
+from utils.validation_service import repair_tables
+from utils.storage_service import list_tables, read_table, read_preview, write_table, export_csv, PREVIEW_ROWS
+from utils.tracing_service import start_trace, span, show_performance, TRACING_ENABLED
 
 
 st.set_page_config(page_title="Data Generation", layout="wide")
@@ -25,32 +30,86 @@ col1, col2 = st.columns(2)
 with col1: input_temperature = st.slider("Temperature", min_value=0.1, max_value=1.0, value=0.5)
 with col2: input_max_tokens = st.number_input("Max tokens (maximum 2000)", min_value=10, max_value=2000, value=1000)
 
+BULK_MODE = "Bulk (local synthesizer)"
+col3, col4 = st.columns(2)
+with col3: generation_mode = st.radio("Generation mode", ["Parallel (per table)", "Single response", BULK_MODE], horizontal=True)
+with col4:
+	if generation_mode == BULK_MODE:
+		input_rows_per_table = st.number_input("Target rows per table", min_value=1, max_value=10_000_000, value=100_000, step=10_000)
+		seed_with_llm = st.checkbox("Seed value vocabularies (job titles, industries...) with the LLM", value=False)
+	else:
+		input_rows_per_table = st.number_input("Records per table (0 = let the prompt decide)", min_value=0, max_value=500, value=0)
 
-# --- CSV Table and Dropdown UI ---
+
+# --- Table and Dropdown UI ---
 data_dir = "data"
 os.makedirs(data_dir, exist_ok=True)
-csv_files = [f for f in os.listdir(data_dir) if f.endswith(".csv")]
+
 
 # --- Gemini Generation ---
-if st.button("Generate Data", type="secondary", key="generate_button") and input_ddl_content and input_prompt:
-	result = generate_from_ddl(
-		ddl_content=input_ddl_content,
-		user_prompt=input_prompt,
-		temperature=input_temperature,
-		max_tokens=int(input_max_tokens)
-	)
-	# Try to parse the result as JSON and store as DataFrames in session_state
-	try:
-		response_json = json.loads(result)
-		# Save new tables as CSV files
-		for name, rows in response_json.items():
-			df = pd.DataFrame(rows)
-			file_path = os.path.join(data_dir, f"{name}.csv")
-			df.to_csv(file_path, index=False)
+generate_clicked = st.button("Generate Data", type="secondary", key="generate_button")
+if generate_clicked and input_ddl_content and (input_prompt or generation_mode == BULK_MODE):
+	st.session_state["generation_fixes"] = []
+	with start_trace("generate", mode=generation_mode) as trace:
+		# Save each table as soon as its records are complete
+		saved_tables = []
+		with st.status("Generating tables...", expanded=True) as generation_status:
+			try:
+				if generation_mode == BULK_MODE:
+					# NumPy synthesizer driven by the DDL; the LLM only seeds small value vocabularies
+					schema = get_schema(input_ddl_content)
+					vocabularies = seed_vocabularies(schema, input_prompt) if seed_with_llm else {}
+					for name, total in generate_bulk_tables(schema, int(input_rows_per_table), data_dir, vocabularies):
+						saved_tables.append(name)
+						st.write(f"✅ `{name}` saved ({total:,} rows)")
+					table_stream = []
+				elif generation_mode == "Parallel (per table)":
+					# One call per table in FK dependency order; independent tables run concurrently
+					table_stream = generate_from_ddl_parallel(
+						ddl_content=input_ddl_content,
+						user_prompt=input_prompt,
+						temperature=input_temperature,
+						max_tokens=int(input_max_tokens),
+						rows_per_table=int(input_rows_per_table) or None
+					)
+				else:
+					table_stream = generate_from_ddl_stream(
+						ddl_content=input_ddl_content,
+						user_prompt=input_prompt,
+						temperature=input_temperature,
+						max_tokens=int(input_max_tokens)
+					)
+				generated = {}
+				for name, rows in table_stream:
+					df = generated[name] = pd.DataFrame(rows)
+					with span("save_table", table=name, rows=len(df)):
+						write_table(data_dir, name, df)
+					saved_tables.append(name)
+					st.write(f"✅ `{name}` saved ({len(df)} rows)")
+					st.dataframe(df.head(), hide_index=True)
+				if generated:
+					# Check the model's rows against the DDL (keys, FKs, ENUMs, CHECKs) and fix them locally
+					repaired, fixes = repair_tables(generated, get_schema(input_ddl_content))
+					for name in sorted({fix.table for fix in fixes}):
+						with span("save_table", table=name, rows=len(repaired[name]), repaired=True):
+							write_table(data_dir, name, repaired[name])
+					st.session_state["generation_fixes"] = [str(fix) for fix in fixes]
+				generation_status.update(label="All tables generated", state="complete")
+				generation_ok = True
+			except Exception as e:
+				generation_status.update(label="Generation stopped early", state="error")
+				kept = f" Tables already saved: {', '.join(saved_tables)}." if saved_tables else ""
+				st.error(f"Failed to parse Gemini output as JSON or save CSV: {e}.{kept}")
+				generation_ok = False
+	if TRACING_ENABLED:
+		st.session_state["generation_trace"] = trace.to_dict()
+	if generation_ok:
 		st.success("✅ All tables saved successfully to the 'data' folder!")
 		st.rerun()  # Refresh to show new files in dropdown and preview
-	except Exception as e:
-		st.error(f"Failed to parse Gemini output as JSON or save CSV: {e}")
+for fix in st.session_state.get("generation_fixes", []):
+	st.write(f"🩹 {fix}")
+if st.session_state.get("generation_trace"):
+	show_performance(st.session_state["generation_trace"])
 
 
 
@@ -59,21 +118,15 @@ st.divider()
 # ---------------------------------
 
 
-# If there are CSV files, load them into DataFrames
-csv_tables = {}
-for f in csv_files:
-	try:
-		df = pd.read_csv(os.path.join(data_dir, f))
-		csv_tables[f] = df
-	except Exception: pass
+# Only the selected table is read, and only its first rows (memory-mapped Arrow, no full parse)
+raw_table_names = list_tables(data_dir)
 
 
-# Show only table names (no .csv extension) in dropdown, formatted for readability
+# Show only table names in dropdown, formatted for readability
 def format_table_name(name):
 	return name.replace('_', ' ').title()
-raw_table_names = [f[:-4] if f.endswith('.csv') else f for f in csv_files]
 table_names = [format_table_name(n) for n in raw_table_names]
-table_name_to_file = {format_table_name(n): f for n, f in zip(raw_table_names, csv_files)}
+table_name_to_raw = {format_table_name(n): n for n in raw_table_names}
 
 col_left, col_right = st.columns([3, 1])
 with col_left:
@@ -82,12 +135,28 @@ with col_right:
     selected_table_name = st.selectbox("Select Table", options=table_names, index=0 if table_names else None, key="csv_selector")
 
 if selected_table_name:
-    selected_csv = table_name_to_file[selected_table_name]
-    df_to_display = csv_tables[selected_csv]
-    def sophisticated_header(col):
-        return col.replace('_', ' ').title()
-    df_display = df_to_display.rename(columns={col: sophisticated_header(col) for col in df_to_display.columns})
-    st.dataframe(df_display, hide_index=True)
+    selected_table = table_name_to_raw[selected_table_name]
+    try:
+        df_to_display, total_rows = read_preview(data_dir, selected_table)
+    except Exception as e:
+        df_to_display, total_rows = None, 0
+        st.error(f"Could not read `{selected_table}`: {e}")
+    if df_to_display is not None:
+        def sophisticated_header(col):
+            return col.replace('_', ' ').title()
+        df_display = df_to_display.rename(columns={col: sophisticated_header(col) for col in df_to_display.columns})
+        st.dataframe(df_display, hide_index=True)
+        shown = f"first {PREVIEW_ROWS:,} of " if total_rows > PREVIEW_ROWS else ""
+        st.caption(f"Showing {shown}{total_rows:,} rows")
+        # CSV is only exported on request, so large tables are not re-read on every rerun
+        if st.button("Prepare CSV download", key="prepare_csv"):
+            st.download_button(
+                "Download CSV",
+                data=export_csv(data_dir, selected_table),
+                file_name=f"{selected_table}.csv",
+                mime="text/csv",
+                on_click="ignore",
+            )
 else:
     st.info("No table is present to preview.")
 
@@ -118,39 +187,56 @@ else:
 	with col_mod_btn:
 		mod_clicked = st.button("Modify All Tables", key="modify_all_button")
 	if mod_clicked and mod_prompt:
-		# Prepare all tables' data as JSON
-		all_tables_data = {k[:-4] if k.endswith('.csv') else k: v.to_dict(orient="records") for k, v in csv_tables.items()}
-		try:
-			mod_result = generate_from_ddl(
-				ddl_content=json.dumps(all_tables_data),
-				user_prompt=mod_prompt,
-				temperature=input_temperature,
-				max_tokens=int(input_max_tokens)
-			)
-			mod_json = json.loads(mod_result)
-			if not isinstance(mod_json, dict):
-				raise ValueError("LLM output is not a dict of tables. Raw output: " + str(mod_json))
-			# Save each table
-			for name, rows in mod_json.items():
-				if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
-					raise ValueError(f"Table '{name}' is not a list of records. Raw: {rows}")
-				# Optionally, check all dicts have the same keys
-				keys = [set(row.keys()) for row in rows]
-				if len(set(map(frozenset, keys))) > 1:
-					raise ValueError(f"Not all records in table '{name}' have the same columns. Raw: {rows}")
-				df_mod = pd.DataFrame(rows)
-				file_path = os.path.join(data_dir, f"{name}.csv")
-				df_mod.to_csv(file_path, index=False)
-			st.session_state['mod_success'] = True
-			st.session_state['mod_error'] = ''
+		# Send only the schema and a few sample rows; the model returns a SQL transform script
+		# that runs locally over the full tables, and only the tables it changed are rewritten
+		mod_ddl, schema_path = input_ddl_content, default_schema_path()
+		if not mod_ddl and schema_path:
+			with open(schema_path, "r", encoding="utf-8") as f:
+				mod_ddl = f.read()
+		with start_trace("modify", prompt=mod_prompt) as trace:
+			try:
+				mod_schema = get_schema(mod_ddl) if mod_ddl else None
+				with span("load_tables", tables=len(raw_table_names)):
+					all_tables_data = {
+						name: read_table(data_dir, name, table=mod_schema.find(name) if mod_schema else None)
+						for name in raw_table_names
+					}
+				mod_script = generate_modification_script(all_tables_data, user_prompt=mod_prompt, ddl_schema=mod_ddl or "")
+				changed_tables = apply_modification_script(
+					all_tables_data,
+					mod_script,
+					schema=mod_schema
+				)
+				if not changed_tables:
+					raise ValueError("The script ran but did not change any table.")
+				mod_fixes = []
+				if mod_schema:
+					# The script may break constraints (e.g. delete parents); repair them before saving
+					repaired, mod_fixes = repair_tables({**all_tables_data, **changed_tables}, mod_schema)
+					touched = set(changed_tables) | {fix.table for fix in mod_fixes}
+					changed_tables = {name: repaired[name] for name in touched}
+				with span("save_tables", tables=len(changed_tables)):
+					for name, df_mod in changed_tables.items():
+						write_table(data_dir, name, df_mod)
+				st.session_state['mod_success'] = True
+				st.session_state['mod_changed'] = sorted(changed_tables)
+				st.session_state['mod_fixes'] = [str(fix) for fix in mod_fixes]
+				st.session_state['mod_error'] = ''
+			except Exception as e:
+				st.session_state['mod_success'] = False
+				st.session_state['mod_error'] = f"Failed to modify tables: {e}\nGenerated script: {mod_script if 'mod_script' in locals() else ''}"
+		if TRACING_ENABLED:
+			st.session_state["mod_trace"] = trace.to_dict()
+		if st.session_state['mod_success']:
 			st.rerun()
-		except Exception as e:
-			st.session_state['mod_success'] = False
-			st.session_state['mod_error'] = f"Failed to modify tables: {e}\nRaw LLM output: {mod_result if 'mod_result' in locals() else ''}"
+	if st.session_state.get("mod_trace"):
+		show_performance(st.session_state["mod_trace"])
 	with col_mod_msg:
 		if st.session_state.get('mod_success'):
 			# Show success message for 10 seconds, then rerun
-			st.success("✅ All tables modified and saved!")
+			st.success(f"✅ Modified and saved: {', '.join(st.session_state.get('mod_changed', []))}")
+			for fix in st.session_state.get('mod_fixes', []):
+				st.write(f"🩹 {fix}")
 			time.sleep(10)
 			st.session_state['mod_success'] = False
 			st.rerun()
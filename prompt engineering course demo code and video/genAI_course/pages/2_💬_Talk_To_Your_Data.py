@@ -1,14 +1,29 @@
 import streamlit as st
-import pandas as pd
 import os
+import tempfile
+import time
+from concurrent.futures import wait
+from utils.sql_cache_service import sql_cache
+from utils.schema_service import load_schema, default_schema_path
+from utils.schema_retrieval_service import get_schema_index
+from utils.table_registry_service import get_registry
+from utils.tracing_service import start_trace, span, show_performance, prometheus_text, TRACING_ENABLED
 from utils.talk_to_your_data_service import (
-    initialize_database,
-    load_csv_data,
+    materialize_database,
+    connect_database,
+    list_tables,
+    data_fingerprint,
     generate_sql_from_prompt,
     execute_sql_query,
+    fetch_page,
+    count_rows,
+    export_query,
+    PAGE_SIZE,
+    QueryBudget,
+    submit_query,
     detect_visualization_request,
-    plot_result
 )
+from utils.visualization_service import build_chart
 
 # ---------------------------
 # 🎯 Page Setup
@@ -19,30 +34,41 @@ st.markdown("## Talk to your data:")
 # ---------------------------
 # ⚙️ Load CSVs from data/
 # ---------------------------
-if "tables" not in st.session_state:
-    st.session_state["tables"] = {}
-
-if not st.session_state["tables"]:
-    data_path = "data"
-    if not os.path.exists(data_path):
-        st.error("No data found! Please generate data first.")
-        st.stop()
-
-    st.session_state["tables"] = load_csv_data(data_path)
-    st.success(f"Loaded {len(st.session_state['tables'])} tables from `data` directory")
-
+data_path = "data"
+if not os.path.exists(data_path):
+    st.error("No data found! Please generate data first.")
+    st.stop()
 
-# Read DDL schema from schema/ folder if present
-schema_dir = "schema"
-ddl_files = [f for f in os.listdir(schema_dir)] if os.path.exists(schema_dir) else []
+# Read DDL schema from schema/ folder if present (parsed once per distinct file content)
+schema_path = default_schema_path()
 ddl_schema = ""
-if ddl_files:
-    ddl_path = os.path.join(schema_dir, ddl_files[0])
-    with open(ddl_path, "r", encoding="utf-8") as f:
-        ddl_schema = f.read()
-
-# Create SQLite in-memory database
-conn = initialize_database(st.session_state["tables"])
+schema = None
+if schema_path:
+    schema = load_schema(schema_path)
+    ddl_schema = schema.ddl
+
+# Shared on-disk SQLite file: built once for all sessions, rebuilt only when data/ or the DDL changes
+db_path = materialize_database(data_path, schema=schema)
+conn = connect_database(db_path)
+data_version = data_fingerprint(data_path)
+
+# Relevance index used to send only the tables a question needs (built once per schema/data version)
+schema_index = get_schema_index(schema, conn, data_version) if schema else None
+
+# The table list is re-read every run (cheap), so regenerated or modified data is never missed;
+# the registry's version tells this session whether other pages or processes changed the data
+registry = get_registry(data_path)
+if "tables" not in st.session_state:
+    st.session_state["tables"] = []
+first_load = not st.session_state["tables"]
+st.session_state["tables"] = list_tables(conn)
+if first_load:
+    st.success(f"Loaded {len(st.session_state['tables'])} tables from `data` directory")
+elif st.session_state.get("data_registry_version") not in (None, registry.version):
+    changed, removed = registry.last_changes
+    details = ", ".join([*(f"`{name}` reloaded" for name in sorted(changed)), *(f"`{name}` removed" for name in sorted(removed))])
+    st.toast(f"🔄 Data changed: {details or 'tables reloaded'}")
+st.session_state["data_registry_version"] = registry.version
 
 # ---------------------------
 # 💬 Chat UI
@@ -55,9 +81,11 @@ if "chat_history" not in st.session_state:
 for msg in st.session_state["chat_history"]:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
+        if msg.get("trace"):
+            show_performance(msg["trace"])
 
 # Only show chat input if both a DDL file and at least one CSV file exist
-ddl_exists = bool(ddl_files)
+ddl_exists = schema_path is not None
 csv_exists = bool(st.session_state["tables"])
 if ddl_exists and csv_exists:
     prompt = st.chat_input("Ask a question about your data...")
@@ -78,32 +106,128 @@ if prompt:
     st.chat_message("user").markdown(prompt)
     st.session_state["chat_history"].append({"role": "user", "content": prompt})
 
-    with st.chat_message("assistant"):
-        with st.spinner("Analyzing your data..."):
-            sql_query, error = generate_sql_from_prompt(prompt, st.session_state["tables"], ddl_schema=ddl_schema)
-
-            if error:
-                st.error(error)
-                st.session_state["chat_history"].append({"role": "assistant", "content": f"❌ {error}"})
-            else:
-                st.code(sql_query, language="sql")
+    with start_trace("chat", question=prompt) as trace:
+        with st.chat_message("assistant"):
+            with st.spinner("Analyzing your data..."):
+                generation_info = {}
+                sql_query, error = generate_sql_from_prompt(
+                    prompt, st.session_state["tables"], ddl_schema=ddl_schema, data_version=data_version,
+                    schema_index=schema_index, info=generation_info
+                )
+                selection = generation_info.get("schema_selection")
+                if selection is not None and selection.pruned:
+                    st.caption(
+                        f"🔎 Prompt schema pruned to {len(selection.tables)} of {len(schema.tables)} tables "
+                        f"({selection.reduction:.0%} less schema text): {', '.join(selection.tables)}"
+                    )
 
-                result_df, error = execute_sql_query(sql_query, conn)
                 if error:
                     st.error(error)
                     st.session_state["chat_history"].append({"role": "assistant", "content": f"❌ {error}"})
                 else:
-                    st.dataframe(result_df.head(), hide_index=True)
-
-                    # Save in chat history
-                    chat_text = f"```sql\n{sql_query}\n```\n\n{result_df.head().to_markdown(index=False)}"
-                    st.session_state["chat_history"].append({"role": "assistant", "content": chat_text})
-
-                    # Plot if relevant
-                    if detect_visualization_request(prompt):
-                        st.write("📊 Visualization")
-                        fig = plot_result(result_df)
-                        if fig:
-                            st.pyplot(fig)
-                        else:
-                            st.info("Not enough numeric columns to plot.")
+                    st.code(sql_query, language="sql")
+
+                    # Run on the query pool under a time/VM-step budget. Any interaction with the page
+                    # (e.g. the cancel button) reruns the script, which cancels the query in `finally`.
+                    budget = QueryBudget()
+                    future = submit_query(execute_sql_query, sql_query, conn, budget=budget)
+                    progress, cancel_slot = st.empty(), st.empty()
+                    cancel_slot.button("Cancel query", key="cancel_query")
+                    started = time.monotonic()
+                    try:
+                        while not wait([future], timeout=0.25).done:
+                            progress.caption(f"⏳ Running query... {time.monotonic() - started:.1f}s")
+                    finally:
+                        if not future.done():
+                            budget.cancel()
+                    progress.empty()
+                    cancel_slot.empty()
+                    result_df, error = future.result()
+                    if error:
+                        st.error(error)
+                        st.session_state["chat_history"].append({"role": "assistant", "content": f"❌ {error}"})
+                    else:
+                        for warning in result_df.attrs.get("warnings", []):
+                            st.warning(f"⚠️ Expensive plan: {warning}")
+                        with span("render_table"):
+                            st.dataframe(result_df.head(), hide_index=True)
+                        if result_df.attrs.get("truncated"):
+                            st.caption(f"Result capped at {len(result_df):,} rows — browse or export the full result below.")
+                        st.session_state["last_query"] = sql_query
+
+                        # Save in chat history
+                        with span("to_markdown"):
+                            chat_text = f"```sql\n{sql_query}\n```\n\n{result_df.head().to_markdown(index=False)}"
+                        st.session_state["chat_history"].append({"role": "assistant", "content": chat_text})
+
+                        # Plot if relevant
+                        if detect_visualization_request(prompt):
+                            st.write("📊 Visualization")
+                            # Grouping/binning/sampling runs in SQLite over the full result; the
+                            # browser only receives the few hundred points it draws
+                            try:
+                                chart, chart_note = build_chart(sql_query, conn, result_df, data_version)
+                            except Exception as e:
+                                chart, chart_note = None, f"Could not build a chart: {e}"
+                            if chart:
+                                with span("render_chart"):
+                                    st.vega_lite_chart(spec=chart)
+                                if chart_note:
+                                    st.caption(chart_note)
+                            else:
+                                st.info(chart_note)
+            performance_slot = st.empty()
+
+    # Keep the timings with the answer, so they can be reopened from the history
+    if TRACING_ENABLED and st.session_state["chat_history"][-1]["role"] == "assistant":
+        st.session_state["chat_history"][-1]["trace"] = trace.to_dict()
+        with performance_slot.container():
+            show_performance(st.session_state["chat_history"][-1]["trace"])
+
+# ---------------------------
+# 📄 Browse / Export Last Result
+# ---------------------------
+# Pages are fetched with LIMIT/OFFSET on demand, so memory stays bounded by one page
+last_query = st.session_state.get("last_query")
+if last_query:
+    with st.expander("Browse full result"):
+        page = st.number_input("Page", min_value=1, value=1, step=1, key="result_page")
+        try:
+            st.dataframe(fetch_page(last_query, conn, page - 1, PAGE_SIZE), hide_index=True)
+        except Exception as e:
+            st.error(f"SQL Execution Error: {e}")
+
+        col_count, col_format, col_export = st.columns([1, 1, 1])
+        with col_count:
+            if st.button("Count rows", key="count_rows"):
+                try:
+                    st.caption(f"{count_rows(last_query, conn):,} rows total")
+                except Exception as e:
+                    st.error(f"SQL Execution Error: {e}")
+        with col_format:
+            export_format = st.radio("Export format", ["csv", "parquet"], horizontal=True, key="export_format")
+        with col_export:
+            if st.button("Prepare export", key="prepare_export"):
+                # Rows stream from the cursor to a temporary file; the download button then
+                # reads that file once, instead of a second in-memory copy of the whole export
+                with tempfile.TemporaryDirectory() as export_dir:
+                    export_path = os.path.join(export_dir, f"result.{export_format}")
+                    try:
+                        with open(export_path, "wb") as export_file:
+                            exported = export_query(last_query, conn, export_file, export_format)
+                        with open(export_path, "rb") as export_file:
+                            st.download_button(
+                                f"Download {exported:,} rows",
+                                data=export_file,
+                                file_name=f"result.{export_format}",
+                                mime="text/csv" if export_format == "csv" else "application/octet-stream",
+                                on_click="ignore",
+                            )
+                    except Exception as e:
+                        st.error(f"SQL Execution Error: {e}")
+
+cache_stats = sql_cache.stats()
+st.sidebar.caption(f"SQL cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+if TRACING_ENABLED:
+    with st.sidebar.expander("📈 Metrics"):
+        st.code(prometheus_text(), language="text")
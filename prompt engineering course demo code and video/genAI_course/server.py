@@ -0,0 +1,350 @@
+"""Local HTTP service for "talk to your data" (tornado), for tools that are not a browser session.
+
+    python server.py --port 8765
+    curl -s localhost:8765/ask -d '{"question": "How many employees per department?"}'
+
+Endpoints (JSON in, JSON out):
+    POST /ask       {"question": ..., "execute": true, "max_rows": 1000}
+    POST /sql       {"sql": ..., "max_rows": 1000}
+    POST /generate  {"prompt": ..., "mode": "parallel" | "bulk", "rows_per_table": 10, "ddl": optional}
+                    (replies with the saved tables and the constraint fixes applied to them)
+    GET  /tables, /health, /metrics (Prometheus text)
+
+Concurrent identical requests are coalesced: ten callers asking the same question at once
+share one LLM call and one query. Try it offline with `--local-response "SELECT ..."`.
+"""
+import os
+import sys
+import json
+import asyncio
+import hashlib
+import argparse
+import threading
+import contextvars
+from contextlib import closing
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import tornado.web
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import llm_client_service
+from utils.llm_client_service import LocalBackend, LLM_MAX_CONCURRENCY
+from utils.schema_service import load_schema, get_schema, default_schema_path
+from utils.schema_retrieval_service import get_schema_index
+from utils.sql_cache_service import normalize_question
+from utils.table_registry_service import get_registry
+from utils.storage_service import write_table as save_table
+from utils.data_generation_service import agenerate_tables
+from utils.bulk_generation_service import generate_bulk_tables
+from utils.validation_service import repair_tables
+from utils.tracing_service import start_trace, increment, prometheus_text
+from utils.talk_to_your_data_service import (
+    materialize_database,
+    connect_database,
+    ThreadConnections,
+    list_tables,
+    data_fingerprint,
+    generate_sql_from_prompt,
+    execute_sql_query,
+    clean_sql,
+    submit_query,
+    ROW_CAP,
+)
+
+DEFAULT_PORT = int(os.getenv("TTYD_SERVER_PORT", "8765"))
+DEFAULT_MAX_ROWS = 1000
+
+
+# ---------------------------
+# 🔀 Single-Flight Coalescing
+# ---------------------------
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers with the same key await the same result."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        """Return `(result, shared)`; `shared` is True when another caller's call was reused."""
+        future = self._calls.get(key)
+        if future is not None:
+            increment("http_coalesced_total", kind=key[0])
+            return await asyncio.shield(future), True
+        future = asyncio.ensure_future(fn())
+        self._calls[key] = future
+        future.add_done_callback(lambda _: self._calls.pop(key, None))
+        # Shielded, so a caller that disconnects does not cancel the work others are waiting on
+        return await asyncio.shield(future), False
+
+
+def _frame_json(df) -> dict:
+    payload = json.loads(df.to_json(orient="split", index=False, date_format="iso"))
+    return {"columns": payload["columns"], "rows": payload["data"], "truncated": bool(df.attrs.get("truncated")),
+            "warnings": df.attrs.get("warnings", [])}
+
+
+# ---------------------------
+# 🗄️ Shared Service State
+# ---------------------------
+@dataclass(frozen=True)
+class DataState:
+    """Everything built from one version of data/; replaced as a whole so requests never mix versions."""
+
+    db_path: str
+    data_version: str
+    tables: list
+    schema_index: object
+    registry_version: int
+
+
+class QueryService:
+    """One warm query database, schema index and LLM client shared by every caller.
+
+    The database is re-materialized when the table registry reports changed data; each
+    query thread keeps a read-only connection to the current file.
+    """
+
+    def __init__(self, data_path: str = "data", schema_path: str = None):
+        self.data_path = data_path
+        self.schema = load_schema(schema_path) if schema_path else None
+        self.registry = get_registry(data_path)
+        self.flights = SingleFlight()
+        self.llm_pool = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+        self.connections = ThreadConnections()
+        self._state_lock = threading.Lock()
+        self.state = None
+        self.refresh()
+
+    def refresh(self) -> DataState:
+        """Bring the query database up to date with data/ (blocking) and swap in the new state."""
+        version = self.registry.version
+        db_path = materialize_database(self.data_path, schema=self.schema)
+        data_version = data_fingerprint(self.data_path)
+        with closing(connect_database(db_path)) as conn:
+            tables = list_tables(conn)
+            schema_index = get_schema_index(self.schema, conn, data_version) if self.schema else None
+        state = DataState(db_path, data_version, tables, schema_index, version)
+        with self._state_lock:
+            # A slower refresh of an older version must not replace a newer one
+            if self.state is None or state.registry_version >= self.state.registry_version:
+                self.state = state
+            return self.state
+
+    async def ensure_fresh(self) -> DataState:
+        """The current state, refreshed first when data/ changed."""
+        loop = asyncio.get_running_loop()
+        if not self.registry.watching:
+            # No file watcher (unsupported or read-only filesystem): rescan on access instead
+            await loop.run_in_executor(None, self.registry.scan)
+        version = self.registry.version
+        if version != self.state.registry_version:
+            await self.flights.do(("refresh", version), lambda: loop.run_in_executor(None, self.refresh))
+        return self.state
+
+    def _execute(self, sql: str, max_rows: int, state: DataState):
+        conn = self.connections.get(state.db_path, state.data_version)
+        return execute_sql_query(sql, conn, max_rows=max_rows)
+
+    async def execute(self, sql: str, max_rows: int, state: DataState):
+        return await asyncio.wrap_future(submit_query(self._execute, sql, max_rows, state))
+
+    async def generate_sql(self, question: str, state: DataState):
+        loop = asyncio.get_running_loop()
+        # Run in a copy of this request's context so the LLM spans join its trace
+        return await loop.run_in_executor(
+            self.llm_pool,
+            contextvars.copy_context().run,
+            lambda: generate_sql_from_prompt(question, state.tables, self.schema.ddl if self.schema else "",
+                                             data_version=state.data_version, schema_index=state.schema_index),
+        )
+
+    # --- endpoint logic (coalesced by the handlers) ---
+    async def ask(self, question: str, execute: bool, max_rows: int, state: DataState) -> tuple:
+        with start_trace("http_ask", question=question):
+            sql, error = await self.generate_sql(question, state)
+            if error or not execute:
+                return (422 if error else 200), {"question": question, "sql": sql, "error": error}
+            df, error = await self.execute(sql, max_rows, state)
+            if error:
+                return 422, {"question": question, "sql": sql, "error": error}
+            return 200, {"question": question, "sql": sql, "error": None, **_frame_json(df)}
+
+    async def run_sql(self, sql: str, max_rows: int, state: DataState) -> tuple:
+        with start_trace("http_sql"):
+            df, error = await self.execute(sql, max_rows, state)
+            if error:
+                return 422, {"sql": sql, "error": error}
+            return 200, {"sql": sql, "error": None, **_frame_json(df)}
+
+    async def generate(self, prompt: str, ddl: str, mode: str, rows_per_table: int) -> tuple:
+        loop = asyncio.get_running_loop()
+        saved, repairs = {}, []
+        with start_trace("http_generate", mode=mode):
+            if mode == "bulk":
+                generated = await loop.run_in_executor(
+                    None, lambda: list(generate_bulk_tables(get_schema(ddl), rows_per_table or 1000, self.data_path)))
+                saved.update(generated)
+            else:
+                generated = {}
+                async for name, rows in agenerate_tables(ddl, prompt, rows_per_table or None):
+                    generated[name] = pd.DataFrame(rows)
+                    await loop.run_in_executor(None, save_table, self.data_path, name, generated[name])
+                    saved[name] = len(rows)
+                # Rows breaking the DDL's constraints are fixed locally, then re-saved
+                repaired, fixes = await loop.run_in_executor(
+                    None, contextvars.copy_context().run, repair_tables, generated, get_schema(ddl))
+                for name in {fix.table for fix in fixes}:
+                    await loop.run_in_executor(None, save_table, self.data_path, name, repaired[name])
+                    saved[name] = len(repaired[name])
+                repairs = [str(fix) for fix in fixes]
+        # Hashing the data folder is blocking work too; keep it off the event loop
+        await loop.run_in_executor(None, self.registry.scan)
+        return 200, {"tables": saved, "repairs": repairs}
+
+
+# ---------------------------
+# 🌐 HTTP Handlers
+# ---------------------------
+class JSONHandler(tornado.web.RequestHandler):
+    def initialize(self, service: QueryService):
+        self.service = service
+
+    def json_body(self) -> dict:
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except json.JSONDecodeError:
+            raise tornado.web.HTTPError(400, reason="Body must be JSON")
+        if not isinstance(body, dict):
+            raise tornado.web.HTTPError(400, reason="Body must be a JSON object")
+        return body
+
+    def max_rows(self, body: dict) -> int:
+        try:
+            return max(1, min(int(body.get("max_rows", DEFAULT_MAX_ROWS)), ROW_CAP))
+        except (TypeError, ValueError):
+            raise tornado.web.HTTPError(400, reason="max_rows must be an integer")
+
+    def respond(self, status: int, payload: dict, shared: bool = False):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        if shared:
+            self.set_header("X-Coalesced", "1")
+        self.finish(json.dumps(payload, default=str))
+
+    def write_error(self, status_code, **kwargs):
+        self.respond(status_code, {"error": self._reason})
+
+
+class AskHandler(JSONHandler):
+    async def post(self):
+        body = self.json_body()
+        question = str(body.get("question") or "").strip()
+        if not question:
+            raise tornado.web.HTTPError(400, reason="\"question\" is required")
+        execute, max_rows = bool(body.get("execute", True)), self.max_rows(body)
+        state = await self.service.ensure_fresh()
+        key = ("ask", normalize_question(question), state.data_version, execute, max_rows)
+        (status, payload), shared = await self.service.flights.do(
+            key, lambda: self.service.ask(question, execute, max_rows, state))
+        self.respond(status, payload, shared)
+
+
+class SQLHandler(JSONHandler):
+    async def post(self):
+        body = self.json_body()
+        sql = clean_sql(str(body.get("sql") or ""))
+        if not sql:
+            raise tornado.web.HTTPError(400, reason="\"sql\" is required")
+        max_rows = self.max_rows(body)
+        state = await self.service.ensure_fresh()
+        key = ("sql", sql, state.data_version, max_rows)
+        (status, payload), shared = await self.service.flights.do(
+            key, lambda: self.service.run_sql(sql, max_rows, state))
+        self.respond(status, payload, shared)
+
+
+class GenerateHandler(JSONHandler):
+    async def post(self):
+        body = self.json_body()
+        mode = body.get("mode", "parallel")
+        if mode not in ("parallel", "bulk"):
+            raise tornado.web.HTTPError(400, reason="\"mode\" must be \"parallel\" or \"bulk\"")
+        ddl = body.get("ddl") or (self.service.schema.ddl if self.service.schema else "")
+        prompt = str(body.get("prompt") or "")
+        if not ddl or (mode == "parallel" and not prompt):
+            raise tornado.web.HTTPError(400, reason="\"prompt\" and a DDL (\"ddl\" or schema/) are required")
+        try:
+            rows_per_table = int(body.get("rows_per_table") or 0)
+        except (TypeError, ValueError):
+            raise tornado.web.HTTPError(400, reason="rows_per_table must be an integer")
+        ddl_digest = hashlib.sha1(ddl.encode()).hexdigest()
+        key = ("generate", prompt, ddl_digest, mode, rows_per_table)
+        try:
+            (status, payload), shared = await self.service.flights.do(
+                key, lambda: self.service.generate(prompt, ddl, mode, rows_per_table))
+        except ValueError as e:
+            status, payload, shared = 422, {"error": str(e)}, False
+        self.respond(status, payload, shared)
+
+
+class TablesHandler(JSONHandler):
+    async def get(self):
+        state = await self.service.ensure_fresh()
+        self.respond(200, {"tables": state.tables, "data_version": state.data_version})
+
+
+class HealthHandler(JSONHandler):
+    def get(self):
+        self.respond(200, {"status": "ok"})
+
+
+class MetricsHandler(JSONHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.finish(prometheus_text())
+
+
+def make_app(service: QueryService) -> tornado.web.Application:
+    args = {"service": service}
+    return tornado.web.Application([
+        (r"/ask", AskHandler, args),
+        (r"/sql", SQLHandler, args),
+        (r"/generate", GenerateHandler, args),
+        (r"/tables", TablesHandler, args),
+        (r"/health", HealthHandler, args),
+        (r"/metrics", MetricsHandler, args),
+    ])
+
+
+async def serve(service: QueryService, port: int = DEFAULT_PORT, address: str = "127.0.0.1"):
+    app = make_app(service)
+    app.listen(port, address=address)
+    print(f"Serving on http://{address}:{port}")
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP service for talk-to-your-data.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--address", default="127.0.0.1", help="interface to bind (local only by default)")
+    parser.add_argument("--data", default="data", help="data folder (as used by the app)")
+    parser.add_argument("--schema", default=None, help="DDL file (default: the first file in schema/)")
+    parser.add_argument("--local-response", default=None,
+                        help="use the offline stand-in LLM, answering every prompt with this text")
+    args = parser.parse_args(argv)
+
+    schema_path = args.schema or default_schema_path()
+    if args.local_response is not None:
+        llm_client_service.set_backend(LocalBackend(lambda prompt, config: args.local_response))
+    service = QueryService(args.data, schema_path)
+    try:
+        asyncio.run(serve(service, args.port, args.address))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
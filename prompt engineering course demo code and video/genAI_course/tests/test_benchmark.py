@@ -0,0 +1,28 @@
+import json
+import benchmark
+from utils.schema_service import parse_ddl
+
+
+def test_widened_schema_keeps_foreign_keys_resolvable():
+    with open(benchmark.BASE_DDL, encoding="utf-8") as f:
+        schema = parse_ddl(benchmark.widen_ddl(f.read(), 12))
+    names = {table.name for table in schema}
+    assert len(names) == 12
+    assert all(fk.ref_table in names for table in schema for fk in table.foreign_keys)
+
+
+def test_measure_records_latency_and_throughput():
+    results = []
+    benchmark.measure(results, "noop", lambda: None, repeats=3, tables=1, rows=10, work=10, unit="rows")
+    assert results[0]["stage"] == "noop" and results[0]["repeats"] == 3
+    assert results[0]["p95_ms"] >= results[0]["p50_ms"] >= 0 and results[0]["unit"] == "rows/s"
+
+
+def test_compare_flags_only_real_slowdowns(tmp_path):
+    def row(stage, p50_ms):
+        return {"stage": stage, "tables": 7, "rows": 10, "p50_ms": p50_ms}
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": [row("slower", 100.0), row("noise", 100.0), row("tiny", 0.1)]}))
+    results = [row("slower", 150.0), row("noise", 105.0), row("tiny", 0.5), row("new", 1.0)]
+    assert [r["stage"] for r in benchmark.compare(results, str(baseline), tolerance=0.2)] == ["slower"]
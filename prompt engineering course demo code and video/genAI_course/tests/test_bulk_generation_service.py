@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from utils.schema_service import get_schema
+from utils.bulk_generation_service import synthesize_chunk
+
+
+def make_table(columns):
+    return get_schema(f"CREATE TABLE T (id INT PRIMARY KEY, {columns});")["T"]
+
+
+@pytest.mark.parametrize("length", [3, 5, 12, 30])
+def test_unique_text_fits_the_column_and_stays_distinct(length):
+    table = make_table(f"code VARCHAR({length}) UNIQUE, email VARCHAR({length}) UNIQUE")
+    chunk = synthesize_chunk(table, 1, 2000, np.random.default_rng(0))
+    for column in ("code", "email"):
+        assert chunk[column].is_unique
+        assert chunk[column].str.len().max() <= length
+
+
+def test_unique_text_that_cannot_fit_raises():
+    table = make_table("code CHAR(1) UNIQUE")
+    assert synthesize_chunk(table, 1, 35, np.random.default_rng(0))["code"].is_unique
+    with pytest.raises(ValueError, match="code"):
+        synthesize_chunk(table, 1, 36, np.random.default_rng(0))
+
+
+def test_unique_integers_respect_check_bounds():
+    table = make_table("badge INT UNIQUE CHECK (badge > 100 AND badge <= 200)")
+    badges = synthesize_chunk(table, 1, 100, np.random.default_rng(0))["badge"]
+    assert badges.is_unique and badges.min() == 101 and badges.max() == 200
+    with pytest.raises(ValueError, match="badge"):
+        synthesize_chunk(table, 1, 101, np.random.default_rng(0))
@@ -0,0 +1,54 @@
+import json
+import pytest
+from utils import llm_client_service
+from utils.data_generation_service import salvage_tables, TableStreamParser, generate_from_ddl_parallel
+from utils.llm_client_service import LocalBackend
+
+
+def test_salvage_keeps_complete_tables_of_truncated_response():
+    text = '```json\n{"A": [{"id": 1}], "B": [], "C": [{"id": 1}, {"id": 2}], "D": [{"id": '
+    assert salvage_tables(text) == {"A": [{"id": 1}], "C": [{"id": 1}, {"id": 2}]}
+
+
+def test_salvage_of_garbage_is_empty():
+    assert salvage_tables("Sorry, I cannot help with that.") == {}
+
+
+def test_stream_parser_yields_each_table_as_its_array_closes():
+    text = '{"A": [{"id": 1, "note": "a \\"quoted\\" ], {"}], "B": [{"id": 2}, {"id": 3}]}'
+    parser, seen = TableStreamParser(), {}
+    for i, ch in enumerate(text):
+        for name, rows in parser.feed(ch):
+            seen[name] = (i, rows)
+    parser.close()
+    assert seen["A"] == (text.index('], "B"'), [{"id": 1, "note": 'a "quoted" ], {'}])
+    assert seen["B"][1] == [{"id": 2}, {"id": 3}]
+
+
+def test_stream_parser_rejects_a_truncated_stream():
+    parser = TableStreamParser()
+    assert parser.feed('{"A": [{"id": 1}], "B": [{"id"') == [("A", [{"id": 1}])]
+    with pytest.raises(ValueError, match="B"):
+        parser.close()
+
+
+COMPANY_DDL = """
+CREATE TABLE Companies (company_id INT PRIMARY KEY, name VARCHAR(50));
+CREATE TABLE Employees (employee_id INT PRIMARY KEY, company_id INT,
+    FOREIGN KEY (company_id) REFERENCES Companies(company_id));
+"""
+
+
+def test_child_tables_are_generated_from_their_parents_keys(monkeypatch):
+    prompts = []
+
+    def respond(prompt, config):
+        prompts.append(prompt)
+        if "CREATE TABLE Companies" in prompt:
+            return json.dumps({"Companies": [{"company_id": 1, "name": "A"}, {"company_id": 2, "name": "B"}]})
+        return json.dumps({"Employees": [{"employee_id": 1, "company_id": 2}]})
+
+    monkeypatch.setattr(llm_client_service, "_backend", LocalBackend(respond))
+    tables = list(generate_from_ddl_parallel(COMPANY_DDL, "two companies", 0.5, 1000))
+    assert [name for name, _ in tables] == ["Companies", "Employees"]
+    assert "Employees.company_id -> Companies.company_id: [1, 2]" in prompts[1]
@@ -0,0 +1,52 @@
+import sqlite3
+import threading
+import pytest
+from utils import talk_to_your_data_service as ttyd
+from utils.index_service import IndexAdvisor, plan_candidates
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "data.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, city TEXT)")
+        conn.executemany("INSERT INTO t (city) VALUES (?)", [(f"c{i % 50}",) for i in range(2000)])
+    return path
+
+
+def _indexes(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+
+
+def test_plan_candidates_from_full_scan():
+    plan = [(2, 0, 0, "SCAN t")]
+    assert plan_candidates("SELECT * FROM t WHERE city = 'x'", plan, {"t": {"id", "city"}}) == {("t", ("city",))}
+
+
+def test_claim_skips_pairs_already_building(tmp_path):
+    advisor = IndexAdvisor(path=str(tmp_path / "usage.sqlite"))
+    pair = ("t", ("city",))
+    assert advisor.claim("db", [pair]) == [pair]
+    assert advisor.claim("db", [pair]) == []
+    advisor.release("db", [pair])
+    assert advisor.claim("db", [pair]) == [pair]
+
+
+def test_learned_index_is_swapped_in_without_touching_open_readers(db_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(ttyd, "index_advisor", IndexAdvisor(path=str(tmp_path / "usage.sqlite"), threshold=2))
+    reader = ttyd.connect_database(db_path)
+    for _ in range(2):
+        df, error = ttyd.execute_sql_query("SELECT COUNT(*) AS n FROM t WHERE city = 'c7'", reader)
+        assert error is None and df["n"][0] == 40
+    for thread in threading.enumerate():
+        if thread.name == "index-builder":
+            thread.join(timeout=10)
+
+    assert "ix_t_city" in _indexes(db_path)
+    # The open connection keeps reading its (replaced) file; a new one sees the index
+    assert reader.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2000
+    reader.close()
+    with ttyd.connect_database(db_path) as fresh:
+        plan = " ".join(row[-1] for row in ttyd.query_plan("SELECT * FROM t WHERE city = 'c7'", fresh))
+    assert "ix_t_city" in plan
@@ -0,0 +1,127 @@
+import time
+import asyncio
+import threading
+import pytest
+from utils import llm_client_service
+from utils.llm_client_service import LLMBackend, ResilientBackend, LocalBackend
+
+
+class StatusError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FlakyBackend(LLMBackend):
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def generate(self, prompt, config):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_transient_errors_are_retried():
+    inner = FlakyBackend([StatusError(503), TimeoutError()])
+    assert ResilientBackend(inner, attempts=3, max_wait=0, hedge=False).generate("p", {}) == "ok"
+    assert inner.calls == 3
+
+
+def test_client_errors_are_not_retried():
+    inner = FlakyBackend([StatusError(400)])
+    with pytest.raises(StatusError):
+        ResilientBackend(inner, attempts=3, max_wait=0, hedge=False).generate("p", {})
+    assert inner.calls == 1
+
+
+class SlowFirstBackend(LLMBackend):
+    """The first call stalls (a slow replica); later calls answer at once."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, config):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            time.sleep(1)
+            return "slow"
+        return "fast"
+
+
+def hedged(inner):
+    backend = ResilientBackend(inner, attempts=1, hedge=True)
+    for _ in range(20):
+        backend.latency.record(0.01)  # recent p95 of 10 ms
+    return backend
+
+
+def test_slow_call_is_hedged():
+    inner = SlowFirstBackend()
+    started = time.perf_counter()
+    assert hedged(inner).generate("p", {}) == "fast"
+    assert inner.calls == 2 and time.perf_counter() - started < 0.5
+
+
+def test_slow_async_call_is_hedged():
+    inner = SlowFirstBackend()
+
+    async def timed():
+        started = time.perf_counter()
+        return await hedged(inner).agenerate("p", {}), time.perf_counter() - started
+
+    text, seconds = asyncio.run(timed())  # returns once the stalled worker thread finishes
+    assert text == "fast" and inner.calls == 2 and seconds < 0.5
+
+
+def test_no_hedge_before_enough_latency_samples():
+    inner = SlowFirstBackend()
+    assert ResilientBackend(inner, attempts=1, hedge=True).generate("p", {}) == "slow"
+    assert inner.calls == 1
+
+
+def test_backends_must_implement_generate():
+    with pytest.raises(TypeError):
+        type("NoGenerate", (LLMBackend,), {})()
+
+
+class CountingBackend(LLMBackend):
+    """Upper-cases the prompt and records how many async calls were in flight at once."""
+
+    def __init__(self):
+        self.active = self.peak = 0
+
+    def generate(self, prompt, config):
+        return prompt.upper()
+
+    async def agenerate(self, prompt, config):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return self.generate(prompt, config)
+
+
+def test_backend_is_built_once_and_shared(monkeypatch):
+    monkeypatch.setattr(llm_client_service, "_backend", None)
+    monkeypatch.setattr(llm_client_service, "LLM_BACKEND", "local")
+    assert isinstance(llm_client_service.get_backend(), LocalBackend)
+    assert llm_client_service.get_backend() is llm_client_service.get_backend()
+
+
+def test_async_calls_stay_within_the_concurrency_limit(monkeypatch):
+    backend = CountingBackend()
+    monkeypatch.setattr(llm_client_service, "_backend", backend)
+    prompts = [f"q{i}" for i in range(3 * llm_client_service.LLM_MAX_CONCURRENCY)]
+
+    async def ask_all():
+        return await asyncio.gather(*(llm_client_service.agenerate_text(prompt) for prompt in prompts))
+
+    assert asyncio.run(ask_all()) == [prompt.upper() for prompt in prompts]
+    assert backend.peak == llm_client_service.LLM_MAX_CONCURRENCY
+    assert llm_client_service.generate_text("sync") == "SYNC"
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+from utils.modification_service import split_statements, validate_modification_script, apply_modification_script
+
+
+def company_tables():
+    return {
+        "Employees": pd.DataFrame({"id": [1, 2, 3], "name": ["ann", "bob", "cy"], "salary": [10, 20, 30]}),
+        "Companies": pd.DataFrame({"id": [1], "name": ["acme"]}),
+    }
+
+
+def test_split_keeps_semicolons_inside_strings():
+    assert split_statements("UPDATE t SET a = 'x;y'; DELETE FROM t") == ["UPDATE t SET a = 'x;y';", "DELETE FROM t;"]
+
+
+@pytest.mark.parametrize("script", [
+    "",
+    "DROP TABLE Employees",
+    "SELECT * FROM Employees",
+    "ALTER TABLE Employees RENAME TO Staff",
+    "UPDATE Employees SET salary = 0; ATTACH DATABASE 'other.db' AS other",
+])
+def test_validator_rejects_anything_but_data_and_column_changes(script):
+    with pytest.raises(ValueError):
+        validate_modification_script(script)
+
+
+def test_script_runs_over_all_rows_and_returns_only_changed_tables():
+    changed = apply_modification_script(
+        company_tables(),
+        "UPDATE Employees SET salary = salary * 2 WHERE id > 1; ALTER TABLE Employees ADD COLUMN bonus INT;",
+    )
+    assert list(changed) == ["Employees"]
+    assert changed["Employees"]["salary"].tolist() == [10, 40, 60]
+    assert "bonus" in changed["Employees"]
+
+
+def test_authorizer_denies_statements_hidden_inside_allowed_ones():
+    script = "UPDATE Employees SET name = (SELECT name FROM pragma_table_info('Employees') LIMIT 1)"
+    validate_modification_script(script)  # passes the keyword check
+    with pytest.raises(ValueError, match="not authorized"):
+        apply_modification_script(company_tables(), script)
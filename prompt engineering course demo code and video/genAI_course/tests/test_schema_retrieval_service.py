@@ -0,0 +1,34 @@
+import sqlite3
+from utils.schema_service import get_schema
+from utils.schema_retrieval_service import SchemaIndex
+
+HR_DDL = """
+CREATE TABLE Companies (company_id INT PRIMARY KEY, name VARCHAR(100), city VARCHAR(50));
+CREATE TABLE Employees (employee_id INT PRIMARY KEY, company_id INT, salary DECIMAL(10, 2),
+    FOREIGN KEY (company_id) REFERENCES Companies(company_id));
+CREATE TABLE Projects (project_id INT PRIMARY KEY, title VARCHAR(100), budget DECIMAL(12, 2));
+CREATE TABLE Invoices (invoice_id INT PRIMARY KEY, amount DECIMAL(10, 2), due_date DATE);
+"""
+
+
+def test_prompt_is_pruned_to_matching_tables_and_their_parents():
+    selection = SchemaIndex(get_schema(HR_DDL)).select("What is the average salary of employees?")
+    assert selection.pruned
+    assert selection.tables == ["Companies", "Employees"]
+    assert "CREATE TABLE Projects" not in selection.ddl and selection.reduction > 0
+
+
+def test_unsure_match_falls_back_to_the_full_schema():
+    selection = SchemaIndex(get_schema(HR_DDL)).select("Hello, can you help me?")
+    assert not selection.pruned
+    assert selection.tables == ["Companies", "Employees", "Projects", "Invoices"]
+    assert selection.ddl == HR_DDL
+
+
+def test_sampled_values_link_questions_to_tables():
+    question = "How many are based in Springfield or Shelbyville?"
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE Companies (company_id INT, name TEXT, city TEXT)")
+    conn.executemany("INSERT INTO Companies VALUES (?, ?, ?)", [(1, "Acme", "Springfield"), (2, "Initech", "Shelbyville")])
+    assert not SchemaIndex(get_schema(HR_DDL)).select(question).pruned
+    assert SchemaIndex(get_schema(HR_DDL), conn).select(question).tables == ["Companies"]
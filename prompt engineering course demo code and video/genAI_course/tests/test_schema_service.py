@@ -0,0 +1,93 @@
+import pytest
+from utils.schema_service import get_schema, dependency_waves, default_schema_path, pandas_dtypes, date_columns
+
+
+def column(ddl, name):
+    table = next(iter(get_schema(ddl)))
+    return table.column(name)
+
+
+def test_inclusive_bounds():
+    rating = column("CREATE TABLE R (rating INT CHECK (rating >= 1 AND rating <= 5));", "rating")
+    assert (rating.check_min, rating.check_max) == (1, 5)
+
+
+def test_between():
+    rating = column("CREATE TABLE R (rating INT, CHECK (rating BETWEEN 1 AND 5));", "rating")
+    assert (rating.check_min, rating.check_max) == (1, 5)
+
+
+def test_strict_integer_bounds_step_by_one():
+    rating = column("CREATE TABLE R (rating INT CHECK (rating > 0 AND rating < 6));", "rating")
+    assert (rating.check_min, rating.check_max) == (1, 5)
+
+
+@pytest.mark.parametrize("type_", ["DECIMAL(10, 2)", "FLOAT", "REAL"])
+def test_strict_decimal_bound_stays_exclusive(type_):
+    salary = column(f"CREATE TABLE E (salary {type_} CHECK (salary > 0 AND salary < 100));", "salary")
+    assert 0 < salary.check_min < 0.01
+    assert 99.99 < salary.check_max < 100
+    assert salary.check_min <= 0.5 <= salary.check_max
+
+
+def test_check_literal_does_not_split_columns():
+    table = next(iter(get_schema("CREATE TABLE T (a VARCHAR(5) DEFAULT ',)', b ENUM('x,y', 'z') NOT NULL);")))
+    assert [c.name for c in table.columns] == ["a", "b"]
+    assert table.column("b").enum_values == ["x,y", "z"]
+
+
+def test_dependency_waves_order_parents_first():
+    schema = get_schema(
+        "CREATE TABLE C (id INT PRIMARY KEY);"
+        "CREATE TABLE B (id INT PRIMARY KEY, c_id INT, FOREIGN KEY (c_id) REFERENCES C(id));"
+        "CREATE TABLE A (id INT PRIMARY KEY, b_id INT, FOREIGN KEY (b_id) REFERENCES B(id));"
+    )
+    assert dependency_waves(schema) == [["C"], ["B"], ["A"]]
+
+
+def test_default_schema_path(tmp_path):
+    assert default_schema_path(str(tmp_path / "schema")) is None
+    (tmp_path / "schema").mkdir()
+    assert default_schema_path(str(tmp_path / "schema")) is None
+    (tmp_path / "schema" / "company.ddl").write_text("CREATE TABLE T (id INT);")
+    assert default_schema_path(str(tmp_path / "schema")) == str(tmp_path / "schema" / "company.ddl")
+
+
+EMPLOYEES_DDL = """
+-- One row per employee
+CREATE TABLE Employees (
+    employee_id INT PRIMARY KEY AUTO_INCREMENT,
+    email VARCHAR(100) NOT NULL UNIQUE,
+    salary DECIMAL(10, 2),
+    status ENUM('active', 'left') DEFAULT 'active',
+    hired DATE,
+    company_id INT,
+    FOREIGN KEY (company_id) REFERENCES Companies(company_id)
+);
+"""
+
+
+def test_ddl_is_parsed_into_typed_columns_and_keys():
+    table = get_schema(EMPLOYEES_DDL)["Employees"]
+    assert table.primary_key == ["employee_id"] and table.column("employee_id").auto_increment
+    email = table.column("email")
+    assert (email.base_type, email.length, email.not_null, email.unique) == ("VARCHAR", 100, True, True)
+    salary = table.column("salary")
+    assert (salary.base_type, salary.precision, salary.scale) == ("DECIMAL", 10, 2)
+    assert table.column("status").enum_values == ["active", "left"]
+    assert [(fk.columns, fk.ref_table, fk.ref_columns) for fk in table.foreign_keys] == [
+        (["company_id"], "Companies", ["company_id"])
+    ]
+    assert pandas_dtypes(table) == {
+        "employee_id": "Int64",
+        "email": "string[pyarrow]",
+        "salary": "float64",
+        "status": "category",
+        "company_id": "Int64",
+    }
+    assert date_columns(table) == ["hired"]
+
+
+def test_each_distinct_ddl_is_parsed_once():
+    assert get_schema(EMPLOYEES_DDL) is get_schema(EMPLOYEES_DDL)
+    assert get_schema(EMPLOYEES_DDL + "\n").digest != get_schema(EMPLOYEES_DDL).digest
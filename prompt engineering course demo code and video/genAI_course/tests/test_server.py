@@ -0,0 +1,144 @@
+import os
+import json
+import asyncio
+import tempfile
+from unittest import mock
+import pandas as pd
+import pytest
+from tornado.testing import AsyncHTTPTestCase, gen_test
+import server
+from utils import llm_client_service
+from utils.llm_client_service import LocalBackend
+from utils.storage_service import write_table
+from utils.table_registry_service import TableRegistry
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        flights = server.SingleFlight()
+        return await asyncio.gather(*(flights.do(("ask", "q"), work) for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [result for result, _ in results] == ["result"] * 10
+    assert sum(shared for _, shared in results) == 9
+
+
+@pytest.fixture
+def unwatched_service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_table("data", "Companies", pd.DataFrame({"company_id": [1, 2], "name": ["A", "B"]}))
+    registry = TableRegistry("data")
+    registry.scan()  # never watched, as on a filesystem without change notifications
+    monkeypatch.setattr(server, "get_registry", lambda data_path: registry)
+    return server.QueryService("data")
+
+
+def test_ensure_fresh_rescans_without_a_watcher(unwatched_service):
+    before = unwatched_service.state
+    assert before.tables == ["Companies"]
+    write_table("data", "Departments", pd.DataFrame({"department_id": [1], "company_id": [1]}))
+
+    after = asyncio.run(unwatched_service.ensure_fresh())
+    assert after is unwatched_service.state
+    assert after.tables == ["Companies", "Departments"]
+    assert after.data_version != before.data_version
+
+
+def test_refresh_keeps_the_newest_state(unwatched_service):
+    newest = unwatched_service.state
+    stale = server.DataState(newest.db_path, "old", [], None, newest.registry_version - 1)
+    with unwatched_service._state_lock:
+        unwatched_service.state = stale
+    assert unwatched_service.refresh().registry_version == newest.registry_version
+    unwatched_service.state = server.DataState(newest.db_path, "new", [], None, newest.registry_version + 1)
+    assert unwatched_service.refresh().data_version == "new"
+
+
+class EndpointTest(AsyncHTTPTestCase):
+    def setUp(self):
+        self.cwd, self.tmp = os.getcwd(), tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        write_table("data", "Companies", pd.DataFrame({"company_id": [1, 2], "name": ["B", "A"]}))
+        registry = TableRegistry("data")
+        registry.scan()
+        self.registry_patch = mock.patch.object(server, "get_registry", lambda data_path: registry)
+        self.registry_patch.start()
+        self.previous_backend = llm_client_service._backend
+        self.backend = LocalBackend(lambda prompt, config: "SELECT name FROM Companies ORDER BY name", latency=0.2)
+        llm_client_service.set_backend(self.backend)
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        llm_client_service.set_backend(self.previous_backend)
+        self.registry_patch.stop()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def get_app(self):
+        self.service = server.QueryService("data")
+        return server.make_app(self.service)
+
+    def post(self, path, body):
+        data = body if isinstance(body, str) else json.dumps(body)
+        return self.http_client.fetch(self.get_url(path), method="POST", body=data, raise_error=False)
+
+    def test_health(self):
+        response = self.fetch("/health")
+        assert response.code == 200 and json.loads(response.body) == {"status": "ok"}
+
+    @gen_test
+    async def test_identical_questions_share_one_llm_call(self):
+        responses = await asyncio.gather(*(self.post("/ask", {"question": "Company names?"}) for _ in range(3)))
+        assert [response.code for response in responses] == [200] * 3
+        assert self.backend.calls == 1
+        assert sum(response.headers.get("X-Coalesced") == "1" for response in responses) == 2
+        assert {json.dumps(json.loads(response.body)["rows"]) for response in responses} == {'[["A"], ["B"]]'}
+
+    @gen_test
+    async def test_bad_requests_and_failing_queries(self):
+        assert (await self.post("/sql", "not json")).code == 400
+        assert (await self.post("/sql", {})).code == 400
+        assert (await self.post("/sql", {"sql": "SELECT 1", "max_rows": "many"})).code == 400
+        assert (await self.post("/generate", {"prompt": "x", "ddl": "CREATE TABLE t (id INT);", "mode": "?"})).code == 400
+        response = await self.post("/sql", {"sql": "SELECT * FROM Missing"})
+        assert response.code == 422 and "no such table" in json.loads(response.body)["error"]
+
+    def test_tables_follow_data_changes(self):
+        assert json.loads(self.fetch("/tables").body)["tables"] == ["Companies"]
+        write_table("data", "Departments", pd.DataFrame({"department_id": [1], "company_id": [1]}))
+        assert json.loads(self.fetch("/tables").body)["tables"] == ["Companies", "Departments"]
+
+    def test_generated_tables_are_served(self):
+        ddl = "CREATE TABLE Projects (project_id INT PRIMARY KEY, title VARCHAR(20));"
+        response = self.fetch("/generate", method="POST", body=json.dumps({"ddl": ddl, "mode": "bulk", "rows_per_table": 5}))
+        assert response.code == 200 and json.loads(response.body)["tables"] == {"Projects": 5}
+        assert json.loads(self.fetch("/tables").body)["tables"] == ["Companies", "Projects"]
+
+
+def test_single_flight_shares_failures_and_then_runs_again():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise RuntimeError("model unavailable")
+        return "result"
+
+    async def main():
+        flights = server.SingleFlight()
+        failed = await asyncio.gather(*(flights.do(("ask", "q"), work) for _ in range(3)), return_exceptions=True)
+        return failed, await flights.do(("ask", "q"), work)
+
+    failed, retried = asyncio.run(main())
+    assert all(isinstance(error, RuntimeError) for error in failed)
+    assert retried == ("result", False) and len(calls) == 2
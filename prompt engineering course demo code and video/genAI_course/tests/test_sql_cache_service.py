@@ -0,0 +1,59 @@
+import time
+from utils.sql_cache_service import SQLCache, normalize_question
+
+
+def make_cache(tmp_path, **kwargs):
+    return SQLCache(path=str(tmp_path / "sql_cache.sqlite"), **kwargs)
+
+
+def test_normalize_question():
+    assert normalize_question("  How many   Employees? ") == "how many employees"
+
+
+def test_disk_hit_after_restart(tmp_path):
+    make_cache(tmp_path).put("How many employees?", "v1", "SELECT 1")
+    cache = make_cache(tmp_path)
+    assert cache.get("how many employees", "v1") == "SELECT 1"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_expired_entries_are_not_reloaded_from_disk(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.put("q", "v1", "SELECT 1")
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.get("q", "v1") is None
+    assert make_cache(tmp_path, ttl=60).get("q", "v1") is None
+
+
+def test_put_evicts_expired_rows(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.put("old", "v1", "SELECT 1")
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    cache.put("new", "v1", "SELECT 2")
+    with cache._connect() as conn:
+        assert [row[0] for row in conn.execute("SELECT question FROM sql_cache")] == ["new"]
+
+
+def test_new_fingerprint_evicts_older_versions(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("q", "v1", "SELECT 1")
+    cache.put("q", "v2", "SELECT 2")
+    assert cache.get("q", "v1") is None
+    assert cache.get("q", "v2") == "SELECT 2"
+
+
+def test_uncached_generation_keeps_other_entries(tmp_path, monkeypatch):
+    import utils.talk_to_your_data_service as ttyd
+    cache = make_cache(tmp_path)
+    monkeypatch.setattr(ttyd, "sql_cache", cache)
+    answers = iter(["SELECT 1", "SELECT 2"])
+    monkeypatch.setattr(ttyd, "generate_text", lambda prompt, config=None: next(answers))
+    ask = lambda question, **kwargs: ttyd.generate_sql_from_prompt(question, ["t"], "", "v1", **kwargs)[0]
+
+    assert ask("q") == "SELECT 1"
+    cache.put("other", ttyd.schema_fingerprint("", ["t"], "v1"), "SELECT 3")
+    assert ask("q", use_cache=False) == "SELECT 2"
+    assert ask("q") == "SELECT 2"
+    assert ask("other") == "SELECT 3"
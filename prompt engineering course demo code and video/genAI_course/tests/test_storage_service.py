@@ -0,0 +1,71 @@
+import os
+import pandas as pd
+import pytest
+from utils.schema_service import get_schema
+from utils.storage_service import TableWriter, write_table, read_table, read_arrow, table_path, list_tables
+
+DDL = """
+CREATE TABLE Employees (
+    employee_id INT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    hire_date DATE,
+    salary DECIMAL(10, 2),
+    status ENUM('Full-time', 'Part-time')
+);
+"""
+
+
+@pytest.fixture
+def employees():
+    return pd.DataFrame({
+        "employee_id": [1, 2, 3],
+        "name": ["Ann", "Bo", "Cy"],
+        "hire_date": ["2024-01-01", "2024-02-01", None],
+        "salary": [10.5, None, 30.0],
+        "status": ["Full-time", "Part-time", "Full-time"],
+    })
+
+
+def test_arrow_and_csv_reads_have_the_same_dtypes(tmp_path, employees):
+    table = get_schema(DDL)["Employees"]
+    write_table(str(tmp_path), "Employees", employees)
+    from_arrow = read_table(str(tmp_path), "Employees", table=table)
+    os.remove(table_path(str(tmp_path), "Employees", "arrow"))
+    from_csv = read_table(str(tmp_path), "Employees", table=table)
+
+    assert from_arrow.dtypes.to_dict() == from_csv.dtypes.to_dict()
+    assert str(from_arrow["employee_id"].dtype) == "Int64"
+    assert isinstance(from_arrow["status"].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_datetime64_any_dtype(from_arrow["hire_date"])
+
+
+def test_table_writer_replaces_files_on_success(tmp_path, employees):
+    with TableWriter(str(tmp_path), "Employees") as writer:
+        writer.write(employees.iloc[:2])
+        writer.write(employees.iloc[2:])
+    assert writer.rows == 3
+    assert len(read_table(str(tmp_path), "Employees")) == 3
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+
+def test_table_writer_keeps_live_files_on_error(tmp_path, employees):
+    write_table(str(tmp_path), "Employees", employees)
+    with pytest.raises(RuntimeError):
+        with TableWriter(str(tmp_path), "Employees") as writer:
+            writer.write(employees.iloc[:1])
+            raise RuntimeError("generation failed halfway")
+
+    assert list_tables(str(tmp_path)) == ["Employees"]
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+    assert len(read_table(str(tmp_path), "Employees")) == 3
+    assert len(pd.read_csv(table_path(str(tmp_path), "Employees", "csv"))) == 3
+
+
+
+def test_csv_conversion_leaves_other_writers_temp_files_alone(tmp_path, employees):
+    employees.to_csv(table_path(str(tmp_path), "Employees", "csv"), index=False)
+    other_writer = tmp_path / "Employees.arrow.tmp"  # e.g. another session converting the same CSV
+    other_writer.write_bytes(b"partial")
+    assert len(read_table(str(tmp_path), "Employees")) == 3
+    assert other_writer.read_bytes() == b"partial"
+    assert len(read_arrow(str(tmp_path), "Employees")) == 3
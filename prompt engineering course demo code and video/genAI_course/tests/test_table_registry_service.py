@@ -0,0 +1,28 @@
+import os
+import pandas as pd
+from utils.storage_service import write_table, table_path
+from utils.table_registry_service import TableRegistry
+
+
+def test_scan_reports_content_changes_only(tmp_path):
+    data_dir = str(tmp_path)
+    write_table(data_dir, "Companies", pd.DataFrame({"company_id": [1, 2]}))
+    write_table(data_dir, "Employees", pd.DataFrame({"employee_id": [1]}))
+    registry = TableRegistry(data_dir)
+    assert registry.scan() == ({"Companies", "Employees"}, set())
+    version = registry.version
+
+    # Touched but identical: rehashed, not reported
+    path = table_path(data_dir, "Companies", "csv")
+    mtime = os.stat(path).st_mtime_ns + 10**9
+    os.utime(path, ns=(mtime, mtime))
+    assert registry.scan() == (set(), set())
+    assert registry.version == version
+
+    write_table(data_dir, "Employees", pd.DataFrame({"employee_id": [1, 2]}))
+    assert registry.scan() == ({"Employees"}, set())
+    for fmt in ("csv", "arrow"):
+        os.remove(table_path(data_dir, "Companies", fmt))
+    assert registry.scan() == (set(), {"Companies"})
+    assert registry.version == version + 2
+    assert set(registry.digests()) == {"Employees"}
@@ -0,0 +1,129 @@
+import csv
+import sqlite3
+import os
+import pyarrow.parquet as pq
+import pytest
+import pandas as pd
+from contextlib import closing
+from utils.talk_to_your_data_service import (
+    connect_database,
+    export_query,
+    execute_sql_query,
+    QueryBudget,
+    list_tables,
+    materialize_database,
+)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    db_path = str(tmp_path / "data.sqlite")
+    with sqlite3.connect(db_path) as setup:
+        setup.execute("CREATE TABLE t (id INTEGER, score INTEGER)")
+        setup.executemany("INSERT INTO t VALUES (?, ?)", [(i, None if i % 3 else i) for i in range(1, 1001)])
+    conn = connect_database(db_path)
+    yield conn
+    conn.close()
+
+
+def test_export_csv_streams_every_row(conn, tmp_path):
+    path = tmp_path / "result.csv"
+    with open(path, "wb") as f:
+        assert export_query("SELECT * FROM t ORDER BY id", conn, f, "csv", chunk_size=64) == 1000
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["id", "score"]
+    assert len(rows) == 1001
+    assert rows[3] == ["3", "3"]  # ints stay ints even in chunks with NULLs
+
+
+def test_export_parquet_streams_every_row(conn, tmp_path):
+    path = tmp_path / "result.parquet"
+    with open(path, "wb") as f:
+        assert export_query("SELECT * FROM t", conn, f, "parquet", chunk_size=64) == 1000
+    assert pq.read_table(path).num_rows == 1000
+
+
+@pytest.mark.parametrize("sql", ["DELETE FROM t", "DROP TABLE t", "UPDATE t SET score = 0", "PRAGMA writable_schema = 1"])
+def test_read_only_connection_rejects_writes(conn, sql):
+    df, error = execute_sql_query(sql, conn)
+    assert df is None and error
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1000
+
+
+def test_plan_check_rejects_huge_cross_join(conn):
+    df, error = execute_sql_query("SELECT COUNT(*) FROM t a, t b, t c", conn)
+    assert df is None and "cross join" in error
+
+
+def test_budget_stops_runaway_query(conn):
+    heavy = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+    df, error = execute_sql_query(heavy, conn, budget=QueryBudget(timeout=0, max_steps=100_000))
+    assert df is None
+    assert error.startswith("⛔") and "VM steps" in error
+
+
+def test_result_is_capped_and_flagged(conn):
+    df, error = execute_sql_query("SELECT * FROM t", conn, max_rows=10)
+    assert error is None
+    assert len(df) == 10 and df.attrs["truncated"]
+
+
+@pytest.mark.parametrize("analyze", [True, False])
+def test_plan_check_counts_rows_not_key_values(tmp_path, analyze):
+    db_path = str(tmp_path / "keys.sqlite")
+    with sqlite3.connect(db_path) as setup:
+        for name, first in (("a", 100_000), ("b", 900_000)):
+            setup.execute(f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, label TEXT)")
+            setup.executemany(f"INSERT INTO {name} VALUES (?, 'x')", [(first + i,) for i in range(10)])
+        if analyze:
+            setup.execute("ANALYZE")
+    with closing(connect_database(db_path)) as conn:
+        df, error = execute_sql_query("SELECT * FROM a, b", conn)
+    assert error is None and len(df) == 100
+
+
+def test_export_parquet_types_columns_that_start_null(tmp_path):
+    db_path = str(tmp_path / "nulls.sqlite")
+    with sqlite3.connect(db_path) as setup:
+        setup.execute("CREATE TABLE p (id INTEGER, note TEXT, ratio REAL)")
+        setup.executemany("INSERT INTO p VALUES (?, ?, ?)",
+                          [(i, None if i < 100 else f"n{i}", None if i < 100 else i / 2) for i in range(128)])
+    path = tmp_path / "result.parquet"
+    with closing(connect_database(db_path)) as conn, open(path, "wb") as f:
+        assert export_query("SELECT * FROM p ORDER BY note", conn, f, "parquet", chunk_size=64) == 128
+    result = pq.read_table(path)
+    assert str(result.schema.field("note").type) == "string"
+    assert str(result.schema.field("ratio").type) == "double"
+    assert result.column("note").null_count == 100
+    assert pq.ParquetFile(path).metadata.num_row_groups == 2  # no empty trailing chunk
+
+
+def test_export_parquet_of_empty_result(conn, tmp_path):
+    path = tmp_path / "empty.parquet"
+    with open(path, "wb") as f:
+        assert export_query("SELECT * FROM t WHERE id < 0", conn, f, "parquet") == 0
+    assert pq.read_table(path).column_names == ["id", "score"]
+
+
+def write_companies(data_path, rows):
+    pd.DataFrame({"company_id": range(rows), "name": [f"c{i}" for i in range(rows)]}).to_csv(
+        data_path / "Companies.csv", index=False
+    )
+
+
+def test_database_is_rebuilt_only_when_data_changes(tmp_path):
+    data_path, db_path = tmp_path / "data", str(tmp_path / "store.sqlite")
+    data_path.mkdir()
+    write_companies(data_path, 3)
+    materialize_database(str(data_path), db_path)
+    built = os.stat(db_path).st_ino
+
+    materialize_database(str(data_path), db_path)
+    assert os.stat(db_path).st_ino == built  # same data: the file is reused, not rebuilt
+
+    write_companies(data_path, 5)
+    materialize_database(str(data_path), db_path)
+    with closing(connect_database(db_path)) as conn:
+        assert list_tables(conn) == ["Companies"]
+        assert conn.execute('SELECT COUNT(*) FROM "Companies"').fetchone()[0] == 5
@@ -0,0 +1,29 @@
+import json
+import threading
+from utils import tracing_service
+from utils.tracing_service import start_trace, span, flush_traces
+
+
+def test_traces_are_written_off_the_request_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing_service, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing_service, "TRACE_LOG_PATH", str(tmp_path / "traces.jsonl"))
+    monkeypatch.setattr(tracing_service, "METRICS_PATH", str(tmp_path / "metrics.prom"))
+    monkeypatch.setattr(tracing_service, "_logger", None)
+    monkeypatch.setattr(tracing_service.logging.getLogger("genai_course.traces"), "handlers", [])
+    real_logger, writers = tracing_service._trace_logger, []
+
+    def logger():
+        writers.append(threading.current_thread().name)
+        return real_logger()
+
+    monkeypatch.setattr(tracing_service, "_trace_logger", logger)
+    with start_trace("test_request", question="q") as trace:
+        with span("stage") as s:
+            s.set(rows=3)
+    assert trace.to_dict()["spans"][0]["rows"] == 3
+    flush_traces()
+
+    assert writers and threading.current_thread().name not in writers
+    logged = json.loads((tmp_path / "traces.jsonl").read_text().splitlines()[-1])
+    assert logged["trace"] == "test_request" and logged["spans"][0]["name"] == "stage"
+    assert 'stage_calls_total{stage="stage"}' in (tmp_path / "metrics.prom").read_text()
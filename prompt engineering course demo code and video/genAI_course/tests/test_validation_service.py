@@ -0,0 +1,46 @@
+import pandas as pd
+from utils.schema_service import get_schema
+from utils.validation_service import validate_tables, repair_tables
+
+DDL = """
+CREATE TABLE Department (id INT PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE);
+CREATE TABLE Employee (
+    id INT PRIMARY KEY,
+    department_id INT NOT NULL,
+    level ENUM('junior', 'senior') NOT NULL,
+    rating INT CHECK (rating BETWEEN 1 AND 5),
+    FOREIGN KEY (department_id) REFERENCES Department(id)
+);
+"""
+
+
+def make_tables():
+    return {
+        "Department": pd.DataFrame({"id": [1, 2], "name": ["Sales", "Ops"]}),
+        "Employee": pd.DataFrame({
+            "id": [1, 2, 2, 4],
+            "department_id": [1, 2, 9, 1],
+            "level": ["junior", "Senior", "intern", "senior"],
+            "rating": [3, 0, 5, 7],
+        }),
+    }
+
+
+def test_validate_reports_each_constraint():
+    violations = validate_tables(make_tables(), get_schema(DDL))
+    assert {v.table for v in violations} == {"Employee"}
+    assert {(v.column, v.rows) for v in violations} >= {("id", 1), ("department_id", 1), ("level", 2), ("rating", 2)}
+
+
+def test_repair_fixes_violations_and_keeps_clean_tables():
+    schema = get_schema(DDL)
+    tables = make_tables()
+    repaired, fixes = repair_tables(tables, schema, seed=0)
+    assert validate_tables(repaired, schema) == []
+    assert repaired["Department"] is tables["Department"]
+    assert {fix.table for fix in fixes} == {"Employee"}
+    employee = repaired["Employee"]
+    assert employee["department_id"].isin([1, 2]).all()
+    assert employee["rating"].between(1, 5).all()
+    assert set(employee["level"]) <= {"junior", "senior"}
+    assert tables["Employee"]["rating"].tolist() == [3, 0, 5, 7]  # the input is not modified
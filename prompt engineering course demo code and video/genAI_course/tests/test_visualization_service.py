@@ -0,0 +1,24 @@
+import pandas as pd
+import pytest
+
+from utils.visualization_service import infer_chart
+
+
+@pytest.mark.parametrize("column, aggregate", [
+    ("avg_age", "AVG"),
+    ("age", "AVG"),
+    ("AverageSalary", "AVG"),
+    ("success_rate", "AVG"),
+    ("percentage", "AVG"),
+    ("manager", "SUM"),
+    ("page_count", "SUM"),
+    ("total_usage", "SUM"),
+    ("headcount", "SUM"),
+    ("total_salary", "SUM"),
+    ("SalarySum", "SUM"),
+    ("score_count", "SUM"),
+])
+def test_aggregate_matches_whole_name_tokens(column, aggregate):
+    sample = pd.DataFrame({"department": ["a", "b"], column: [1, 2]})
+    spec = infer_chart(sample)
+    assert (spec.kind, spec.y, spec.aggregate) == ("bar", column, aggregate)
@@ -0,0 +1,203 @@
+import json
+import numpy as np
+import pandas as pd
+from utils.llm_client_service import generate_text
+from utils.schema_service import dependency_waves, INT_TYPES, FLOAT_TYPES, BOOL_TYPES
+from utils.storage_service import TableWriter
+from utils.tracing_service import span
+
+CHUNK_SIZE = 100_000
+NULL_FRACTION = 0.05
+DATE_START = np.datetime64("2015-01-01")
+DATE_SPAN_DAYS = 10 * 365
+
+_DATETIME_TYPES = {"DATETIME", "TIMESTAMP"}
+
+
+# ---------------------------
+# 📚 Vocabulary Seeding (LLM)
+# ---------------------------
+def _vocabulary_columns(schema) -> list:
+    """Free-text columns worth seeding: not keys, not unique, not enums."""
+    return [
+        f"{table.name}.{column.name}"
+        for table in schema
+        for column in table.columns
+        if column.base_type in ("VARCHAR", "CHAR", "TEXT", "NVARCHAR", "CHARACTER VARYING")
+        and not column.unique
+    ]
+
+
+def seed_vocabularies(schema, user_prompt: str = "", size: int = 30) -> dict:
+    """Ask the LLM once for small value lists (job titles, industries...) to sample from."""
+    columns = _vocabulary_columns(schema)
+    if not columns:
+        return {}
+    prompt = f"""
+    For each of these database columns, list {size} realistic, distinct example values.
+    Columns: {", ".join(columns)}
+    Context from the user: {user_prompt or "generic business data"}
+    The output should be in JSON format with the column names above as keys and lists of strings as values.
+    """
+    vocabularies = json.loads(generate_text(prompt, config={"response_mime_type": "application/json"}))
+    return {key: [str(v) for v in values] for key, values in vocabularies.items() if isinstance(values, list) and values}
+
+
+# ---------------------------
+# 🎲 Vectorized Column Synthesis
+# ---------------------------
+def _bounds(column, default_low, default_high):
+    low = column.check_min if column.check_min is not None else default_low
+    high = column.check_max if column.check_max is not None else default_high
+    return low, high
+
+
+def _unique_integers(column, ids):
+    """The row ids shifted to start at the CHECK minimum; raises when the CHECK range is too small."""
+    low = int(column.check_min) if column.check_min is not None else 1
+    values = ids + (low - 1)
+    if column.check_max is not None and len(values) and values[-1] > column.check_max:
+        raise ValueError(f"{column.name}: its CHECK range cannot hold {int(ids[-1]):,} distinct values")
+    return values
+
+
+def _unique_text(column, ids):
+    """Distinct text from the row ids: `<name>_<base-36 id>`, where only the name is ever cut to fit."""
+    name, length = column.name.lower(), column.length
+    suffix = "@example.com" if "email" in name else ""
+    if length is not None and length < len(suffix) + 8:  # keep room for "_" and a 7-character id
+        suffix = ""
+    values = []
+    for i in ids.tolist():
+        key = np.base_repr(i, 36).lower()
+        if length is not None and len(key) > length:
+            raise ValueError(f"{column.name}: {length} characters cannot hold {i:,} distinct values")
+        room = None if length is None else length - len(key) - len(suffix) - 1
+        # The id never contains "_", so values stay distinct whether or not the name fits
+        values.append(key if room is not None and room < 0 else f"{name[:room]}_{key}{suffix}")
+    return np.asarray(values, dtype=object)
+
+
+def _synthesize_column(column, ids, rng, vocabulary=None, parent_keys=None):
+    """Produce one chunk of values for a column; `ids` are the 1-based row numbers of the chunk."""
+    n = len(ids)
+    base_type = column.base_type
+
+    if parent_keys is not None and len(parent_keys):
+        return parent_keys[rng.integers(0, len(parent_keys), n)]
+    if column.auto_increment or (column.primary_key and column.unique and base_type in INT_TYPES):
+        return _unique_integers(column, ids)
+    if column.enum_values:
+        return np.asarray(column.enum_values, dtype=object)[rng.integers(0, len(column.enum_values), n)]
+    if base_type in INT_TYPES:
+        if column.unique:
+            return _unique_integers(column, ids)
+        low, high = _bounds(column, 0, 1000)
+        return rng.integers(int(low), int(high) + 1, n)
+    if base_type in FLOAT_TYPES:
+        digits = (column.precision or 10) - (column.scale or 0)
+        low, high = _bounds(column, 0, min(10 ** digits - 1, 100_000))
+        if column.scale is None:
+            return rng.uniform(low, high, n)
+        # Bounds snapped onto the DECIMAL grid so rounding never leaves an exclusive CHECK range
+        step = 10.0 ** -column.scale
+        low, high = np.ceil(low / step) * step, np.floor(high / step) * step
+        return rng.uniform(low, high, n).round(column.scale).clip(low, high)
+    if base_type == "DATE":
+        return DATE_START + rng.integers(0, DATE_SPAN_DAYS, n).astype("timedelta64[D]")
+    if base_type in _DATETIME_TYPES:
+        seconds = rng.integers(0, DATE_SPAN_DAYS * 86_400, n).astype("timedelta64[s]")
+        return DATE_START.astype("datetime64[s]") + seconds
+    if base_type in BOOL_TYPES:
+        return rng.integers(0, 2, n)
+
+    # Text: unique columns are derived from the row id, the rest sampled from a small vocabulary
+    if column.unique:
+        return _unique_text(column, ids)
+    name, length = column.name.lower(), column.length
+    if "phone" in name:
+        return np.asarray([f"555-{v}"[:length] for v in rng.integers(1_000_000, 9_999_999, n).tolist()], dtype=object)
+    vocabulary = vocabulary or [f"{column.name.replace('_', ' ').title()} {k}" for k in range(1, 51)]
+    vocabulary = np.asarray([value[:length] for value in vocabulary], dtype=object)
+    return vocabulary[rng.integers(0, len(vocabulary), n)]
+
+
+def _with_nulls(column, values, rng, null_fraction):
+    """Blank out a small share of nullable, non-key values."""
+    if column.not_null or column.unique or column.default is not None or not null_fraction:
+        return values
+    mask = rng.random(len(values)) < null_fraction
+    if not mask.any():
+        return values
+    array = pd.array(values)
+    array[mask] = None
+    return array
+
+
+def synthesize_chunk(table, start, size, rng, vocabularies=None, parent_keys=None, null_fraction=NULL_FRACTION):
+    """Build one DataFrame chunk of `size` rows starting at row number `start` (1-based)."""
+    ids = np.arange(start, start + size, dtype=np.int64)
+    fk_columns = {
+        column: (fk.ref_table, ref_column)
+        for fk in table.foreign_keys
+        for column, ref_column in zip(fk.columns, fk.ref_columns)
+    }
+    data = {}
+    for column in table.columns:
+        keys = (parent_keys or {}).get(fk_columns.get(column.name))
+        vocabulary = (vocabularies or {}).get(f"{table.name}.{column.name}")
+        values = _synthesize_column(column, ids, rng, vocabulary, keys)
+        data[column.name] = _with_nulls(column, values, rng, null_fraction) if keys is None else values
+    return pd.DataFrame(data)
+
+
+# ---------------------------
+# 🏭 Bulk Table Writer
+# ---------------------------
+def _referenced_keys(schema) -> set:
+    return {
+        (fk.ref_table, ref_column)
+        for table in schema
+        for fk in table.foreign_keys
+        for ref_column in fk.ref_columns
+    }
+
+
+def generate_bulk_tables(schema, rows_per_table, data_dir, vocabularies=None, seed=None,
+                         chunk_size=CHUNK_SIZE, null_fraction=NULL_FRACTION):
+    """Write every table to `data_dir` (Arrow + CSV) in chunks, parents before children.
+
+    `rows_per_table` is an int or a `{table: rows}` dict. Only the key columns that other
+    tables reference are kept in memory, so memory stays bounded by one chunk plus those keys.
+    Yields `(table, rows_written)` as each table finishes.
+    """
+    rng = np.random.default_rng(seed)
+    targets = rows_per_table if isinstance(rows_per_table, dict) else {t.name: rows_per_table for t in schema}
+    referenced = _referenced_keys(schema)
+    parent_keys = {}
+
+    for wave in dependency_waves(schema):
+        for name in wave:
+            table = schema[name]
+            total = int(targets.get(name, 0))
+            # Parents not generated yet (reference cycles) fall back to their auto-increment range
+            for fk in table.foreign_keys:
+                for ref_column in fk.ref_columns:
+                    if (fk.ref_table, ref_column) not in parent_keys:
+                        parent_total = max(1, int(targets.get(fk.ref_table, total)))
+                        parent_keys[(fk.ref_table, ref_column)] = np.arange(1, parent_total + 1, dtype=np.int64)
+
+            keep = [column for (table_name, column) in referenced if table_name == name]
+            kept = {column: [] for column in keep}
+            with span("synthesize_table", table=name, rows=total), TableWriter(data_dir, name) as writer:
+                for start in range(0, total, chunk_size) or [0]:
+                    size = min(chunk_size, total - start)
+                    chunk = synthesize_chunk(table, start + 1, size, rng, vocabularies, parent_keys, null_fraction)
+                    writer.write(chunk)
+                    for column in keep:
+                        if column in chunk:
+                            kept[column].append(chunk[column].to_numpy())
+            for column, parts in kept.items():
+                if parts:
+                    parent_keys[(name, column)] = np.concatenate(parts)
+            yield name, total
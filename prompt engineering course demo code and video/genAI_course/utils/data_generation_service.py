@@ -1,16 +1,22 @@
 import os
-from google import genai
-from dotenv import load_dotenv
-load_dotenv()
+import re
+import json
+import asyncio
+from utils.llm_client_service import generate_text, stream_text, agenerate_text
+from utils.schema_service import get_schema, dependency_waves
+from utils.tracing_service import span, increment
 
-# GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-LLM_MODEL = os.getenv('LLM_MODEL')
-client = genai.Client()
+TABLE_ATTEMPTS = int(os.getenv("GENERATION_TABLE_ATTEMPTS", "3"))
 
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    # "temperature": temperature,
+    # "max_output_tokens": max_tokens
+}
 
 
-def generate_from_ddl(ddl_content, user_prompt, temperature, max_tokens):
-    prompt = f"""
+def _build_generation_prompt(ddl_content, user_prompt):
+    return f"""
     I have a DDL schema for a database, that contains different tables and their relationships.
     
     Here is how the schema looks:
@@ -38,13 +44,274 @@ def generate_from_ddl(ddl_content, user_prompt, temperature, max_tokens):
     And this is the user prompt to generate data:
     {user_prompt}
     """
-    response = client.models.generate_content(
-        model=LLM_MODEL,
-        contents=prompt,
-        config={
-            "response_mime_type": "application/json",
-            # "temperature": temperature,
-            # "max_output_tokens": max_tokens
-        }
-    )
-    return response.text
\ No newline at end of file
+
+
+def generate_from_ddl(ddl_content, user_prompt, temperature, max_tokens):
+    return generate_text(_build_generation_prompt(ddl_content, user_prompt), config=GENERATION_CONFIG)
+
+
+# ---------------------------
+# 🌊 Streaming Generation
+# ---------------------------
+_STRUCTURAL = re.compile(r'[\\"\[\]{},]')
+
+
+class TableStreamParser:
+    """Incrementally parse a top-level `{table: [records]}` JSON object.
+
+    `feed()` returns every `(table, rows)` pair whose array closed in the new chunk,
+    and only the text of the table currently being streamed is kept in memory.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._skip = 0
+        self._depth = 0
+        self._in_string = False
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+        self.done = False
+
+    def feed(self, chunk: str) -> list:
+        self._buffer += chunk
+        tables = []
+        for match in _STRUCTURAL.finditer(self._buffer, self._pos):
+            i, ch = match.start(), match.group()
+            if i < self._skip:
+                continue
+            if self._in_string:
+                if ch == "\\":
+                    self._skip = i + 2
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(self._buffer[self._key_start:i + 1])
+                        self._key_start = None
+                continue
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = i
+            elif ch in "[{":
+                if self._depth == 1:
+                    self._value_start = i
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    tables.append((self._key, json.loads(self._buffer[self._value_start:i + 1])))
+                    self._value_start = None
+                elif self._depth == 0:
+                    self.done = True
+            elif ch == "," and self._depth == 1:
+                self._key = None
+        self._pos = len(self._buffer)
+
+        # Nothing before the cursor is needed unless a key or table is still open
+        if self._key_start is None and self._value_start is None:
+            self._skip = max(0, self._skip - self._pos)
+            self._buffer, self._pos = "", 0
+        return tables
+
+    def close(self):
+        """Raise if the stream ended before the top-level object was complete."""
+        if not self.done:
+            raise ValueError(f"Incomplete JSON: stream ended inside table '{self._key}'" if self._key else "Incomplete JSON")
+
+
+def valid_rows(rows) -> bool:
+    """A usable table: a non-empty list of records."""
+    return isinstance(rows, list) and bool(rows) and all(isinstance(row, dict) for row in rows)
+
+
+def salvage_tables(text: str) -> dict:
+    """Every complete, usable table in a (possibly truncated or malformed) `{table: [records]}` response."""
+    parser, tables = TableStreamParser(), {}
+    text = re.sub(r"^\s*```(?:json)?|```\s*$", "", text or "")
+    try:
+        # Fed in pieces, so a malformed table only loses itself, not the tables parsed before it
+        for start in range(0, len(text), 4096):
+            for name, rows in parser.feed(text[start:start + 4096]):
+                if valid_rows(rows):
+                    tables[name] = rows
+    except ValueError:
+        pass
+    return tables
+
+
+def generate_from_ddl_stream(ddl_content, user_prompt, temperature, max_tokens):
+    """Stream the generation and yield `(table, rows)` as soon as each table's array closes.
+
+    When the stream breaks off, ends in truncated JSON, or leaves tables out or unusable,
+    the complete tables are kept and only the missing ones are requested again, one call
+    per table, with the keys of the tables already generated.
+    """
+    parser, received = TableStreamParser(), {}
+    failure = None
+    try:
+        for chunk in stream_text(_build_generation_prompt(ddl_content, user_prompt), config=GENERATION_CONFIG):
+            for name, rows in parser.feed(chunk):
+                if valid_rows(rows):
+                    received[name] = rows
+                    yield name, rows
+        parser.close()
+    except Exception as e:  # a dropped stream, malformed or truncated JSON
+        failure = e
+
+    schema = get_schema(ddl_content)
+    if not schema.tables:
+        if failure is not None:
+            raise failure
+        return
+    known = {}
+    for name, rows in received.items():
+        table = schema.find(name)
+        if table is not None:
+            known[table.name] = rows
+    missing = [table.name for table in schema if table.name not in known]
+    if not missing:
+        return
+    increment("generation_repairs_total")
+    with span("repair_tables", missing=len(missing), salvaged=len(known)):
+        yield from _iterate(agenerate_tables(ddl_content, user_prompt, existing=known))
+
+
+# ---------------------------
+# 🕸️ Dependency-Aware Parallel Generation
+# ---------------------------
+def _build_table_prompt(table, user_prompt, parent_keys, rows_per_table):
+    if rows_per_table:
+        row_rule = f"Generate exactly {rows_per_table} records."
+    else:
+        row_rule = "Generate minimum 5 records, maximum 10 records, or if the user specifies otherwise in the prompt."
+    key_section = ""
+    if parent_keys:
+        key_lines = "\n".join(f"    {ref}: {json.dumps(values)}" for ref, values in parent_keys.items())
+        key_section = f"""
+    Foreign key columns must only use these existing parent key values:
+{key_lines}
+    """
+    return f"""
+    Generate sample data for this single table of a relational database:
+    ```
+    {table.ddl}
+    ```
+    {key_section}
+    Respect data types, null values, date and time formats, primary keys and unique values.
+    {row_rule}
+    The output should be in JSON format with the table name as key and list of records as value, like:
+    {{"{table.name}": [{{"column_1": 1, "column_2": "value"}}]}}
+
+    And this is the user prompt to generate data:
+    {user_prompt}
+    """
+
+
+def _parent_keys(table, results):
+    """Collect the referenced key values of already generated parent tables."""
+    parent_keys = {}
+    for fk in table.foreign_keys:
+        rows = results.get(fk.ref_table)
+        if not rows:
+            continue
+        for column, ref_column in zip(fk.columns, fk.ref_columns):
+            values = sorted({row[ref_column] for row in rows if row.get(ref_column) is not None}, key=str)
+            parent_keys[f"{table.name}.{column} -> {fk.ref_table}.{ref_column}"] = values
+    return parent_keys
+
+
+def _table_rows(name, payload):
+    """Pull one table's records out of a per-table response (salvaging a truncated one)."""
+    try:
+        payload = json.loads(payload)
+    except ValueError:
+        payload = salvage_tables(payload)
+        if not payload:
+            raise ValueError("response is not valid JSON")
+    rows = payload.get(name, next(iter(payload.values()), None)) if isinstance(payload, dict) else payload
+    if not valid_rows(rows):
+        raise ValueError("response is not a list of records")
+    return rows
+
+
+async def agenerate_tables(ddl_content, user_prompt, rows_per_table=None, existing: dict = None):
+    """Generate each table with its own LLM call, yielding `(table, rows)` as each finishes.
+
+    A table starts as soon as the parents it references are done, so independent tables
+    run concurrently and total time follows the slowest dependency chain. A response that
+    cannot be used is requested again (up to TABLE_ATTEMPTS calls per table). Tables in
+    `existing` are not generated again; their rows only supply keys to the other tables.
+    """
+    schema = get_schema(ddl_content)
+    if not schema.tables:
+        raise ValueError("No CREATE TABLE statements found in the DDL.")
+    results, tasks = dict(existing or {}), {}
+
+    async def generate_table(name, earlier):
+        table = schema[name]
+        parents = [tasks[parent] for parent in table.parents if parent in earlier]
+        if any(rows is None for _, rows, _ in await asyncio.gather(*parents)):
+            return name, None, "a parent table failed"
+        try:
+            with span("generate_table", table=name) as s:
+                prompt = _build_table_prompt(table, user_prompt, _parent_keys(table, results), rows_per_table)
+                for attempt in range(1, TABLE_ATTEMPTS + 1):
+                    try:
+                        rows = _table_rows(name, await agenerate_text(prompt, config=GENERATION_CONFIG))
+                        break
+                    except ValueError:
+                        if attempt == TABLE_ATTEMPTS:
+                            raise
+                        increment("generation_table_retries_total")
+                s.set(rows=len(rows), attempts=attempt)
+            results[name] = rows
+            return name, rows, None
+        except Exception as e:
+            return name, None, str(e)
+
+    async def already_generated(name):
+        return name, results[name], None
+
+    earlier = set()
+    for wave in dependency_waves(schema):
+        for name in wave:
+            if name in results:
+                tasks[name] = asyncio.ensure_future(already_generated(name))
+            else:
+                tasks[name] = asyncio.ensure_future(generate_table(name, set(earlier)))
+        earlier.update(wave)
+
+    failures = []
+    try:
+        for next_done in asyncio.as_completed([tasks[name] for name in tasks if name not in (existing or {})]):
+            name, rows, error = await next_done
+            if error:
+                failures.append(f"{name} ({error})")
+            else:
+                yield name, rows
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    if failures:
+        raise ValueError(f"Failed to generate tables: {', '.join(failures)}")
+
+
+def _iterate(tables):
+    """Drive an async generator of tables from synchronous code on a private event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(tables.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(tables.aclose())
+        loop.close()
+
+
+def generate_from_ddl_parallel(ddl_content, user_prompt, temperature, max_tokens, rows_per_table=None):
+    """Synchronous wrapper around `agenerate_tables` for Streamlit scripts."""
+    yield from _iterate(agenerate_tables(ddl_content, user_prompt, rows_per_table))
@@ -0,0 +1,209 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from utils.sql_cache_service import connect_store
+
+USAGE_PATH = os.getenv("TTYD_INDEX_USAGE_PATH", os.path.join(".cache", "index_usage.sqlite"))
+INDEX_THRESHOLD = int(os.getenv("TTYD_INDEX_THRESHOLD", "3"))
+
+_COMPARISON = r"(?:=|==|<>|!=|<=|>=|<|>|\bIN\b|\bLIKE\b|\bBETWEEN\b|\bIS\b)"
+_OPERAND = r'((?:"?\w+"?\.)?"?\w+"?)'
+
+
+def index_name(table: str, columns) -> str:
+    return f"ix_{table}_{'_'.join(columns)}"
+
+
+def create_index(conn, table: str, columns) -> str:
+    """CREATE INDEX IF NOT EXISTS on `table(columns)`; returns the index name."""
+    name = index_name(table, columns)
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_list})')
+    return name
+
+
+def _indexed_prefixes(conn, table: str) -> set:
+    """Leading-column tuples already served by an index, a PRIMARY KEY or the rowid."""
+    prefixes = set()
+    info = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+    keys = [row for row in info if row[5]]
+    if len(keys) == 1 and keys[0][2].upper() == "INTEGER":
+        prefixes.add((keys[0][1],))  # rowid alias
+    for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+        columns = tuple(row[2] for row in conn.execute(f'PRAGMA index_info("{index[1]}")').fetchall())
+        prefixes.update(columns[:n] for n in range(1, len(columns) + 1))
+    return prefixes
+
+
+# ---------------------------
+# 🏗️ Indexes from the DDL
+# ---------------------------
+def ddl_index_columns(table) -> list:
+    """Column tuples to index for one table: FOREIGN KEY columns and UNIQUE columns."""
+    wanted = [tuple(fk.columns) for fk in table.foreign_keys]
+    wanted += [(column.name,) for column in table.columns if column.unique and not column.primary_key]
+    return list(dict.fromkeys(wanted))
+
+
+def create_ddl_indexes(conn, schema, tables: list = None) -> list:
+    """Index the declared keys of every table in `conn`, or only `tables` (PRIMARY KEYs come with the table)."""
+    created = []
+    for (table_name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+        if tables is not None and table_name not in tables:
+            continue
+        table = schema.find(table_name) if schema else None
+        if table is None:
+            continue
+        present = {row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")').fetchall()}
+        existing = _indexed_prefixes(conn, table_name)
+        for columns in ddl_index_columns(table):
+            if set(columns) <= present and columns not in existing:
+                created.append(create_index(conn, table_name, columns))
+    return created
+
+
+# ---------------------------
+# 📈 Adaptive Indexes from Query Plans
+# ---------------------------
+def table_aliases(sql: str, tables) -> dict:
+    """Map every alias (and table name) used in the SQL to its table."""
+    aliases = {name.lower(): name for name in tables}
+    for name in tables:
+        for alias in re.findall(rf'\b"?{re.escape(name)}"?\s+(?:AS\s+)?([A-Za-z_]\w*)', sql, re.IGNORECASE):
+            aliases.setdefault(alias.lower(), name)
+    return aliases
+
+
+def _predicate_columns(sql: str) -> list:
+    """Operands on either side of a comparison: `[(qualifier or None, column)]`."""
+    operands = re.findall(rf"{_OPERAND}\s*{_COMPARISON}", sql, re.IGNORECASE)
+    operands += re.findall(rf"(?:=|<>|!=|<=|>=|<|>)\s*{_OPERAND}", sql)
+    result = []
+    for operand in operands:
+        parts = operand.replace('"', "").split(".")
+        result.append((parts[0], parts[1]) if len(parts) == 2 else (None, parts[0]))
+    return result
+
+
+def plan_candidates(sql: str, plan: list, tables: dict) -> set:
+    """Columns worth indexing according to one query plan.
+
+    `tables` maps table name -> set of column names. Automatic indexes SQLite had to build
+    for a join are taken as-is; full scans contribute the columns compared in the SQL.
+    """
+    aliases = table_aliases(sql, tables)
+    predicates = _predicate_columns(sql)
+    planned = [re.match(r"(?:SEARCH|SCAN) (\w+)", row[-1]) for row in plan]
+    used = {aliases.get(match.group(1).lower()) for match in planned if match} - {None}
+    candidates = set()
+    for row in plan:
+        detail = row[-1]
+        automatic = re.match(r"(?:SEARCH|SCAN) (\w+) USING AUTOMATIC (?:PARTIAL )?(?:COVERING )?INDEX \((.*)\)", detail)
+        scan = re.match(r"SCAN (\w+)$", detail)
+        if automatic:
+            table = aliases.get(automatic.group(1).lower())
+            columns = tuple(re.findall(r"(\w+)\s*[=<>]", automatic.group(2)))
+            if table and columns and set(columns) <= tables[table]:
+                candidates.add((table, columns))
+        elif scan and aliases.get(scan.group(1).lower()):
+            table = aliases[scan.group(1).lower()]
+            for qualifier, column in predicates:
+                if column not in tables[table]:
+                    continue
+                if qualifier is not None:
+                    owner = aliases.get(qualifier.lower())
+                else:
+                    # Unqualified: only when no other table in the query has that column
+                    owners = [name for name in used if column in tables[name]]
+                    owner = owners[0] if len(owners) == 1 else None
+                if owner == table:
+                    candidates.add((table, (column,)))
+    return candidates
+
+
+class IndexAdvisor:
+    """Count how often columns would have helped a query, and index them past a threshold.
+
+    Counts live in a small SQLite file so learned indexes are re-created when the query
+    database is rebuilt. The advisor never writes to the live database: callers build the
+    indexes `observe` returns into a copy and swap it in (see `talk_to_your_data_service`).
+    """
+
+    def __init__(self, path: str = USAGE_PATH, threshold: int = INDEX_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._building = set()
+        self._building_lock = threading.Lock()
+
+    def _connect(self):
+        return connect_store(self.path, "CREATE TABLE IF NOT EXISTS index_usage ("
+                                        "tbl TEXT, cols TEXT, hits INTEGER, PRIMARY KEY (tbl, cols))")
+
+    def record(self, candidates: set) -> list:
+        """Add one hit per candidate; return those that just reached the threshold."""
+        ready = []
+        if not candidates:
+            return ready
+        with self._lock, closing(self._connect()) as conn:
+            for table, columns in candidates:
+                cols = ",".join(columns)
+                conn.execute(
+                    "INSERT INTO index_usage VALUES (?, ?, 1) "
+                    "ON CONFLICT (tbl, cols) DO UPDATE SET hits = hits + 1",
+                    (table, cols),
+                )
+                hits = conn.execute("SELECT hits FROM index_usage WHERE tbl = ? AND cols = ?", (table, cols)).fetchone()[0]
+                if hits == self.threshold:
+                    ready.append((table, columns))
+            conn.commit()
+        return ready
+
+    def learned(self) -> list:
+        """`(table, columns)` pairs that crossed the threshold."""
+        if not os.path.exists(self.path):
+            return []
+        with self._lock, closing(self._connect()) as conn:
+            rows = conn.execute("SELECT tbl, cols FROM index_usage WHERE hits >= ?", (self.threshold,)).fetchall()
+        return [(table, tuple(cols.split(","))) for table, cols in rows]
+
+    def observe(self, sql: str, plan: list, tables: dict) -> list:
+        """Record the columns a query's plan scanned for; return the pairs that just crossed the threshold."""
+        try:
+            return self.record(plan_candidates(sql, plan, tables))
+        except sqlite3.Error:
+            return []  # usage statistics are best-effort
+
+    def claim(self, db_path: str, pairs: list) -> list:
+        """Mark pairs as being built for `db_path`; returns only those no other thread is building."""
+        with self._building_lock:
+            pairs = [pair for pair in pairs if (db_path, pair) not in self._building]
+            self._building.update((db_path, pair) for pair in pairs)
+        return pairs
+
+    def release(self, db_path: str, pairs: list):
+        with self._building_lock:
+            self._building.difference_update((db_path, pair) for pair in pairs)
+
+    def apply(self, conn, only: list = None, tables: list = None) -> list:
+        """Create learned indexes (or just `only`) on a writable connection, then refresh statistics.
+
+        `tables` limits the work to some tables; committing is left to the caller.
+        """
+        created = []
+        for table, columns in (only if only is not None else self.learned()):
+            if tables is not None and table not in tables:
+                continue
+            try:
+                present = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")').fetchall()}
+                if set(columns) <= present and columns not in _indexed_prefixes(conn, table):
+                    created.append(create_index(conn, table, columns))
+                    conn.execute(f'ANALYZE "{table}"')
+            except sqlite3.Error:
+                continue
+        return created
+
+
+index_advisor = IndexAdvisor()
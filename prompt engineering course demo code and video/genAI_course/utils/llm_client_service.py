@@ -0,0 +1,378 @@
+import os
+import time
+import asyncio
+import threading
+import weakref
+import contextvars
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from tenacity import Retrying, AsyncRetrying, stop_after_attempt, wait_random_exponential, retry_if_exception
+from utils.tracing_service import span, current_span, record_span, estimate_tokens, increment
+load_dotenv()
+
+LLM_MODEL = os.getenv('LLM_MODEL')
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+LLM_RETRY_ATTEMPTS = int(os.getenv('LLM_RETRY_ATTEMPTS', '4'))
+LLM_RETRY_MAX_WAIT = float(os.getenv('LLM_RETRY_MAX_WAIT', '20'))
+LLM_HEDGE = os.getenv('LLM_HEDGE', '0') == '1'
+LLM_HEDGE_QUANTILE = float(os.getenv('LLM_HEDGE_QUANTILE', '0.95'))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+
+
+# ---------------------------
+# 🔌 Backend Interface
+# ---------------------------
+class LLMBackend(ABC):
+    """Interface every model backend implements; only `generate` is required."""
+
+    @abstractmethod
+    def generate(self, prompt: str, config: dict) -> str:
+        """Return the model's full response text."""
+
+    async def agenerate(self, prompt: str, config: dict) -> str:
+        # Blocking backends run on a worker thread so the event loop stays free
+        return await asyncio.to_thread(self.generate, prompt, config)
+
+    def stream(self, prompt: str, config: dict):
+        # Backends without native streaming yield the whole response as one chunk
+        yield self.generate(prompt, config)
+
+
+class GeminiBackend(LLMBackend):
+    """Gemini backend with one lazily built, shared `genai.Client` (and its HTTP pool)."""
+
+    def __init__(self, model: str = None):
+        self.model = model or LLM_MODEL
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+                    self._client = genai.Client()
+        return self._client
+
+    def generate(self, prompt: str, config: dict) -> str:
+        response = self.client.models.generate_content(model=self.model, contents=prompt, config=config)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            current_span().set(prompt_tokens=usage.prompt_token_count, response_tokens=usage.candidates_token_count)
+        return response.text if response and response.text else ""
+
+    def stream(self, prompt: str, config: dict):
+        for chunk in self.client.models.generate_content_stream(model=self.model, contents=prompt, config=config):
+            if chunk and chunk.text:
+                yield chunk.text
+
+
+class LocalBackend(LLMBackend):
+    """Offline stand-in model for tests and benchmarks: `responder(prompt, config)` plus fixed latency."""
+
+    def __init__(self, responder=None, latency: float = 0.0, chunk_size: int = 256):
+        self.responder = responder or (lambda prompt, config: "")
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    def generate(self, prompt: str, config: dict) -> str:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.responder(prompt, config)
+
+    async def agenerate(self, prompt: str, config: dict) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.responder(prompt, config)
+
+    def stream(self, prompt: str, config: dict):
+        text = self.generate(prompt, config)
+        for start in range(0, len(text), self.chunk_size):
+            yield text[start:start + self.chunk_size]
+
+
+# ---------------------------
+# 🚦 Rate Limiting
+# ---------------------------
+class TokenBucket:
+    """Allow `rate` calls per second on average, with bursts of up to `capacity` calls.
+
+    Callers reserve a token and then wait out their own delay, so concurrent callers
+    (threads or tasks) are served in arrival order without polling.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token; return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def aacquire(self) -> float:
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+
+class RateLimitedBackend(LLMBackend):
+    """Wrap another backend so every call first takes a token from a shared bucket."""
+
+    def __init__(self, inner: LLMBackend, bucket: TokenBucket):
+        self.inner = inner
+        self.bucket = bucket
+
+    def generate(self, prompt: str, config: dict) -> str:
+        current_span().set(rate_wait_ms=round(self.bucket.acquire() * 1000, 2))
+        return self.inner.generate(prompt, config)
+
+    async def agenerate(self, prompt: str, config: dict) -> str:
+        current_span().set(rate_wait_ms=round(await self.bucket.aacquire() * 1000, 2))
+        return await self.inner.agenerate(prompt, config)
+
+    def stream(self, prompt: str, config: dict):
+        self.bucket.acquire()
+        yield from self.inner.stream(prompt, config)
+
+
+# ---------------------------
+# 🔁 Retries and Hedging
+# ---------------------------
+_TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+_TRANSIENT_TYPES = (ConnectionError, TimeoutError)
+try:
+    import httpx
+    _TRANSIENT_TYPES += (httpx.TransportError,)
+except ImportError:
+    pass
+
+
+def is_transient(error: BaseException) -> bool:
+    """Errors worth retrying: timeouts, dropped connections, rate limits and 5xx responses."""
+    if isinstance(error, _TRANSIENT_TYPES):
+        return True
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return isinstance(status, int) and status in _TRANSIENT_STATUS
+
+
+class LatencyTracker:
+    """Recent successful call durations, to derive the hedging threshold."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int = LLM_HEDGE_MIN_SAMPLES):
+        """The q-quantile of recent latencies, or None until there are enough samples."""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class ResilientBackend(LLMBackend):
+    """Wrap a backend with bounded, jittered retries of transient errors and optional hedging.
+
+    With hedging on, a call still running after the recent p95 latency gets a duplicate
+    request; whichever answers first wins, so one slow replica does not set the tail latency.
+    """
+
+    def __init__(self, inner: LLMBackend, attempts: int = LLM_RETRY_ATTEMPTS, max_wait: float = LLM_RETRY_MAX_WAIT,
+                 hedge: bool = LLM_HEDGE, hedge_quantile: float = LLM_HEDGE_QUANTILE):
+        self.inner = inner
+        self.attempts = max(1, attempts)
+        self.max_wait = max_wait
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.latency = LatencyTracker()
+        self._hedge_pool = None
+        self._pool_lock = threading.Lock()
+
+    def _retry_options(self) -> dict:
+        return {
+            "stop": stop_after_attempt(self.attempts),
+            "wait": wait_random_exponential(multiplier=0.5, max=self.max_wait),
+            "retry": retry_if_exception(is_transient),
+            "before_sleep": lambda state: increment("llm_retries_total"),
+            "reraise": True,
+        }
+
+    def _timed(self, prompt: str, config: dict) -> str:
+        started = time.perf_counter()
+        text = self.inner.generate(prompt, config)
+        self.latency.record(time.perf_counter() - started)
+        return text
+
+    async def _atimed(self, prompt: str, config: dict) -> str:
+        started = time.perf_counter()
+        text = await self.inner.agenerate(prompt, config)
+        self.latency.record(time.perf_counter() - started)
+        return text
+
+    def _hedge_after(self):
+        return self.latency.quantile(self.hedge_quantile) if self.hedge else None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._hedge_pool is None:
+            with self._pool_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY * 2,
+                                                          thread_name_prefix="llm-hedge")
+        return self._hedge_pool
+
+    def _generate_once(self, prompt: str, config: dict) -> str:
+        threshold = self._hedge_after()
+        if threshold is None:
+            return self._timed(prompt, config)
+        pool = self._pool()
+        calls = [pool.submit(contextvars.copy_context().run, self._timed, prompt, config)]
+        if not wait(calls, timeout=threshold).done:
+            increment("llm_hedged_total")
+            current_span().set(hedged=True)
+            calls.append(pool.submit(contextvars.copy_context().run, self._timed, prompt, config))
+        pending = set(calls)
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((call for call in done if call.exception() is None), None)
+            if winner is not None:
+                if winner is not calls[0]:
+                    increment("llm_hedge_wins_total")
+                return winner.result()
+            if not pending:
+                raise next(iter(done)).exception()
+
+    async def _agenerate_once(self, prompt: str, config: dict) -> str:
+        threshold = self._hedge_after()
+        if threshold is None:
+            return await self._atimed(prompt, config)
+        first = asyncio.ensure_future(self._atimed(prompt, config))
+        calls = [first]
+        done, _ = await asyncio.wait(calls, timeout=threshold)
+        if not done:
+            increment("llm_hedged_total")
+            current_span().set(hedged=True)
+            calls.append(asyncio.ensure_future(self._atimed(prompt, config)))
+        pending = set(calls)
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((call for call in done if call.exception() is None), None)
+                if winner is not None:
+                    if winner is not first:
+                        increment("llm_hedge_wins_total")
+                    return winner.result()
+                if not pending:
+                    raise next(iter(done)).exception()
+        finally:
+            for call in pending:
+                call.cancel()
+
+    def generate(self, prompt: str, config: dict) -> str:
+        for attempt in Retrying(**self._retry_options()):
+            with attempt:
+                return self._generate_once(prompt, config)
+
+    async def agenerate(self, prompt: str, config: dict) -> str:
+        async for attempt in AsyncRetrying(**self._retry_options()):
+            with attempt:
+                return await self._agenerate_once(prompt, config)
+
+    def stream(self, prompt: str, config: dict):
+        # Only opening the stream is retried; a stream that breaks off later is repaired by the caller
+        for attempt in Retrying(**self._retry_options()):
+            with attempt:
+                chunks = iter(self.inner.stream(prompt, config))
+                first = next(chunks, None)
+        if first is not None:
+            yield first
+            yield from chunks
+
+
+# ---------------------------
+# 🤝 Shared Client Access
+# ---------------------------
+_backend = None
+_backend_lock = threading.Lock()
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_backend() -> LLMBackend:
+    """Return the process-wide backend, building it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = LocalBackend() if LLM_BACKEND == "local" else ResilientBackend(GeminiBackend())
+    return _backend
+
+
+def set_backend(backend: LLMBackend):
+    """Swap the process-wide backend (e.g. a LocalBackend in tests and benchmarks)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def _loop_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return semaphore
+
+
+def generate_text(prompt: str, config: dict = None) -> str:
+    """Run one blocking LLM call through the shared backend."""
+    backend = get_backend()
+    with span("llm_call", backend=type(backend).__name__) as s:
+        text = backend.generate(prompt, config or {})
+        s.default(prompt_tokens=estimate_tokens(prompt), response_tokens=estimate_tokens(text))
+    return text
+
+
+def stream_text(prompt: str, config: dict = None):
+    """Yield the LLM response incrementally as text chunks."""
+    backend = get_backend()
+    started, characters = time.perf_counter(), 0
+    for chunk in backend.stream(prompt, config or {}):
+        characters += len(chunk)
+        yield chunk
+    record_span("llm_stream", started, backend=type(backend).__name__, prompt_tokens=estimate_tokens(prompt),
+                response_tokens=(characters + 3) // 4)
+
+
+async def agenerate_text(prompt: str, config: dict = None) -> str:
+    """Run one LLM call asynchronously, bounded by the concurrency limit."""
+    async with _loop_semaphore():
+        backend = get_backend()
+        with span("llm_call", backend=type(backend).__name__) as s:
+            text = await backend.agenerate(prompt, config or {})
+            s.default(prompt_tokens=estimate_tokens(prompt), response_tokens=estimate_tokens(text))
+        return text
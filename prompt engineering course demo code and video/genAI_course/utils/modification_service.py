@@ -0,0 +1,164 @@
+import re
+import json
+import sqlite3
+import pandas as pd
+from utils.llm_client_service import generate_text
+from utils.talk_to_your_data_service import clean_sql, write_table
+from utils.tracing_service import span
+
+SAMPLE_ROWS = 5
+ALLOWED_STATEMENTS = ("UPDATE", "INSERT", "DELETE", "ALTER", "WITH")
+_COLUMN_CHANGE = re.compile(
+    r"ALTER\s+TABLE\s+\S+\s+(ADD|DROP|RENAME\s+(COLUMN\s+)?(?!TO\b)\S+\s+TO)\b", re.IGNORECASE
+)
+
+# Authorizer actions a modification script may use; everything else (DROP, CREATE,
+# ATTACH, PRAGMA, transactions...) is denied while the script is prepared
+_WRITE_ACTIONS = {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE}
+_ALLOWED_ACTIONS = _WRITE_ACTIONS | {
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+    sqlite3.SQLITE_ALTER_TABLE,
+    sqlite3.SQLITE_TRANSACTION,  # the implicit BEGIN/COMMIT around DML; explicit ones fail validation
+}
+
+
+# ---------------------------
+# 📝 Transform Program via LLM
+# ---------------------------
+def _schema_section(tables: dict, ddl_schema: str) -> str:
+    if ddl_schema:
+        return ddl_schema
+    return "\n".join(
+        f"{name}({', '.join(f'{column} {dtype}' for column, dtype in df.dtypes.astype(str).items())})"
+        for name, df in tables.items()
+    )
+
+
+def build_modification_prompt(tables: dict, user_prompt: str, ddl_schema: str = "", sample_rows: int = SAMPLE_ROWS) -> str:
+    """Prompt with the schema and a few sample rows per table — never the full data."""
+    samples = {
+        name: json.loads(df.head(sample_rows).to_json(orient="records", date_format="iso"))
+        for name, df in tables.items()
+    }
+    return f"""
+    You modify the data of a SQLite database by writing a SQL script. You will NOT see the full data.
+
+    Schema:
+    ```
+    {_schema_section(tables, ddl_schema)}
+    ```
+
+    Row counts: {json.dumps({name: len(df) for name, df in tables.items()})}
+    Sample rows (first {sample_rows} of each table):
+    {json.dumps(samples, default=str)}
+
+    Write a SQLite script that applies this change to ALL rows of the affected tables:
+    {user_prompt}
+
+    Rules:
+    - Only use UPDATE, INSERT, DELETE and ALTER TABLE ... ADD/RENAME/DROP COLUMN statements.
+    - Only use these tables: {", ".join(tables)}.
+    - Use set-based statements (no per-row statements for existing data).
+    - Return only the SQL script, statements separated by semicolons.
+    """
+
+
+def generate_modification_script(tables: dict, user_prompt: str, ddl_schema: str = "") -> str:
+    """Ask the LLM for a transformation script instead of the modified data itself."""
+    with span("prompt_build") as s:
+        prompt = build_modification_prompt(tables, user_prompt, ddl_schema)
+        s.set(prompt_chars=len(prompt))
+    return clean_sql(generate_text(prompt, config={"temperature": 0.2, "max_output_tokens": 2000}))
+
+
+# ---------------------------
+# 🛡️ Script Validation
+# ---------------------------
+def split_statements(script: str) -> list:
+    """Split a script into complete SQL statements (semicolons inside strings are respected)."""
+    statements, start = [], 0
+    for match in re.finditer(";", script):
+        candidate = script[start:match.end()]
+        if sqlite3.complete_statement(candidate):
+            if candidate.strip(" \n\t;"):
+                statements.append(candidate.strip())
+            start = match.end()
+    if script[start:].strip():
+        statements.append(script[start:].strip() + ";")
+    return statements
+
+
+def validate_modification_script(script: str) -> list:
+    """Reject scripts that are empty or use statement kinds other than data/column changes."""
+    statements = split_statements(script)
+    if not statements:
+        raise ValueError("The model returned an empty modification script.")
+    for statement in statements:
+        body = re.sub(r"^\s*(--[^\n]*\n\s*)*", "", statement)
+        keyword = body.split(None, 1)[0].upper() if body else ""
+        if keyword not in ALLOWED_STATEMENTS:
+            raise ValueError(f"Statement not allowed in a modification script: {statement[:80]}")
+        if keyword == "ALTER" and not _COLUMN_CHANGE.match(body):
+            raise ValueError(f"Only column changes are allowed in ALTER TABLE: {statement[:80]}")
+    return statements
+
+
+# ---------------------------
+# ⚙️ Local Vectorized Execution
+# ---------------------------
+def apply_modification_script(tables: dict, script: str, schema=None) -> dict:
+    """Run the script over the full tables in SQLite and return only the tables it changed."""
+    statements = validate_modification_script(script)
+    conn = sqlite3.connect(":memory:")
+    try:
+        with span("sqlite_load") as s:
+            for name, df in tables.items():
+                write_table(conn, name, df, schema.find(name) if schema else None)
+            conn.commit()
+            s.set(tables=len(tables), rows=sum(len(df) for df in tables.values()))
+
+        written, pending = set(), set()
+
+        def authorizer(action, arg1, arg2, db_name, trigger):
+            if action not in _ALLOWED_ACTIONS:
+                return sqlite3.SQLITE_DENY
+            if action == sqlite3.SQLITE_ALTER_TABLE:
+                pending.add(arg2)
+            elif action in _WRITE_ACTIONS and not arg1.startswith("sqlite_"):
+                pending.add(arg1)
+            return sqlite3.SQLITE_OK
+
+        conn.set_authorizer(authorizer)
+        with span("apply_script", statements=len(statements)) as s:
+            loaded_changes = conn.total_changes
+            for statement in statements:
+                pending.clear()
+                before = conn.total_changes
+                try:
+                    conn.execute(statement)
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    raise ValueError(f"Modification script failed on `{statement[:80]}`: {e}") from e
+                if conn.total_changes != before or statement.lstrip().upper().startswith("ALTER"):
+                    written.update(pending)
+            conn.commit()
+            s.set(changed_rows=conn.total_changes - loaded_changes)
+        conn.set_authorizer(None)
+
+        with span("read_back", tables=len(written)):
+            return {
+                name: pd.read_sql_query(f'SELECT * FROM "{name}"', conn, dtype_backend="numpy_nullable")
+                for name in tables
+                if name in written
+            }
+    finally:
+        conn.close()
+
+
+def modify_tables(tables: dict, user_prompt: str, ddl_schema: str = "", schema=None):
+    """Generate a transform script from schema + samples, run it locally, return `(changed_tables, script)`."""
+    script = generate_modification_script(tables, user_prompt, ddl_schema)
+    return apply_modification_script(tables, script, schema), script
@@ -0,0 +1,171 @@
+import re
+import math
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from utils.schema_service import INT_TYPES, FLOAT_TYPES, DATE_TYPES, BOOL_TYPES
+
+TOP_K = 3
+MIN_CONFIDENCE = 1.0
+RELATIVE_CUTOFF = 0.3
+SAMPLE_VALUES = 20
+_NON_TEXT_TYPES = INT_TYPES | FLOAT_TYPES | DATE_TYPES | BOOL_TYPES
+
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "and", "or", "by", "with", "is", "are", "was",
+    "what", "which", "who", "how", "many", "much", "show", "list", "give", "me", "all", "each", "per",
+    "from", "that", "have", "has", "their", "there", "do", "does", "top", "get", "find", "plot", "chart",
+}
+
+
+def tokenize(text: str) -> list:
+    """Lower-case word tokens with camelCase/snake_case split and a light plural stem."""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", str(text))
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+# ---------------------------
+# 📚 BM25
+# ---------------------------
+class BM25:
+    """Minimal Okapi BM25 over pre-tokenized documents."""
+
+    def __init__(self, documents: dict, k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.terms = {key: Counter(tokens) for key, tokens in documents.items()}
+        self.lengths = {key: len(tokens) for key, tokens in documents.items()}
+        self.avg_length = (sum(self.lengths.values()) / len(self.lengths)) if self.lengths else 0
+        frequency = Counter(term for counts in self.terms.values() for term in counts)
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in frequency.items()}
+
+    def scores(self, query_tokens: list) -> dict:
+        result = {}
+        for key, counts in self.terms.items():
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[key] / (self.avg_length or 1))
+            for token in set(query_tokens):
+                tf = counts.get(token)
+                if tf:
+                    score += self.idf[token] * tf * (self.k1 + 1) / (tf + norm)
+            if score:
+                result[key] = score
+        return result
+
+
+# ---------------------------
+# 🎯 Schema Selection
+# ---------------------------
+@dataclass
+class SchemaSelection:
+    tables: list
+    ddl: str
+    pruned: bool
+    scores: dict = field(default_factory=dict)
+    columns: list = field(default_factory=list)
+    full_chars: int = 0
+    prompt_chars: int = 0
+
+    @property
+    def reduction(self) -> float:
+        """Share of the schema text removed from the prompt."""
+        return 1 - self.prompt_chars / self.full_chars if self.full_chars else 0.0
+
+
+def _comment_text(ddl: str) -> str:
+    return " ".join(re.findall(r"--([^\n]*)", ddl))
+
+
+def _sample_values(conn, table: str, column: str, limit: int) -> list:
+    try:
+        rows = conn.execute(
+            f'SELECT DISTINCT "{column}" FROM "{table}" WHERE typeof("{column}") = \'text\' LIMIT {int(limit)}'
+        ).fetchall()
+    except Exception:
+        return []
+    return [row[0] for row in rows]
+
+
+class SchemaIndex:
+    """Offline relevance index over table and column names, DDL comments, enums and sampled values."""
+
+    def __init__(self, schema, conn=None, sample_values: int = SAMPLE_VALUES):
+        self.schema = schema
+        table_docs, column_docs = {}, {}
+        for table in schema:
+            table_tokens = tokenize(table.name) + tokenize(_comment_text(table.ddl))
+            for column in table.columns:
+                tokens = tokenize(column.name) + tokenize(" ".join(column.enum_values))
+                comment = re.search(rf"\b{re.escape(column.name)}\b[^\n]*--([^\n]*)", table.ddl)
+                if comment:
+                    tokens += tokenize(comment.group(1))
+                if conn is not None and not column.enum_values and column.base_type not in _NON_TEXT_TYPES:
+                    tokens += tokenize(" ".join(map(str, _sample_values(conn, table.name, column.name, sample_values))))
+                column_docs[(table.name, column.name)] = tokens
+                table_tokens += tokenize(column.name)
+            table_docs[table.name] = table_tokens
+        self.tables = BM25(table_docs)
+        self.columns = BM25(column_docs)
+
+    def score(self, question: str) -> tuple:
+        """Return `(table_scores, column_scores)` for a question."""
+        tokens = tokenize(question)
+        table_scores = self.tables.scores(tokens)
+        column_scores = self.columns.scores(tokens)
+        for (table, _), score in column_scores.items():
+            table_scores[table] = table_scores.get(table, 0.0) + 0.5 * score
+        return table_scores, column_scores
+
+    def _with_neighbours(self, selected: list) -> list:
+        """Add referenced parent tables and junction tables linking selected tables."""
+        chosen = set(selected)
+        for name in selected:
+            chosen |= {parent for parent in self.schema[name].parents if parent in self.schema.tables}
+        for table in self.schema:
+            if len(table.parents & set(selected)) >= 2:
+                chosen.add(table.name)
+        return [table.name for table in self.schema if table.name in chosen]
+
+    def select(self, question: str, top_k: int = TOP_K, min_confidence: float = MIN_CONFIDENCE) -> SchemaSelection:
+        """Pick the top-k relevant tables (plus FK neighbours); fall back to the full schema when unsure."""
+        full_ddl = self.schema.ddl
+        table_scores, column_scores = self.score(question)
+        ranked = sorted(table_scores, key=table_scores.get, reverse=True)[:top_k]
+        all_tables = list(self.schema.tables)
+
+        if not ranked or table_scores[ranked[0]] < min_confidence:
+            return SchemaSelection(all_tables, full_ddl, False, table_scores, [], len(full_ddl), len(full_ddl))
+        # Drop weak matches that only ride along on a shared key column
+        ranked = [name for name in ranked if table_scores[name] >= RELATIVE_CUTOFF * table_scores[ranked[0]]]
+
+        tables = self._with_neighbours(ranked)
+        if len(tables) >= len(all_tables):
+            return SchemaSelection(all_tables, full_ddl, False, table_scores, [], len(full_ddl), len(full_ddl))
+
+        ddl = "\n\n".join(self.schema[name].ddl for name in tables)
+        columns = [f"{t}.{c}" for (t, c) in sorted(column_scores, key=column_scores.get, reverse=True) if t in tables][:10]
+        return SchemaSelection(tables, ddl, True, table_scores, columns, len(full_ddl), len(ddl))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_schema_index(schema, conn=None, data_version: str = "") -> SchemaIndex:
+    """Build the index once per schema and data version; later calls reuse it."""
+    key = (schema.digest, data_version)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            _indexes.clear()
+            index = _indexes[key] = SchemaIndex(schema, conn)
+    return index
@@ -0,0 +1,383 @@
+import os
+import re
+import math
+import hashlib
+from dataclasses import dataclass, field
+
+
+# ---------------------------
+# 🧱 Schema Model
+# ---------------------------
+@dataclass
+class Column:
+    name: str
+    type: str
+    constraints: str = ""
+    base_type: str = ""
+    length: int = None
+    precision: int = None
+    scale: int = None
+    enum_values: list = field(default_factory=list)
+    not_null: bool = False
+    unique: bool = False
+    primary_key: bool = False
+    auto_increment: bool = False
+    default: str = None
+    check_min: float = None
+    check_max: float = None
+
+
+@dataclass
+class ForeignKey:
+    columns: list
+    ref_table: str
+    ref_columns: list
+
+
+@dataclass
+class Table:
+    name: str
+    columns: list = field(default_factory=list)
+    primary_key: list = field(default_factory=list)
+    foreign_keys: list = field(default_factory=list)
+    ddl: str = ""
+
+    @property
+    def parents(self) -> set:
+        """Tables this one references, ignoring self-references."""
+        return {fk.ref_table for fk in self.foreign_keys if fk.ref_table != self.name}
+
+    def column(self, name: str) -> Column:
+        return next((column for column in self.columns if column.name == name), None)
+
+
+@dataclass
+class Schema:
+    tables: dict = field(default_factory=dict)
+    ddl: str = ""
+    digest: str = ""
+
+    def __getitem__(self, name: str) -> Table:
+        return self.tables[name]
+
+    def __iter__(self):
+        return iter(self.tables.values())
+
+    def find(self, name: str) -> Table:
+        """Look a table up by name, falling back to a case-insensitive match."""
+        if name in self.tables:
+            return self.tables[name]
+        return next((table for key, table in self.tables.items() if key.lower() == name.lower()), None)
+
+
+# ---------------------------
+# 🔤 Lexing
+# ---------------------------
+_LEXEME = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+def _lex(ddl: str):
+    """Return `(code, text)` views of the DDL with offsets aligned to the original.
+
+    `text` has comments blanked out; `code` additionally masks string literal contents,
+    so parentheses, commas or keywords inside `'...'` never affect the structure.
+    """
+    code, text, last = [], [], 0
+    for match in _LEXEME.finditer(ddl):
+        code.append(ddl[last:match.start()])
+        text.append(ddl[last:match.start()])
+        lexeme = match.group()
+        if lexeme.startswith("'"):
+            code.append("'" + "_" * (len(lexeme) - 2) + "'")
+            text.append(lexeme)
+        else:
+            blank = re.sub(r"[^\n]", " ", lexeme)
+            code.append(blank)
+            text.append(blank)
+        last = match.end()
+    code.append(ddl[last:])
+    text.append(ddl[last:])
+    return "".join(code), "".join(text)
+
+
+def _closing_paren(code: str, start: int) -> int:
+    """Index just past the parenthesis matching the one opened before `start`."""
+    depth, end = 1, start
+    while end < len(code) and depth:
+        depth += {"(": 1, ")": -1}.get(code[end], 0)
+        end += 1
+    return end
+
+
+def _split_top_level(code: str) -> list:
+    """Return `(start, end)` spans of comma-separated items that are not nested in parentheses."""
+    spans, depth, start = [], 0, 0
+    for i, ch in enumerate(code + ","):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            item = code[start:i]
+            if item.strip():
+                lead = len(item) - len(item.lstrip())
+                spans.append((start + lead, start + len(item.rstrip())))
+            start = i + 1
+    return spans
+
+
+# ---------------------------
+# 🔍 DDL Parsing
+# ---------------------------
+_CREATE_TABLE = re.compile(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`\"\[]?(\w+)[`\"\]]?\s*\(", re.IGNORECASE)
+_FOREIGN_KEY = re.compile(
+    r"FOREIGN\s+KEY\s*\(([^)]*)\)\s*REFERENCES\s+[`\"\[]?(\w+)[`\"\]]?\s*\(([^)]*)\)", re.IGNORECASE
+)
+_INLINE_REFERENCE = re.compile(r"REFERENCES\s+[`\"\[]?(\w+)[`\"\]]?\s*\(([^)]*)\)", re.IGNORECASE)
+_COLUMN_TYPE = re.compile(r"(\w+(?:\s+(?:PRECISION|VARYING|UNSIGNED))?)\s*(?:\(([^)]*)\))?", re.IGNORECASE)
+_DEFAULT = re.compile(r"\bDEFAULT\s+('[^']*'|[^\s,]+)", re.IGNORECASE)
+_BOUND = re.compile(r"(\w+)\s*(>=|<=|>|<)\s*(-?\d+(?:\.\d+)?)")
+_BETWEEN = re.compile(r"(\w+)\s+BETWEEN\s+(-?\d+(?:\.\d+)?)\s+AND\s+(-?\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def _identifiers(text: str) -> list:
+    return [part.strip().strip('`"[]') for part in text.split(",") if part.strip()]
+
+
+def _check_clause(code: str) -> str:
+    """Return the expression inside the first CHECK (...) clause, honouring nested parentheses."""
+    match = re.search(r"\bCHECK\s*\(", code, re.IGNORECASE)
+    if not match:
+        return ""
+    return code[match.end():_closing_paren(code, match.end()) - 1]
+
+
+def _apply_check(table: Table, expression: str):
+    """Turn simple range checks (`col >= 1 AND col <= 5`, `BETWEEN`) into inclusive column bounds.
+
+    A strict bound moves by one on integer columns and to the next representable float
+    otherwise, so `CHECK (salary > 0)` still admits 0.5.
+    """
+    for name, low, high in _BETWEEN.findall(expression):
+        column = table.column(name)
+        if column:
+            column.check_min, column.check_max = float(low), float(high)
+    for name, operator, value in _BOUND.findall(expression):
+        column = table.column(name)
+        if column is None:
+            continue
+        bound, strict = float(value), len(operator) == 1
+        if strict and column.base_type in INT_TYPES:
+            bound = math.floor(bound) + 1 if operator == ">" else math.ceil(bound) - 1
+        elif strict:
+            bound = math.nextafter(bound, math.inf if operator == ">" else -math.inf)
+        if operator.startswith(">"):
+            column.check_min = bound
+        else:
+            column.check_max = bound
+
+
+def _parse_column(code: str, text: str) -> Column:
+    name_match = re.match(r"\S+\s*", code)
+    offset = name_match.end()
+    match = _COLUMN_TYPE.match(code, offset)
+    type_end = match.end() if match else offset
+    constraints_code = code[type_end:].strip()
+    column = Column(
+        name=text[:name_match.end()].strip().strip('`"[]'),
+        type=text[offset:type_end].strip(),
+        constraints=text[type_end:].strip(),
+    )
+    if match:
+        column.base_type = re.sub(r"\s+", " ", match.group(1)).upper()
+        if match.group(2):
+            args = text[match.start(2):match.end(2)]
+            if column.base_type in ("ENUM", "SET"):
+                column.enum_values = [value.replace("''", "'") for value in re.findall(r"'((?:[^']|'')*)'", args)]
+            else:
+                numbers = [int(n) for n in re.findall(r"\d+", args)]
+                if column.base_type in ("DECIMAL", "NUMERIC") and numbers:
+                    column.precision = numbers[0]
+                    column.scale = numbers[1] if len(numbers) > 1 else 0
+                elif numbers:
+                    column.length = numbers[0]
+    upper = constraints_code.upper()
+    column.not_null = bool(re.search(r"\bNOT\s+NULL\b", upper))
+    column.primary_key = bool(re.search(r"\bPRIMARY\s+KEY\b", upper))
+    column.unique = column.primary_key or bool(re.search(r"\bUNIQUE\b", upper))
+    column.auto_increment = bool(re.search(r"\bAUTO_?INCREMENT\b|\bIDENTITY\b", upper))
+    default = _DEFAULT.search(code, type_end)
+    if default:
+        value = text[default.start(1):default.end(1)]
+        column.default = value[1:-1].replace("''", "'") if value.startswith("'") else value
+    return column
+
+
+def _parse_table(name: str, code: str, text: str, ddl: str) -> Table:
+    table = Table(name=name, ddl=ddl)
+    checks = []
+    for start, end in _split_top_level(code):
+        item_code, item_text = code[start:end], text[start:end]
+        keyword = item_code.split(None, 1)[0].upper()
+        if keyword == "CONSTRAINT":
+            # Skip `CONSTRAINT <name>` and parse the constraint itself
+            skip = re.match(r"CONSTRAINT\s+\S+\s*", item_code, re.IGNORECASE)
+            item_code, item_text = item_code[skip.end():], item_text[skip.end():]
+            keyword = item_code.split(None, 1)[0].upper() if item_code else ""
+        if keyword == "PRIMARY":
+            table.primary_key = _identifiers(item_code[item_code.index("(") + 1:item_code.rindex(")")])
+        elif keyword == "FOREIGN":
+            match = _FOREIGN_KEY.search(item_code)
+            if match:
+                table.foreign_keys.append(
+                    ForeignKey(_identifiers(match.group(1)), match.group(2), _identifiers(match.group(3)))
+                )
+        elif keyword == "UNIQUE":
+            columns = _identifiers(item_code[item_code.index("(") + 1:item_code.rindex(")")]) if "(" in item_code else []
+            if len(columns) == 1 and table.column(columns[0]):
+                table.column(columns[0]).unique = True
+        elif keyword == "CHECK":
+            checks.append(_check_clause(item_code))
+        elif keyword in ("INDEX", "KEY", ""):
+            continue
+        else:
+            column = _parse_column(item_code, item_text)
+            table.columns.append(column)
+            if column.primary_key:
+                table.primary_key = [column.name]
+            reference = _INLINE_REFERENCE.search(item_code)
+            if reference:
+                table.foreign_keys.append(ForeignKey([column.name], reference.group(1), _identifiers(reference.group(2))))
+            checks.append(_check_clause(item_code))
+
+    for expression in filter(None, checks):
+        _apply_check(table, expression)
+    for name in table.primary_key:
+        column = table.column(name)
+        if column:
+            column.primary_key = column.not_null = True
+            column.unique = len(table.primary_key) == 1
+    return table
+
+
+def parse_ddl(ddl: str) -> Schema:
+    """Parse CREATE TABLE statements into tables, columns, types, keys, enums and checks."""
+    schema = Schema(ddl=ddl)
+    code, text = _lex(ddl)
+    for match in _CREATE_TABLE.finditer(code):
+        end = _closing_paren(code, match.end())
+        statement_end = code.find(";", end)
+        statement_end = len(code) if statement_end == -1 else statement_end + 1
+        name = match.group(1)
+        schema.tables[name] = _parse_table(
+            name, code[match.end():end - 1], text[match.end():end - 1], ddl[match.start():statement_end]
+        )
+    return schema
+
+
+_schema_cache = {}
+
+
+def get_schema(ddl: str) -> Schema:
+    """Parse a DDL once per distinct content; later calls reuse the cached schema."""
+    digest = hashlib.sha256(ddl.encode("utf-8")).hexdigest()
+    schema = _schema_cache.get(digest)
+    if schema is None:
+        schema = parse_ddl(ddl)
+        schema.digest = digest
+        _schema_cache[digest] = schema
+    return schema
+
+
+def load_schema(path: str) -> Schema:
+    """Read a DDL file and return its cached, parsed schema (keyed by the file's hash)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return get_schema(f.read())
+
+
+def default_schema_path(schema_dir: str = "schema"):
+    """The DDL file the app uses: the first file in schema/, or None when there is none."""
+    files = os.listdir(schema_dir) if os.path.isdir(schema_dir) else []
+    return os.path.join(schema_dir, files[0]) if files else None
+
+
+# ---------------------------
+# 🕸️ Dependency Graph
+# ---------------------------
+def dependency_graph(schema: Schema) -> dict:
+    """Map each table to the set of tables it references through FOREIGN KEY clauses."""
+    return {table.name: {p for p in table.parents if p in schema.tables} for table in schema}
+
+
+def dependency_waves(schema: Schema) -> list:
+    """Group tables into topological waves; tables in one wave only depend on earlier waves.
+
+    Tables caught in a reference cycle are placed together in a final wave.
+    """
+    remaining = dependency_graph(schema)
+    waves, done = [], set()
+    while remaining:
+        wave = sorted(name for name, parents in remaining.items() if parents <= done)
+        if not wave:
+            waves.append(sorted(remaining))
+            break
+        waves.append(wave)
+        done.update(wave)
+        for name in wave:
+            del remaining[name]
+    return waves
+
+
+# ---------------------------
+# 🐼 pandas / SQLite Type Mapping
+# ---------------------------
+INT_TYPES = {"INT", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "MEDIUMINT", "SERIAL"}
+FLOAT_TYPES = {"DECIMAL", "NUMERIC", "FLOAT", "DOUBLE", "DOUBLE PRECISION", "REAL"}
+DATE_TYPES = {"DATE", "DATETIME", "TIMESTAMP"}
+BOOL_TYPES = {"BOOL", "BOOLEAN", "BIT"}
+
+
+def pandas_dtypes(table: Table) -> dict:
+    """Explicit `read_csv` dtypes: nullable fixed-width numerics, categoricals for ENUMs, strings for text."""
+    dtypes = {}
+    for column in table.columns:
+        if column.enum_values:
+            dtypes[column.name] = "category"
+        elif column.base_type in INT_TYPES:
+            dtypes[column.name] = "Int64"
+        elif column.base_type in FLOAT_TYPES:
+            dtypes[column.name] = "float64"
+        elif column.base_type in BOOL_TYPES:
+            dtypes[column.name] = "boolean"
+        elif column.base_type not in DATE_TYPES:
+            dtypes[column.name] = "string[pyarrow]"
+    return dtypes
+
+
+def date_columns(table: Table) -> list:
+    """Columns to hand to `read_csv(parse_dates=...)`."""
+    return [column.name for column in table.columns if column.base_type in DATE_TYPES]
+
+
+def sqlite_affinity(column: Column) -> str:
+    if column.base_type in INT_TYPES or column.base_type in BOOL_TYPES:
+        return "INTEGER"
+    if column.base_type in FLOAT_TYPES:
+        return "REAL"
+    return "TEXT"
+
+
+def sqlite_create_table(name: str, table: Table, columns: list, primary_key: bool = True) -> str:
+    """CREATE TABLE statement for SQLite with proper affinities and the DDL's PRIMARY KEY.
+
+    `columns` are the columns actually present in the data; columns (or whole tables)
+    missing from the DDL get no declared type.
+    """
+    definitions = []
+    for column_name in columns:
+        column = table.column(column_name) if table else None
+        definitions.append(f'"{column_name}" {sqlite_affinity(column)}' if column else f'"{column_name}"')
+    keys = [f'"{key}"' for key in (table.primary_key if table else []) if key in columns]
+    if primary_key and keys:
+        definitions.append(f"PRIMARY KEY ({', '.join(keys)})")
+    return f'CREATE TABLE "{name}" ({", ".join(definitions)})'
@@ -0,0 +1,157 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import closing
+
+CACHE_PATH = os.getenv("SQL_CACHE_PATH", os.path.join(".cache", "sql_cache.sqlite"))
+CACHE_SIZE = int(os.getenv("SQL_CACHE_SIZE", "256"))
+CACHE_TTL = float(os.getenv("SQL_CACHE_TTL", "3600"))
+
+
+# ---------------------------
+# 💾 Local SQLite Stores
+# ---------------------------
+_ready_stores = set()
+
+
+def connect_store(path: str, create_sql: str) -> sqlite3.Connection:
+    """Connect to a small SQLite file under .cache/, creating its folder and table on first use."""
+    key = (os.path.abspath(path), create_sql)
+    if key not in _ready_stores:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5)
+    if key not in _ready_stores:
+        conn.execute(create_sql)
+        conn.commit()
+        _ready_stores.add(key)
+    return conn
+
+
+# ---------------------------
+# 🔑 Cache Keys
+# ---------------------------
+def normalize_question(question: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?.!")
+
+
+def schema_fingerprint(ddl_schema: str, tables, data_version: str = "") -> str:
+    """Hash the DDL, the table set and the data version into one fingerprint."""
+    digest = hashlib.sha1()
+    digest.update((ddl_schema or "").encode())
+    digest.update(",".join(sorted(tables)).encode())
+    digest.update((data_version or "").encode())
+    return digest.hexdigest()
+
+
+def _cache_key(question: str, fingerprint: str) -> str:
+    return hashlib.sha1(f"{fingerprint}:{normalize_question(question)}".encode()).hexdigest()
+
+
+# ---------------------------
+# 🗃️ Two-Level SQL Cache
+# ---------------------------
+class SQLCache:
+    """In-process LRU with TTL in front of a persistent SQLite cache file."""
+
+    def __init__(self, path: str = CACHE_PATH, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = None
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _connect(self):
+        return connect_store(self.path, "CREATE TABLE IF NOT EXISTS sql_cache ("
+                                        "key TEXT PRIMARY KEY, fingerprint TEXT, question TEXT, sql TEXT, created REAL)")
+
+    def _switch_fingerprint(self, fingerprint: str):
+        """Drop in-memory entries when the schema or data changes (caller holds the lock)."""
+        if fingerprint != self._fingerprint:
+            self._memory.clear()
+            self._fingerprint = fingerprint
+
+    def get(self, question: str, fingerprint: str):
+        """Return the cached SQL for a question, or None on a miss."""
+        key = _cache_key(question, fingerprint)
+        with self._lock:
+            self._switch_fingerprint(fingerprint)
+            entry = self._memory.get(key)
+            if entry and time.time() - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT sql, created FROM sql_cache WHERE key = ? AND fingerprint = ? AND created > ?",
+                    (key, fingerprint, time.time() - self.ttl),
+                ).fetchone()
+        except sqlite3.Error:
+            row = None
+
+        with self._lock:
+            if row:
+                self._remember(key, row[0], row[1])  # expires when the disk entry does
+                self._counters["disk_hits"] += 1
+                return row[0]
+            self._counters["misses"] += 1
+        return None
+
+    def put(self, question: str, fingerprint: str, sql: str):
+        """Store SQL for a question; evict expired entries and those built for an older schema or data version."""
+        key = _cache_key(question, fingerprint)
+        now = time.time()
+        with self._lock:
+            self._switch_fingerprint(fingerprint)
+            self._remember(key, sql, now)
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    "DELETE FROM sql_cache WHERE fingerprint != ? OR created <= ?", (fingerprint, now - self.ttl)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO sql_cache VALUES (?, ?, ?, ?, ?)",
+                    (key, fingerprint, normalize_question(question), sql, now),
+                )
+                conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def _remember(self, key: str, sql: str, created: float):
+        self._memory[key] = (sql, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """Empty both cache levels and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute("DELETE FROM sql_cache")
+                conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for both levels."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            stats["memory_size"] = len(self._memory)
+        return stats
+
+
+sql_cache = SQLCache()
@@ -0,0 +1,229 @@
+import io
+import os
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from utils.schema_service import pandas_dtypes, date_columns
+
+# Arrow IPC (uncompressed) is the primary copy: it is memory-mapped on read, so previews and
+# column projections only touch the pages they need. CSV is kept alongside for humans/downloads.
+STORAGE_FORMATS = tuple(f.strip() for f in os.getenv("DATA_STORAGE_FORMATS", "arrow,csv").split(",") if f.strip())
+SUFFIXES = {"arrow": ".arrow", "csv": ".csv"}
+PREVIEW_ROWS = 1000
+_ARROW_STRINGS = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+
+
+def table_path(data_dir: str, name: str, fmt: str) -> str:
+    return os.path.join(data_dir, f"{name}{SUFFIXES[fmt]}")
+
+
+def list_tables(data_dir: str) -> list:
+    """Names of all tables stored in the data folder, in any format."""
+    if not os.path.exists(data_dir):
+        return []
+    names = {
+        file[:-len(suffix)]
+        for file in os.listdir(data_dir)
+        for suffix in SUFFIXES.values()
+        if file.endswith(suffix)
+    }
+    return sorted(names)
+
+
+def _mtime(path: str) -> int:
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else -1
+
+
+def _arrow_is_fresh(data_dir: str, name: str) -> bool:
+    """The Arrow copy is usable unless a CSV was written after it (e.g. edited by hand)."""
+    arrow_mtime = _mtime(table_path(data_dir, name, "arrow"))
+    return arrow_mtime >= 0 and arrow_mtime >= _mtime(table_path(data_dir, name, "csv"))
+
+
+def _csv_is_fresh(data_dir: str, name: str) -> bool:
+    csv_mtime = _mtime(table_path(data_dir, name, "csv"))
+    return csv_mtime >= 0 and csv_mtime >= _mtime(table_path(data_dir, name, "arrow"))
+
+
+def _mark_in_sync(paths: dict):
+    """Give both copies the same mtime so each counts as current until one is rewritten."""
+    if "csv" in paths and "arrow" in paths and os.path.exists(paths["csv"]) and os.path.exists(paths["arrow"]):
+        mtime = os.stat(paths["csv"]).st_mtime_ns
+        os.utime(paths["arrow"], ns=(mtime, mtime))
+
+
+# ---------------------------
+# ✍️ Writing
+# ---------------------------
+def _unique_tmp(path: str) -> str:
+    """A temp name no other process or thread writes to (readers convert CSVs concurrently)."""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _write_arrow(path: str, arrow_table: pa.Table):
+    tmp_path = _unique_tmp(path)
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_table(data_dir: str, name: str, df: pd.DataFrame, formats=STORAGE_FORMATS):
+    """Save a table in every configured format (atomically, so readers never see partial files)."""
+    os.makedirs(data_dir, exist_ok=True)
+    paths = {fmt: table_path(data_dir, name, fmt) for fmt in formats}
+    if "csv" in paths:
+        tmp_path = _unique_tmp(paths["csv"])
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, paths["csv"])
+    if "arrow" in paths:
+        _write_arrow(paths["arrow"], pa.Table.from_pandas(df, preserve_index=False))
+    _mark_in_sync(paths)
+
+
+class TableWriter:
+    """Append DataFrame chunks to a table's files without holding the whole table in memory."""
+
+    def __init__(self, data_dir: str, name: str, formats=STORAGE_FORMATS):
+        os.makedirs(data_dir, exist_ok=True)
+        self.paths = {fmt: table_path(data_dir, name, fmt) for fmt in formats}
+        self._arrow_sink = self._arrow_writer = self._arrow_schema = None
+        self._csv_started = False
+        self.rows = 0
+
+    def write(self, chunk: pd.DataFrame):
+        if "csv" in self.paths:
+            chunk.to_csv(f"{self.paths['csv']}.tmp", index=False, mode="a" if self._csv_started else "w",
+                         header=not self._csv_started)
+            self._csv_started = True
+        if "arrow" in self.paths:
+            batch = pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+            if self._arrow_writer is None:
+                self._arrow_sink = pa.OSFile(f"{self.paths['arrow']}.tmp", "wb")
+                self._arrow_schema = batch.schema
+                self._arrow_writer = pa.ipc.new_file(self._arrow_sink, batch.schema)
+            if not batch.schema.equals(self._arrow_schema):
+                # A later chunk may infer a different type (e.g. int64 vs. nullable Int64)
+                batch = batch.cast(self._arrow_schema)
+            self._arrow_writer.write_batch(batch)
+        self.rows += len(chunk)
+
+    def close(self):
+        if self._arrow_writer is not None:
+            self._arrow_writer.close()
+            self._arrow_sink.close()
+        if "csv" in self.paths and self._csv_started:
+            os.replace(f"{self.paths['csv']}.tmp", self.paths["csv"])
+        if "arrow" in self.paths and self._arrow_writer is not None:
+            os.replace(f"{self.paths['arrow']}.tmp", self.paths["arrow"])
+        _mark_in_sync(self.paths)
+
+    def abort(self):
+        """Discard the partial `.tmp` files; the live table files are left as they were."""
+        if self._arrow_writer is not None:
+            self._arrow_writer.close()
+            self._arrow_sink.close()
+        for path in self.paths.values():
+            if os.path.exists(f"{path}.tmp"):
+                os.remove(f"{path}.tmp")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# ---------------------------
+# 📖 Reading
+# ---------------------------
+def read_table_csv(file_path: str, table=None) -> pd.DataFrame:
+    """Read one CSV, using the schema's dtypes and date columns when the table is known."""
+    if table is None:
+        return pd.read_csv(file_path)
+    header = set(pd.read_csv(file_path, nrows=0).columns)
+    dtypes = {column: dtype for column, dtype in pandas_dtypes(table).items() if column in header}
+    dates = [column for column in date_columns(table) if column in header]
+    try:
+        return pd.read_csv(file_path, dtype=dtypes, parse_dates=dates)
+    except (ValueError, TypeError):
+        # Data drifted from the declared types (e.g. text in an INT column): type what still fits
+        return apply_dtypes(pd.read_csv(file_path, parse_dates=dates), table)
+
+
+def apply_dtypes(df: pd.DataFrame, table) -> pd.DataFrame:
+    """Cast columns to the schema's dtypes and dates, keeping a column as is when its data no longer fits."""
+    for column, dtype in pandas_dtypes(table).items():
+        if column in df and df[column].dtype != dtype:
+            series = df[column]
+            if dtype == "category" and pd.api.types.is_string_dtype(series):
+                series = series.astype(object)  # same categories dtype as read_csv produces
+            try:
+                df[column] = series.astype(dtype)
+            except (ValueError, TypeError):
+                pass
+    for column in date_columns(table):
+        if column in df and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            try:
+                df[column] = pd.to_datetime(df[column])
+            except (ValueError, TypeError):
+                pass
+    return df
+
+
+def read_arrow(data_dir: str, name: str, columns: list = None) -> pa.Table:
+    """Memory-map the Arrow copy; selecting columns/slices does not copy the buffers."""
+    source = pa.memory_map(table_path(data_dir, name, "arrow"), "r")
+    arrow_table = pa.ipc.open_file(source).read_all()
+    if columns:
+        arrow_table = arrow_table.select([column for column in columns if column in arrow_table.column_names])
+    return arrow_table
+
+
+def read_table(data_dir: str, name: str, columns: list = None, table=None) -> pd.DataFrame:
+    """Load one table: the memory-mapped Arrow copy when fresh, otherwise the CSV (typed by `table` either way).
+
+    A CSV without a fresh Arrow copy is converted once, so later reads are mapped instead of parsed.
+    """
+    if _arrow_is_fresh(data_dir, name):
+        if table is None:
+            return read_arrow(data_dir, name, columns).to_pandas()
+        # Arrow strings go straight to string[pyarrow] (no Python objects); apply_dtypes does the rest
+        return apply_dtypes(read_arrow(data_dir, name, columns).to_pandas(types_mapper=_ARROW_STRINGS.get), table)
+    df = read_table_csv(table_path(data_dir, name, "csv"), table)
+    if "arrow" in STORAGE_FORMATS:
+        paths = {fmt: table_path(data_dir, name, fmt) for fmt in ("csv", "arrow")}
+        try:
+            _write_arrow(paths["arrow"], pa.Table.from_pandas(df, preserve_index=False))
+            _mark_in_sync(paths)
+        except (pa.ArrowException, OSError):
+            pass
+    return df[[column for column in columns if column in df.columns]] if columns else df
+
+
+def read_preview(data_dir: str, name: str, rows: int = PREVIEW_ROWS, columns: list = None):
+    """Return `(first rows, total row count)` without parsing or copying the whole table."""
+    if _arrow_is_fresh(data_dir, name):
+        arrow_table = read_arrow(data_dir, name, columns)
+        return arrow_table.slice(0, rows).to_pandas(), arrow_table.num_rows
+    path = table_path(data_dir, name, "csv")
+    with open(path, "rb") as f:
+        total = max(0, sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b"")) - 1)
+    return pd.read_csv(path, nrows=rows, usecols=columns), total
+
+
+def export_csv(data_dir: str, name: str) -> bytes:
+    """CSV bytes for downloads: the stored CSV if current, otherwise streamed from Arrow."""
+    if _csv_is_fresh(data_dir, name):
+        with open(table_path(data_dir, name, "csv"), "rb") as f:
+            return f.read()
+    buffer = io.BytesIO()
+    pa_csv.write_csv(read_arrow(data_dir, name), buffer)
+    return buffer.getvalue()
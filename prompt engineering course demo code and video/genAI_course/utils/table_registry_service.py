@@ -0,0 +1,154 @@
+import os
+import hashlib
+import threading
+from dataclasses import dataclass
+from utils.storage_service import SUFFIXES, list_tables, table_path
+
+DEBOUNCE_SECONDS = 0.5
+
+
+@dataclass
+class FileState:
+    path: str
+    mtime_ns: int
+    size: int
+    digest: str
+
+
+def content_hash(path: str) -> str:
+    """Hash a file's bytes in 1 MB blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _current_file(data_dir: str, name: str):
+    """The file a reader would load: the newer of CSV/Arrow, the CSV when both are in sync."""
+    candidates = []
+    for fmt in ("csv", "arrow"):
+        path = table_path(data_dir, name, fmt)
+        try:
+            candidates.append((os.stat(path), fmt == "csv", path))
+        except FileNotFoundError:
+            continue
+    if not candidates:
+        return None, None
+    stat, _, path = max(candidates, key=lambda c: (c[0].st_mtime_ns, c[1]))
+    return path, stat
+
+
+# ---------------------------
+# 🗂️ Table Registry
+# ---------------------------
+class TableRegistry:
+    """Per-table file state (mtime, size, content hash) for one data folder.
+
+    `scan()` only hashes files whose mtime or size moved, and reports a table as changed
+    only when its content did. A watchdog observer rescans shortly after files change,
+    so the hashing is usually done before anyone asks; `version` counts content changes,
+    which sessions compare on their next rerun to notice new data.
+    """
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self.version = 0
+        self.last_changes = (set(), set())
+        self._states = {}
+        self._lock = threading.RLock()
+        self._observer = None
+        self._timer = None
+
+    def scan(self):
+        """Refresh the file states; return `(changed, removed)` table names."""
+        with self._lock:
+            names = set(list_tables(self.data_dir))
+            changed = set()
+            for name in names:
+                path, stat = _current_file(self.data_dir, name)
+                if path is None:
+                    continue
+                previous = self._states.get(name)
+                if previous and (previous.path, previous.mtime_ns, previous.size) == (path, stat.st_mtime_ns, stat.st_size):
+                    continue
+                try:
+                    digest = content_hash(path)
+                except FileNotFoundError:
+                    continue  # replaced between stat and read; the next scan picks it up
+                self._states[name] = FileState(path, stat.st_mtime_ns, stat.st_size, digest)
+                if previous is None or previous.digest != digest:
+                    changed.add(name)
+            removed = set(self._states) - names
+            for name in removed:
+                del self._states[name]
+            if changed or removed:
+                self.version += 1
+                self.last_changes = (changed, removed)
+        return changed, removed
+
+    def digests(self) -> dict:
+        """Current `{table: content hash}` (scans first, so the answer is never stale)."""
+        self.scan()
+        with self._lock:
+            return {name: state.digest for name, state in self._states.items()}
+
+    # --- file watching ---
+    @property
+    def watching(self) -> bool:
+        """True while a watchdog observer keeps the registry current; otherwise callers should `scan()`."""
+        return self._observer is not None and self._observer.is_alive()
+
+    def _schedule_scan(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(DEBOUNCE_SECONDS, self.scan)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def watch(self) -> bool:
+        """Start a watchdog observer on the folder; returns False when watching is unavailable."""
+        if self._observer is not None:
+            return True
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return False
+
+        registry = self
+        suffixes = tuple(SUFFIXES.values())
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                paths = (getattr(event, "src_path", ""), getattr(event, "dest_path", ""))
+                if not event.is_directory and any(str(p).endswith(suffixes) for p in paths):
+                    registry._schedule_scan()
+
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+            observer = Observer()
+            observer.schedule(_Handler(), self.data_dir, recursive=False)
+            observer.daemon = True
+            observer.start()
+        except OSError:
+            return False  # e.g. inotify watch limit reached; scans on access still keep data fresh
+        self._observer = observer
+        return True
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(data_dir: str) -> TableRegistry:
+    """One watched registry per data folder, shared by all sessions."""
+    key = os.path.abspath(data_dir)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = TableRegistry(data_dir)
+            registry.scan()
+            registry.watch()
+    return registry
@@ -1,74 +1,430 @@
-
 import pandas as pd
 import sqlite3
 import re, os
-import seaborn as sns
-import matplotlib.pyplot as plt
-from google import genai
-from dotenv import load_dotenv
-load_dotenv()
-
-LLM_MODEL = os.getenv('LLM_MODEL')
+import io
+import csv
+import hashlib
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.llm_client_service import generate_text
+from utils.sql_cache_service import sql_cache, schema_fingerprint
+from utils.schema_service import sqlite_create_table
+from utils.index_service import create_ddl_indexes, index_advisor, table_aliases
+from utils.table_registry_service import get_registry
+from utils.tracing_service import span
+from utils.storage_service import SUFFIXES, read_table, list_tables as list_data_tables
 
 # ---------------------------
-# 📦 Load CSV Data
+# 📦 Load Data
 # ---------------------------
-def load_csv_data(data_path: str) -> dict:
-    """Load all CSV files from the data folder as pandas DataFrames."""
-    tables = {}
-    for file in os.listdir(data_path):
-        if file.endswith(".csv"):
-            name = file.replace(".csv", "")
-            tables[name] = pd.read_csv(f"{data_path}/{file}")
-    return tables
+def load_csv_data(data_path: str, schema=None) -> dict:
+    """Load all tables from the data folder as pandas DataFrames (typed by the schema if given)."""
+    return {
+        name: read_table(data_path, name, table=schema.find(name) if schema else None)
+        for name in list_data_tables(data_path)
+    }
 
 
 # ---------------------------
 # 🧩 Create SQLite Database
 # ---------------------------
-def initialize_database(tables: dict):
+def _sqlite_ready(df: pd.DataFrame, table=None) -> pd.DataFrame:
+    """Store parsed dates as ISO text, the form SQLite date functions expect."""
+    date_cols = [column for column in df.columns if pd.api.types.is_datetime64_any_dtype(df[column])]
+    if not date_cols:
+        return df
+    df = df.copy()
+    for column in date_cols:
+        declared = table.column(column) if table else None
+        fmt = "%Y-%m-%d" if declared is None or declared.base_type == "DATE" else "%Y-%m-%d %H:%M:%S"
+        df[column] = df[column].dt.strftime(fmt)
+    return df
+
+
+def write_table(conn, name: str, df: pd.DataFrame, table=None):
+    """Create a typed SQLite table (DDL affinities + PRIMARY KEY) and bulk insert the frame."""
+    df = _sqlite_ready(df, table)
+    for primary_key in (True, False):
+        conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        conn.execute(sqlite_create_table(name, table, list(df.columns), primary_key))
+        try:
+            df.to_sql(name, conn, index=False, if_exists="append", chunksize=50_000)
+            return
+        except sqlite3.IntegrityError:
+            # Generated data violates the declared key: keep the rows, drop the constraint
+            continue
+
+
+def initialize_database(tables: dict, schema=None):
     """Create an in-memory SQLite DB from given pandas DataFrames."""
     conn = sqlite3.connect(":memory:")
     for name, df in tables.items():
-        df.to_sql(name, conn, index=False, if_exists="replace")
+        write_table(conn, name, df, schema.find(name) if schema else None)
+    create_ddl_indexes(conn, schema)
+    conn.execute("ANALYZE")
     return conn
 
 
+# ---------------------------
+# 🗄️ Shared SQLite Data Store
+# ---------------------------
+DB_PATH = os.getenv("TTYD_DB_PATH", os.path.join(".cache", "talk_to_your_data.sqlite"))
+_db_lock = threading.Lock()
+
+
+def data_fingerprint(data_path: str) -> str:
+    """Hash name, size and mtime of every data file to detect changes cheaply."""
+    digest = hashlib.sha1()
+    for file in sorted(os.listdir(data_path)):
+        if file.endswith(tuple(SUFFIXES.values())):
+            stat = os.stat(os.path.join(data_path, file))
+            digest.update(f"{file}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+def _stored_meta(db_path: str) -> dict:
+    """Return the `_meta` entries (fingerprint, schema and per-table content hashes), if any."""
+    if not os.path.exists(db_path):
+        return {}
+    try:
+        with closing(connect_database(db_path)) as conn:
+            return dict(conn.execute("SELECT key, value FROM _meta").fetchall())
+    except sqlite3.Error:
+        return {}
+
+
+def _folder_fingerprint(data_path: str, schema=None) -> str:
+    return data_fingerprint(data_path) + (f":{schema.digest}" if schema else "")
+
+
+def _load_into(conn, data_path: str, name: str, schema=None):
+    table = schema.find(name) if schema else None
+    write_table(conn, name, read_table(data_path, name, table=table), table)
+
+
+def _build_database(data_path: str, db_path: str, schema, digests: dict):
+    """Full build into a temp file, swapped in atomically."""
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with closing(sqlite3.connect(tmp_path)) as conn:
+        for name in digests:
+            _load_into(conn, data_path, name, schema)
+        # Index declared keys and the columns earlier queries kept scanning, then gather statistics
+        create_ddl_indexes(conn, schema)
+        index_advisor.apply(conn)
+        conn.execute("ANALYZE")
+        # Loading may have added Arrow copies of CSV-only tables; record the folder as it is now
+        conn.execute("CREATE TABLE _meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.executemany("INSERT INTO _meta VALUES (?, ?)", [
+            ("fingerprint", _folder_fingerprint(data_path, schema)),
+            ("schema", schema.digest if schema else ""),
+            *((f"table:{name}", digest) for name, digest in digests.items()),
+        ])
+        conn.commit()
+    # Atomic swap: open readers keep the old file until they reconnect
+    os.replace(tmp_path, db_path)
+
+
+def _update_database(data_path: str, db_path: str, schema, changed: list, removed: list, digests: dict):
+    """Reload only `changed` tables and drop `removed` ones in a backup copy, swapped in atomically."""
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as source, closing(sqlite3.connect(tmp_path)) as conn:
+        source.backup(conn)
+        for name in [*changed, *removed]:
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        for name in changed:
+            _load_into(conn, data_path, name, schema)
+        create_ddl_indexes(conn, schema, tables=changed)
+        index_advisor.apply(conn)
+        for name in changed:
+            conn.execute(f'ANALYZE "{name}"')
+        conn.executemany("DELETE FROM _meta WHERE key = ?", [(f"table:{name}",) for name in removed])
+        conn.executemany("INSERT OR REPLACE INTO _meta VALUES (?, ?)", [
+            ("fingerprint", _folder_fingerprint(data_path, schema)),
+            *((f"table:{name}", digests[name]) for name in changed),
+        ])
+        conn.commit()
+    os.replace(tmp_path, db_path)
+
+
+def _build_learned_indexes(db_path: str, pairs: list):
+    """Build newly learned indexes into a copy of the database on a background thread and swap it in."""
+    pairs = index_advisor.claim(db_path, pairs)
+    if not pairs:
+        return
+
+    def build():
+        tmp_path = f"{db_path}.{os.getpid()}.index.tmp"
+        try:
+            with _db_lock:  # so a concurrent rebuild cannot swap the new indexes away
+                if not os.path.exists(db_path):
+                    return
+                with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as source, \
+                        closing(sqlite3.connect(tmp_path)) as conn:
+                    source.backup(conn)
+                    created = index_advisor.apply(conn, pairs)
+                    conn.commit()
+                if created:
+                    os.replace(tmp_path, db_path)
+        except sqlite3.Error:
+            pass  # the pairs stay learned and are applied by the next build or update
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            index_advisor.release(db_path, pairs)
+
+    threading.Thread(target=build, name="index-builder", daemon=True).start()
+
+
+def materialize_database(data_path: str, db_path: str = DB_PATH, schema=None) -> str:
+    """Keep the shared on-disk SQLite file in sync with data/.
+
+    Builds it fully on first use or when the schema changes; otherwise reloads only the
+    tables whose content hash changed (a touched but identical file reloads nothing).
+    """
+    with _db_lock:
+        stored = _stored_meta(db_path)
+        if stored.get("fingerprint") == _folder_fingerprint(data_path, schema):
+            return db_path
+
+        digests = get_registry(data_path).digests()
+        if not stored or stored.get("schema") != (schema.digest if schema else ""):
+            _build_database(data_path, db_path, schema, digests)
+            return db_path
+
+        known = {key[len("table:"):]: value for key, value in stored.items() if key.startswith("table:")}
+        changed = [name for name, digest in digests.items() if known.get(name) != digest]
+        removed = [name for name in known if name not in digests]
+        _update_database(data_path, db_path, schema, changed, removed, digests)
+    return db_path
+
+
+class DatabaseConnection(sqlite3.Connection):
+    """sqlite3 connection that remembers its file, so learned indexes can be built on it."""
+
+    db_path = None
+
+
+def connect_database(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """Open a read-only connection to the shared SQLite file (reads only, enforced by an authorizer)."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False, factory=DatabaseConnection)
+    conn.db_path = db_path
+    conn.set_authorizer(_read_only_authorizer)
+    return conn
+
+
+class ThreadConnections:
+    """One read-only connection per thread, reopened when the data version (and so the file) changes."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self, db_path: str, version: str = "") -> sqlite3.Connection:
+        cached = getattr(self._local, "conn", None)
+        if cached is None or cached[0] != (db_path, version):
+            if cached is not None:
+                cached[1].close()
+            cached = self._local.conn = ((db_path, version), connect_database(db_path))
+        return cached[1]
+
+
+def list_tables(conn) -> list:
+    """Return the user table names stored in the database."""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE '\\_%' ESCAPE '\\' "
+        "AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' ORDER BY name"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
 # ---------------------------
 # 🧠 SQL Guardrails
 # ---------------------------
-def is_safe_query(sql: str) -> bool:
-    """Block dangerous SQL commands."""
-    forbidden = ["drop", "delete", "update", "insert", "alter", "system", "schema"]
-    return not any(re.search(rf"\b{kw}\b", sql.lower()) for kw in forbidden)
+# Everything a SELECT needs; writes, DDL, PRAGMA, ATTACH and transactions are denied at prepare time
+_READ_ACTIONS = {sqlite3.SQLITE_READ, sqlite3.SQLITE_SELECT, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+
+def _read_only_authorizer(action, arg1, arg2, db_name, trigger):
+    return sqlite3.SQLITE_OK if action in _READ_ACTIONS else sqlite3.SQLITE_DENY
+
+
+# ---------------------------
+# 🛑 Query Governor
+# ---------------------------
+QUERY_TIMEOUT = float(os.getenv("TTYD_QUERY_TIMEOUT", "15"))
+QUERY_MAX_STEPS = int(os.getenv("TTYD_QUERY_MAX_STEPS", "500000000"))
+MAX_CROSS_JOIN_ROWS = int(os.getenv("TTYD_MAX_CROSS_JOIN_ROWS", "50000000"))
+PROGRESS_INTERVAL = 10_000
+QUERY_WORKERS = int(os.getenv("TTYD_QUERY_WORKERS", "4"))
+
+
+class QueryRejected(Exception):
+    """Raised when a query exceeds its budget, is cancelled, or its plan is too expensive to run."""
+
+
+class QueryBudget:
+    """Wall-clock and VM-step budget for one query, checked by SQLite's progress handler.
+
+    `cancel()` may be called from any thread; the running statement stops at the next check.
+    """
+
+    def __init__(self, timeout: float = QUERY_TIMEOUT, max_steps: int = QUERY_MAX_STEPS):
+        self.timeout, self.max_steps = timeout, max_steps
+        self.steps = 0
+        self.started = None
+        self.reason = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def __call__(self):
+        self.steps += PROGRESS_INTERVAL
+        if self._cancelled.is_set():
+            self.reason = "cancelled"
+        elif self.timeout and time.monotonic() - self.started > self.timeout:
+            self.reason = f"took longer than {self.timeout:g}s"
+        elif self.max_steps and self.steps > self.max_steps:
+            self.reason = f"exceeded {self.max_steps:,} VM steps"
+        return 1 if self.reason else 0
+
+
+@contextmanager
+def governed(conn, budget: QueryBudget = None):
+    """Run statements on `conn` under a budget; an interrupted statement raises `QueryRejected`."""
+    budget = budget or QueryBudget()
+    budget.started = time.monotonic()
+    conn.set_progress_handler(budget, PROGRESS_INTERVAL)
+    try:
+        yield budget
+    except sqlite3.OperationalError as e:
+        if budget.reason:
+            raise QueryRejected(f"Query stopped: {budget.reason}.") from e
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+def _table_rows(conn, table: str) -> int:
+    """Row count from the `ANALYZE` statistics, falling back to COUNT(*) for tables without any."""
+    try:
+        row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table,)).fetchone()
+    except sqlite3.OperationalError:  # never analyzed
+        row = None
+    if row and row[0]:
+        return int(row[0].split()[0])
+    return conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+
+def query_plan(sql_query: str, conn) -> list:
+    return conn.execute(f"EXPLAIN QUERY PLAN {clean_sql(sql_query)}").fetchall()
+
+
+def table_columns(conn) -> dict:
+    """Column names per user table (via an empty SELECT, which the read-only authorizer allows)."""
+    columns = {}
+    for table in list_tables(conn):
+        with closing(conn.execute(f'SELECT * FROM "{table}" LIMIT 0')) as cursor:
+            columns[table] = {d[0] for d in cursor.description}
+    return columns
+
+
+def check_query_plan(sql_query: str, conn, max_cross_rows: int = MAX_CROSS_JOIN_ROWS, plan: list = None) -> list:
+    """Inspect `EXPLAIN QUERY PLAN` before running a query.
+
+    Two or more full table scans in the same loop nest mean a nested-loop cross join; it is
+    rejected when the product of the scanned tables' row counts exceeds `max_cross_rows`,
+    otherwise a warning is returned.
+    """
+    plan = plan if plan is not None else query_plan(sql_query, conn)
+    tables = list_tables(conn)
+    aliases = table_aliases(sql_query, tables)
+
+    scans = {}
+    for _, parent, _, detail in plan:
+        match = re.match(r"SCAN (\w+)", detail)
+        if match and not detail.startswith("SCAN CONSTANT"):
+            scans.setdefault(parent, []).append(match.group(1))
+
+    warnings = []
+    for scanned in scans.values():
+        if len(scanned) < 2:
+            continue
+        known = [aliases.get(name.lower()) for name in scanned]
+        # Unknown names are CTEs/subqueries: assume they are as large as the largest table
+        largest = max((_table_rows(conn, t) for t in tables), default=0)
+        estimate = 1
+        for table in known:
+            estimate *= _table_rows(conn, table) if table else largest
+        message = f"full-scan cross join of {', '.join(scanned)} (~{estimate:,} row combinations)"
+        if estimate > max_cross_rows:
+            raise QueryRejected(f"Query rejected: {message}. Add a join condition or a filter.")
+        warnings.append(message)
+    return warnings
+
+
+_query_pool = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="sql-query")
+
+
+def submit_query(fn, *args, **kwargs):
+    """Run a query function on the bounded worker pool, so heavy queries cannot take every core."""
+    # Run in a copy of the caller's context so the query's spans land in the caller's trace
+    return _query_pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
 
 
 # ---------------------------
 # 🤖 Generate SQL via Gemini
 # ---------------------------
-def generate_sql_from_prompt(prompt: str, tables: dict, ddl_schema: str):
-    """Convert natural language question → SQL query using Gemini."""
+def generate_sql_from_prompt(prompt: str, tables, ddl_schema: str, data_version: str = "",
+                             schema_index=None, info: dict = None, use_cache: bool = True):
+    """Convert natural language question → SQL query using Gemini (cached per schema/data version).
+
+    With a `schema_index`, only the relevant table definitions go into the prompt; pruning
+    details are written to `info["schema_selection"]` when a dict is passed. `use_cache=False`
+    skips the lookup and asks the model again, but the answer still replaces the cached one.
+    """
     try:
-        client = genai.Client()
-        available_tables = ", ".join(tables.keys())
-        schema_section = f"\n\nHere is the SQL schema for your database:\n{ddl_schema}\n" if ddl_schema else ""
-        llm_prompt = f"""
+        with span("sql_cache_lookup") as s:
+            fingerprint = schema_fingerprint(ddl_schema, tables, data_version)
+            cached_sql = sql_cache.get(prompt, fingerprint) if use_cache else None
+            s.set(cache_hit=bool(cached_sql), skipped=not use_cache)
+        if cached_sql:
+            return cached_sql, None
+
+        available_tables = ", ".join(tables)
+        if schema_index is not None and ddl_schema:
+            with span("schema_selection") as s:
+                selection = schema_index.select(prompt)
+                s.set(tables=len(selection.tables), pruned=selection.pruned)
+            if info is not None:
+                info["schema_selection"] = selection
+            if selection.pruned:
+                available_tables = ", ".join(selection.tables)
+                ddl_schema = selection.ddl
+        with span("prompt_build") as s:
+            schema_section = f"\n\nHere is the SQL schema for your database:\n{ddl_schema}\n" if ddl_schema else ""
+            llm_prompt = f"""
             Convert this question into a valid SQLite SQL query.
             Only use these tables: {available_tables}.
             {schema_section}
             Avoid destructive queries. Make sure to complete the full query always.
             Question: {prompt}
         """
-        response = client.models.generate_content(
-            model=LLM_MODEL,
-            contents=llm_prompt,
-            config={"temperature": 0.3, "max_output_tokens": 500},
-        )
-        sql_query = response.text.strip() if response and response.text else ""
-
-        if not is_safe_query(sql_query):
-            return None, "⚠️ Unsafe query detected — blocked for safety."
+            s.set(prompt_chars=len(llm_prompt))
+        response_text = generate_text(llm_prompt, config={"temperature": 0.3, "max_output_tokens": 500})
+        sql_query = response_text.strip() if response_text else ""
 
+        if sql_query:
+            sql_cache.put(prompt, fingerprint, sql_query)
         return sql_query, None
     except Exception as e:
         import traceback
@@ -79,19 +435,64 @@ def generate_sql_from_prompt(prompt: str, tables: dict, ddl_schema: str):
 # ---------------------------
 # 🧮 Execute SQL on SQLite
 # ---------------------------
-def execute_sql_query(sql_query: str, conn):
-    """Execute SQL safely and return DataFrame result."""
+ROW_CAP = int(os.getenv("TTYD_ROW_CAP", "10000"))
+FETCH_SIZE = 1000
+PAGE_SIZE = 50
+EXPORT_TIMEOUT = float(os.getenv("TTYD_EXPORT_TIMEOUT", "300"))
+
+
+def _unique_columns(columns: list) -> list:
+    """Suffix repeated result column names (`SELECT *` over joins), which Arrow/Parquet cannot store."""
+    seen, unique = {}, []
+    for column in columns:
+        seen[column] = seen.get(column, 0) + 1
+        unique.append(column if seen[column] == 1 else f"{column}:{seen[column] - 1}")
+    return unique
+
+
+def _fetch_frame(cursor, max_rows: int):
+    """Fetch at most `max_rows` rows in batches; report whether more rows were left behind."""
+    columns = _unique_columns([d[0] for d in cursor.description or []])
+    rows = []
+    while len(rows) < max_rows:
+        batch = cursor.fetchmany(min(FETCH_SIZE, max_rows - len(rows)))
+        if not batch:
+            return pd.DataFrame.from_records(rows, columns=columns), False
+        rows.extend(batch)
+    return pd.DataFrame.from_records(rows, columns=columns), cursor.fetchone() is not None
+
+
+def execute_sql_query(sql_query: str, conn, max_rows: int = ROW_CAP, budget: QueryBudget = None):
+    """Execute SQL safely and return DataFrame result (at most `max_rows` rows).
+
+    The plan is checked first and execution runs under `budget` (time/VM steps, cancellable).
+    When rows were cut off, `df.attrs["truncated"]` is True; use `fetch_page`/`count_rows` for the rest.
+    Plan warnings are listed in `df.attrs["warnings"]`.
+    """
     try:
         if not sql_query or not isinstance(sql_query, str) or not sql_query.strip():
             return None, "SQL Execution Error: No valid SQL query provided."
         # Clean SQL before execution
-        raw_sql = clean_sql(sql_query)
+        with span("clean_sql"):
+            raw_sql = clean_sql(sql_query)
         if not raw_sql:
             return None, "SQL Execution Error: Cleaned SQL query is empty."
-        df = pd.read_sql_query(raw_sql, conn)
+        with governed(conn, budget):
+            with span("plan_check") as s:
+                plan = query_plan(raw_sql, conn)
+                warnings = check_query_plan(raw_sql, conn, plan=plan)
+                s.set(warnings=len(warnings))
+            with span("sqlite_exec") as s, closing(conn.execute(raw_sql)) as cursor:
+                df, truncated = _fetch_frame(cursor, max_rows)
+                s.set(rows=len(df), truncated=truncated)
+        # Count the columns this plan had to scan; frequent ones get an index in the background
+        with span("index_advisor"):
+            ready = index_advisor.observe(raw_sql, plan, table_columns(conn))
+            if ready and getattr(conn, "db_path", None):
+                _build_learned_indexes(conn.db_path, ready)
 
-        if df is None:
-            return None, "SQL Execution Error: Query returned no results."
+        df.attrs["truncated"] = truncated
+        df.attrs["warnings"] = warnings
 
         # # Optional: mask PII (emails)
         # df = df.replace(
@@ -100,10 +501,98 @@ def execute_sql_query(sql_query: str, conn):
         #     regex=True
         # )
         return df, None
+    except QueryRejected as e:
+        return None, f"⛔ {e}"
     except Exception as e:
         return None, f"SQL Execution Error: {e}"
 
 
+def as_subquery(sql_query: str) -> str:
+    """The cleaned query without its trailing `;`, ready to wrap in `SELECT ... FROM (...)` or a CTE."""
+    return clean_sql(sql_query).rstrip().rstrip(";")
+
+
+def fetch_page(sql_query: str, conn, page: int = 0, page_size: int = PAGE_SIZE, budget: QueryBudget = None) -> pd.DataFrame:
+    """Run the query for one page of rows only (LIMIT/OFFSET pushed into SQLite)."""
+    with governed(conn, budget), closing(conn.execute(
+        f"SELECT * FROM ({as_subquery(sql_query)}) LIMIT ? OFFSET ?", (int(page_size), int(page) * int(page_size))
+    )) as cursor:
+        return _fetch_frame(cursor, page_size)[0]
+
+
+def count_rows(sql_query: str, conn, budget: QueryBudget = None) -> int:
+    """Exact number of rows the query returns, counted inside SQLite without fetching them."""
+    with governed(conn, budget):
+        return conn.execute(f"SELECT COUNT(*) FROM ({as_subquery(sql_query)})").fetchone()[0]
+
+
+# SQLite storage classes by precedence, for typing result columns the first export chunk left all NULL
+_STORAGE_TYPES = {1: pa.int64(), 2: pa.float64(), 3: pa.string(), 4: pa.binary()}
+_STORAGE_RANK = "CASE typeof({}) WHEN 'integer' THEN 1 WHEN 'real' THEN 2 WHEN 'text' THEN 3 WHEN 'blob' THEN 4 ELSE 0 END"
+
+
+def _export_schema(sql_query: str, conn, schema: pa.Schema) -> pa.Schema:
+    """`schema` with its NULL-typed columns typed by the values the rest of the result holds (one extra pass)."""
+    unknown = [i for i, field in enumerate(schema) if pa.types.is_null(field.type)]
+    if not unknown:
+        return schema
+    names = ", ".join(f"c{i}" for i in range(len(schema)))
+    ranks = ", ".join(f"MAX({_STORAGE_RANK.format(f'c{i}')})" for i in unknown)
+    row = conn.execute(f"WITH r({names}) AS ({as_subquery(sql_query)}) SELECT {ranks} FROM r").fetchone()
+    for i, rank in zip(unknown, row):
+        if rank:
+            schema = schema.set(i, schema.field(i).with_type(_STORAGE_TYPES[rank]))
+    return schema
+
+
+def export_query(sql_query: str, conn, file, fmt: str = "csv", chunk_size: int = FETCH_SIZE * 10,
+                 budget: QueryBudget = None) -> int:
+    """Stream every result row from the cursor into `file` as CSV or Parquet; returns the row count.
+
+    Exports are long by nature, so the default budget only has a (longer) time limit.
+    """
+    budget = budget or QueryBudget(timeout=EXPORT_TIMEOUT, max_steps=0)
+    with governed(conn, budget), closing(conn.execute(clean_sql(sql_query))) as cursor:
+        columns = [d[0] for d in cursor.description or []]
+        if fmt == "csv":
+            # Raw SQLite values, so a chunk with NULLs does not turn its ints into floats
+            text = file if isinstance(file, io.TextIOBase) else io.TextIOWrapper(file, encoding="utf-8", newline="")
+            writer = csv.writer(text, lineterminator="\n")
+            writer.writerow(columns)
+            total = 0
+            while batch := cursor.fetchmany(chunk_size):
+                writer.writerows(batch)
+                total += len(batch)
+            text.flush()
+            if text is not file:
+                text.detach()
+            return total
+
+        writer, total = None, 0
+        try:
+            while True:
+                batch = cursor.fetchmany(chunk_size)
+                if writer is not None and not batch:
+                    break
+                arrow_chunk = pa.Table.from_pandas(
+                    pd.DataFrame.from_records(batch, columns=_unique_columns(columns)), preserve_index=False
+                )
+                if writer is None:
+                    schema = arrow_chunk.schema
+                    if len(batch) == chunk_size:  # a short first chunk is the whole result, its types are final
+                        schema = _export_schema(sql_query, conn, schema)
+                    writer = pq.ParquetWriter(file, schema)
+                if batch:
+                    writer.write_table(arrow_chunk.cast(writer.schema))
+                    total += len(batch)
+                if len(batch) < chunk_size:
+                    break
+        finally:
+            if writer is not None:
+                writer.close()
+    return total
+
+
 # ---------------------------
 # 📊 Visualization Logic
 # ---------------------------
@@ -112,18 +601,7 @@ def detect_visualization_request(prompt: str) -> bool:
     keywords = ["plot", "chart", "graph", "visualize", "bar", "line"]
     return any(word in prompt.lower() for word in keywords)
 
-def plot_result(result_df: pd.DataFrame):
-    """Plot result using Seaborn if suitable columns exist."""
-    try:
-        if result_df.shape[1] < 2: return None
-
-        fig, ax = plt.subplots(figsize=(6, 4))
-        sns.barplot(x=result_df.columns[0], y=result_df.columns[1], data=result_df, ax=ax)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        return fig
-    except Exception:
-        return None
+# Charts are built by utils/visualization_service.py (aggregated in SQLite, drawn with Vega-Lite)
 
 # ---------------------------
 # 🧹 Clean SQL
@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from logging.handlers import RotatingFileHandler
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", os.path.join(".cache", "traces.jsonl"))
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(5 * 2**20)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "3"))
+METRICS_PATH = os.getenv("METRICS_PATH", os.path.join(".cache", "metrics.prom"))
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def estimate_tokens(text) -> int:
+    """Rough token count (~4 characters per token) when the backend reports no usage."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+# ---------------------------
+# ⏱️ Spans and Traces
+# ---------------------------
+class Span:
+    """One timed stage; attributes (row counts, tokens, cache hits...) are added with `set`."""
+
+    __slots__ = ("name", "parent", "start", "duration_ms", "attrs", "_trace", "_token")
+
+    def __init__(self, trace, name: str, attrs: dict):
+        self._trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+        self.start = self.duration_ms = 0.0
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def default(self, **attrs):
+        """Set attributes the code inside the span did not already set (e.g. estimated tokens)."""
+        for key, value in attrs.items():
+            self.attrs.setdefault(key, value)
+        return self
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.parent = parent.name if parent is not None else None
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self._trace.spans.append(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "parent": self.parent,
+            "offset_ms": round((self.start - self._trace.start) * 1000, 2),
+            "duration_ms": round(self.duration_ms, 2),
+            **self.attrs,
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is off or no trace is active: entering and `set` do nothing."""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        return self
+
+    def default(self, **attrs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Trace:
+    """All spans recorded for one request (a chat message, a generation, a modification)."""
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.spans = []
+        self.start = 0.0
+        self.duration_ms = 0.0
+        self.finished = None
+        self._tokens = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._tokens = (_current_trace.set(self), _current_span.set(None))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+        self.finished = time.time()
+        _current_trace.reset(self._tokens[0])
+        _current_span.reset(self._tokens[1])
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _finish(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "trace": self.name,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.finished)),
+            "duration_ms": round(self.duration_ms, 2),
+            **self.attrs,
+            "spans": sorted((span.to_dict() for span in self.spans), key=lambda s: s["offset_ms"]),
+        }
+
+
+def start_trace(name: str, **attrs):
+    """Open a trace for one request; spans opened inside it (also in threads/tasks it starts) attach to it."""
+    return Trace(name, attrs) if TRACING_ENABLED else _NOOP
+
+
+def span(name: str, **attrs):
+    """Time a stage of the current trace; a no-op when tracing is off or no trace is active."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP
+    return Span(trace, name, attrs)
+
+
+def current_span():
+    """The innermost open span (or a no-op), to attach attributes from deeper code."""
+    return _current_span.get() or _NOOP
+
+
+def record_span(name: str, started: float, **attrs):
+    """Add an already finished stage (started at `perf_counter()` time `started`), e.g. a consumed stream."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    finished = Span(trace, name, attrs)
+    parent = _current_span.get()
+    finished.parent = parent.name if parent is not None else None
+    finished.start = started
+    finished.duration_ms = (time.perf_counter() - started) * 1000
+    trace.spans.append(finished)
+
+
+def performance_rows(trace: dict) -> list:
+    """Flatten a trace dict into table rows for a "Performance" panel."""
+    rows = []
+    for s in trace.get("spans", []):
+        details = {k: v for k, v in s.items() if k not in ("name", "parent", "offset_ms", "duration_ms")}
+        rows.append({
+            "stage": s["name"] if not s["parent"] else f"{s['parent']} › {s['name']}",
+            "start (ms)": s["offset_ms"],
+            "duration (ms)": s["duration_ms"],
+            "details": ", ".join(f"{k}={v}" for k, v in details.items()),
+        })
+    return rows
+
+
+def show_performance(trace: dict):
+    """Collapsible per-stage timings (tokens, rows, cache hits, saves) of one run, for the Streamlit pages."""
+    import streamlit as st  # only the pages need it; the server and scripts do not
+    with st.expander(f"⏱️ Performance ({trace['duration_ms']:,.0f} ms)"):
+        st.dataframe(performance_rows(trace), hide_index=True)
+
+
+# ---------------------------
+# 📈 Counters and Export
+# ---------------------------
+_counters = {}
+_counters_lock = threading.Lock()
+_COUNTED_ATTRS = {
+    "prompt_tokens": "llm_prompt_tokens_total",
+    "response_tokens": "llm_response_tokens_total",
+    "rows": "rows_total",
+}
+
+
+def increment(metric: str, value: float = 1, **labels):
+    """Add to a Prometheus-style counter."""
+    key = (metric, tuple(sorted(labels.items())))
+    with _counters_lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def prometheus_text() -> str:
+    """All counters in the Prometheus text exposition format."""
+    with _counters_lock:
+        items = sorted(_counters.items())
+    lines, typed = [], set()
+    for (metric, labels), value in items:
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+        lines.append(f"{metric}{{{label_text}}} {value:g}" if label_text else f"{metric} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def _trace_logger() -> logging.Logger:
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                os.makedirs(os.path.dirname(TRACE_LOG_PATH) or ".", exist_ok=True)
+                handler = RotatingFileHandler(TRACE_LOG_PATH, maxBytes=TRACE_LOG_MAX_BYTES,
+                                              backupCount=TRACE_LOG_BACKUPS, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger = logging.getLogger("genai_course.traces")
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                logger.addHandler(handler)
+                _logger = logger
+    return _logger
+
+
+_pending = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _write_files():
+    """Background writer: append queued traces to the JSONL log, then rewrite the metrics file once."""
+    while True:
+        items = [_pending.get()]
+        while True:
+            try:
+                items.append(_pending.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            logger = _trace_logger()
+            for item in items:
+                if isinstance(item, Trace):
+                    logger.info(json.dumps(item.to_dict(), default=str))
+            tmp_path = f"{METRICS_PATH}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(prometheus_text())
+            os.replace(tmp_path, METRICS_PATH)
+        except OSError:
+            pass  # telemetry must never break a request
+        for item in items:
+            if isinstance(item, threading.Event):
+                item.set()
+
+
+def _enqueue(item):
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_write_files, name="trace-writer", daemon=True)
+                _writer.start()
+    _pending.put(item)
+
+
+@atexit.register
+def flush_traces(timeout: float = 2.0):
+    """Wait until the traces finished so far are on disk (runs at exit for short-lived scripts)."""
+    if _writer is None:
+        return
+    done = threading.Event()
+    _enqueue(done)
+    done.wait(timeout)
+
+
+def _finish(trace: Trace):
+    """Update counters and hand the trace to the background writer (log and metrics file)."""
+    increment("traces_total", trace=trace.name)
+    increment("trace_seconds_total", trace.duration_ms / 1000, trace=trace.name)
+    for s in trace.spans:
+        increment("stage_calls_total", stage=s.name)
+        increment("stage_seconds_total", s.duration_ms / 1000, stage=s.name)
+        if "cache_hit" in s.attrs:
+            increment("cache_lookups_total", stage=s.name, result="hit" if s.attrs["cache_hit"] else "miss")
+        for attr, metric in _COUNTED_ATTRS.items():
+            if isinstance(s.attrs.get(attr), (int, float)):
+                increment(metric, s.attrs[attr], stage=s.name)
+    # File writes (and a blocking disk) stay off the request path
+    _enqueue(trace)
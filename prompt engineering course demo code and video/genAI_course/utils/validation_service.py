@@ -0,0 +1,400 @@
+import os
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from utils.schema_service import dependency_waves, INT_TYPES, FLOAT_TYPES, DATE_TYPES
+from utils.tracing_service import span, increment
+
+REPAIR_SEED = int(os.getenv("REPAIR_SEED", "0"))
+
+_KIND_LABELS = {
+    "duplicate_key": "duplicate or missing primary keys",
+    "not_null": "missing values in a NOT NULL column",
+    "unique": "duplicate values in a UNIQUE column",
+    "enum": "values outside the ENUM",
+    "check": "values outside the CHECK range",
+    "orphan": "foreign keys with no parent row",
+}
+
+
+@dataclass
+class Violation:
+    table: str
+    column: str
+    kind: str  # a key of _KIND_LABELS
+    rows: int
+    fix: str = ""  # how repair_tables resolved it ("" when only validated)
+
+    def __str__(self) -> str:
+        text = f"`{self.table}.{self.column}`: {self.rows:,} {_KIND_LABELS[self.kind]}"
+        return f"{text} — {self.fix}" if self.fix else text
+
+
+# ---------------------------
+# 🎭 Vectorized Masks
+# ---------------------------
+# Each mask is a NumPy bool array over the rows of one table; no check loops over rows in Python.
+def _numeric(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series
+    return pd.to_numeric(series.astype(object), errors="coerce")
+
+
+def _null_mask(series: pd.Series) -> np.ndarray:
+    return series.isna().to_numpy(dtype=bool)
+
+
+def _enum_mask(series: pd.Series, column) -> np.ndarray:
+    return (series.notna() & ~series.isin(column.enum_values)).to_numpy(dtype=bool)
+
+
+def _check_mask(series: pd.Series, column) -> np.ndarray:
+    values = _numeric(series)
+    mask = np.zeros(len(series), dtype=bool)
+    if column.check_min is not None:
+        mask |= (values < column.check_min).fillna(False).to_numpy(dtype=bool)
+    if column.check_max is not None:
+        mask |= (values > column.check_max).fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+def _any_null(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """Rows with a NULL in any of `columns` (column by column; a row-wise `any` would transpose mixed frames)."""
+    mask = np.zeros(len(df), dtype=bool)
+    for column in columns:
+        mask |= _null_mask(df[column])
+    return mask
+
+
+def _duplicate_mask(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """Rows repeating an earlier row's key, plus rows with a NULL key part."""
+    keys = df[columns[0]] if len(columns) == 1 else df[columns]
+    return _any_null(df, columns) | keys.duplicated(keep="first").to_numpy(dtype=bool)
+
+
+def _unique_mask(series: pd.Series) -> np.ndarray:
+    return (series.notna() & series.duplicated(keep="first")).to_numpy(dtype=bool)
+
+
+def _parent_keys(parent: pd.DataFrame, ref_columns: list) -> pd.DataFrame:
+    if len(ref_columns) == 1:
+        return parent[ref_columns[0]].dropna().drop_duplicates().to_frame()
+    return parent[ref_columns].dropna().drop_duplicates()
+
+
+def _orphan_mask(df: pd.DataFrame, columns: list, keys: pd.DataFrame) -> np.ndarray:
+    """Rows whose (non-NULL) foreign key matches no parent key: one hash join via `isin`."""
+    present = ~_any_null(df, columns)
+    if len(columns) == 1:
+        values, parents = df[columns[0]], keys.iloc[:, 0]
+        if pd.api.types.is_numeric_dtype(values) != pd.api.types.is_numeric_dtype(parents):
+            # e.g. ids the model returned as strings: compare as numbers
+            values, parents = _numeric(values), _numeric(parents)
+        found = values.isin(parents).to_numpy(dtype=bool)
+    else:
+        found = pd.MultiIndex.from_frame(df[columns]).isin(pd.MultiIndex.from_frame(keys))
+    return present & ~found
+
+
+# ---------------------------
+# 🔍 Validation
+# ---------------------------
+def _resolve(tables: dict, schema) -> dict:
+    """Map schema table names to the keys used in `tables` (names may differ in case)."""
+    resolved = {}
+    for name in tables:
+        table = schema.find(name)
+        if table is not None:
+            resolved[table.name] = name
+    return resolved
+
+
+def _foreign_keys(table, df: pd.DataFrame, tables: dict, resolved: dict):
+    """`(fk, parent_keys)` for each foreign key whose columns and parent table are present."""
+    for fk in table.foreign_keys:
+        parent_name = resolved.get(fk.ref_table)
+        if parent_name is None or not all(c in df for c in fk.columns):
+            continue
+        parent = tables[parent_name]
+        if all(c in parent for c in fk.ref_columns):
+            yield fk, _parent_keys(parent, fk.ref_columns)
+
+
+def _table_violations(table, name: str, df: pd.DataFrame, tables: dict, resolved: dict) -> list:
+    found = []
+
+    def add(column, kind, mask):
+        count = int(np.count_nonzero(mask))
+        if count:
+            found.append(Violation(name, column, kind, count))
+
+    primary_key = [c for c in table.primary_key if c in df]
+    if primary_key:
+        add(", ".join(primary_key), "duplicate_key", _duplicate_mask(df, primary_key))
+    for column in table.columns:
+        if column.name not in df:
+            continue
+        series = df[column.name]
+        if column.not_null and not column.primary_key:
+            add(column.name, "not_null", _null_mask(series))
+        if column.unique and not column.primary_key:
+            add(column.name, "unique", _unique_mask(series))
+        if column.enum_values:
+            add(column.name, "enum", _enum_mask(series, column))
+        if column.check_min is not None or column.check_max is not None:
+            add(column.name, "check", _check_mask(series, column))
+    for fk, keys in _foreign_keys(table, df, tables, resolved):
+        add(", ".join(fk.columns), "orphan", _orphan_mask(df, fk.columns, keys))
+    return found
+
+
+def validate_tables(tables: dict, schema) -> list:
+    """Check every table against the parsed DDL: primary keys, NOT NULL, UNIQUE, ENUM, CHECK and foreign keys.
+
+    `tables` maps table names to DataFrames; tables or columns the schema does not know are
+    skipped, and foreign keys are only checked when the parent table is among `tables`.
+    """
+    resolved = _resolve(tables, schema)
+    violations = []
+    with span("validate_tables", tables=len(resolved)) as s:
+        for table_name, name in resolved.items():
+            violations += _table_violations(schema[table_name], name, tables[name], tables, resolved)
+        s.set(violations=len(violations))
+    return violations
+
+
+# ---------------------------
+# 🩹 Local Repair
+# ---------------------------
+def _default_value(column):
+    """The column's DEFAULT as a Python value, or None for NULL / function defaults."""
+    value = column.default
+    if value is None or value.upper() == "NULL":
+        return None
+    if column.base_type in INT_TYPES | FLOAT_TYPES:
+        try:
+            return float(value) if column.base_type in FLOAT_TYPES else int(float(value))
+        except ValueError:
+            return None
+    if column.base_type in DATE_TYPES:
+        return None  # CURRENT_DATE and friends
+    return value
+
+
+class _TableRepair:
+    """Fixes for one DataFrame, copied on the first change so untouched tables are shared, not copied."""
+
+    def __init__(self, name: str, df: pd.DataFrame, rng):
+        self.name = name
+        self.df = df
+        self.rng = rng
+        self.fixes = []
+        self.touched = set()
+        self._copied = False
+
+    def _writable(self) -> pd.DataFrame:
+        if not self._copied:
+            self.df = self.df.copy()
+            self._copied = True
+        return self.df
+
+    def record(self, column: str, kind: str, rows: int, fix: str):
+        self.fixes.append(Violation(self.name, column, kind, int(rows), fix))
+
+    def assign(self, column: str, mask: np.ndarray, values):
+        df = self._writable()
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+        df.loc[mask, column] = values
+        self.touched.add(column)
+
+    def drop(self, mask: np.ndarray):
+        self.df = self._writable()[~mask].reset_index(drop=True)
+
+    def restore_integers(self, table):
+        """Repaired INT columns get one integer dtype again (ids the model sent as strings, floats from NULLs)."""
+        for name in self.touched:
+            column = table.column(name)
+            series = self.df[name]
+            if column is None or column.base_type not in INT_TYPES or pd.api.types.is_integer_dtype(series):
+                continue
+            values = _numeric(series)
+            if values.notna().sum() == series.notna().sum() and (values.dropna() % 1 == 0).all():
+                self.df[name] = values.astype(np.int64 if values.notna().all() else "Int64")
+
+    def sample(self, values, size: int):
+        values = np.asarray(values)
+        return values[self.rng.integers(0, len(values), size)]
+
+
+def _repair_enum(repair: _TableRepair, column):
+    series = repair.df[column.name]
+    mask = _enum_mask(series, column)
+    bad = int(np.count_nonzero(mask))
+    if not bad:
+        return
+    # Near misses ("full-time ", "FULL-TIME") map back to the declared spelling; the rest are resampled
+    canonical = {str(value).strip().lower(): value for value in column.enum_values}
+    values = series[mask].astype(str).str.strip().str.lower().map(canonical)
+    unmatched = values.isna().to_numpy()
+    if unmatched.any():
+        values[unmatched] = repair.sample(column.enum_values, int(unmatched.sum()))
+    repair.assign(column.name, mask, values.to_numpy(dtype=object))
+    repair.record(column.name, "enum", bad, f"{bad - int(unmatched.sum()):,} case-matched, {int(unmatched.sum()):,} resampled")
+
+
+def _repair_check(repair: _TableRepair, column):
+    mask = _check_mask(repair.df[column.name], column)
+    bad = int(np.count_nonzero(mask))
+    if not bad:
+        return
+    low, high = column.check_min, column.check_max
+    if column.base_type in INT_TYPES:
+        low = None if low is None else np.ceil(low)
+        high = None if high is None else np.floor(high)
+    values = _numeric(repair.df[column.name])[mask].clip(low, high)
+    if column.base_type in INT_TYPES:
+        values = values.round().astype("int64")
+    repair.assign(column.name, mask, values.to_numpy())
+    repair.record(column.name, "check", bad, "clamped to the CHECK range")
+
+
+def _repair_primary_key(repair: _TableRepair, table):
+    columns = [c for c in table.primary_key if c in repair.df]
+    if not columns:
+        return
+    mask = _duplicate_mask(repair.df, columns)
+    bad = int(np.count_nonzero(mask))
+    if not bad:
+        return
+    column = table.column(columns[0])
+    if len(columns) == 1 and column is not None and column.base_type in INT_TYPES:
+        # Integer ids: the first row keeps its id (children point at it), repeats get fresh ones
+        values = _numeric(repair.df[columns[0]])
+        start = int(values[~mask].max()) + 1 if (~mask).any() else 1
+        repair.assign(columns[0], mask, np.arange(start, start + bad, dtype=np.int64))
+        repair.record(columns[0], "duplicate_key", bad, "renumbered")
+    else:
+        repair.drop(mask)
+        repair.record(", ".join(columns), "duplicate_key", bad, "rows dropped")
+
+
+def _repair_foreign_key(repair: _TableRepair, table, fk, keys: pd.DataFrame):
+    columns = fk.columns
+    mask = _orphan_mask(repair.df, columns, keys)
+    orphans = int(np.count_nonzero(mask))
+    required = [c for c in columns if table.column(c) is not None and table.column(c).not_null]
+    if required:
+        # A NULL in a NOT NULL foreign key is repaired the same way as an orphan
+        mask = mask | _any_null(repair.df, required)
+    bad = int(np.count_nonzero(mask))
+    if not bad:
+        return
+    label = ", ".join(columns)
+    if len(keys):
+        picks = keys.iloc[repair.rng.integers(0, len(keys), bad)]
+        for column, ref_column in zip(columns, fk.ref_columns):
+            repair.assign(column, mask, picks[ref_column].to_numpy())
+        fix = f"resampled from {fk.ref_table}"
+    elif not required:
+        for column in columns:
+            repair.assign(column, mask, None)
+        fix = "set to NULL (no parent rows)"
+    else:
+        repair.drop(mask)
+        fix = "rows dropped (no parent rows)"
+    if orphans:
+        repair.record(label, "orphan", orphans, fix)
+    if bad > orphans:
+        repair.record(label, "not_null", bad - orphans, fix)
+
+
+def _repair_not_null(repair: _TableRepair, column):
+    series = repair.df[column.name]
+    mask = _null_mask(series)
+    bad = int(np.count_nonzero(mask))
+    if not bad:
+        return
+    default = _default_value(column)
+    if default is not None:
+        repair.assign(column.name, mask, default)
+        repair.record(column.name, "not_null", bad, f"filled with DEFAULT {column.default}")
+        return
+    present = series[~mask].to_numpy()
+    if len(present):
+        repair.assign(column.name, mask, repair.sample(present, bad))
+        repair.record(column.name, "not_null", bad, "filled from other rows")
+    else:
+        repair.record(column.name, "not_null", bad, "left as is (no value to fill from)")
+
+
+def _repair_unique(repair: _TableRepair, column):
+    series = repair.df[column.name]
+    mask = _unique_mask(series)
+    bad = int(np.count_nonzero(mask))
+    if not bad:
+        return
+    if column.base_type in INT_TYPES:
+        values = _numeric(series)
+        start = int(values.max()) + 1
+        repair.assign(column.name, mask, np.arange(start, start + bad, dtype=np.int64))
+        repair.record(column.name, "unique", bad, "renumbered")
+    elif not column.not_null:
+        repair.assign(column.name, mask, None)
+        repair.record(column.name, "unique", bad, "set to NULL")
+    elif column.base_type in FLOAT_TYPES | DATE_TYPES:
+        repair.record(column.name, "unique", bad, "left as is")
+    else:
+        # Suffix the row number (kept within VARCHAR(n)); "a@x.com" -> "a@x.com_17"
+        rows = pd.Series(np.flatnonzero(mask) + 1, index=series.index[mask]).astype(str)
+        values = series[mask].astype(str) + "_" + rows
+        if column.length:
+            values = values.str[-column.length:]
+        repair.assign(column.name, mask, values.to_numpy(dtype=object))
+        repair.record(column.name, "unique", bad, "row number appended")
+
+
+def repair_tables(tables: dict, schema, seed: int = None) -> tuple:
+    """Fix constraint violations locally (no LLM call) and return `(tables, fixes)`.
+
+    Parents are repaired before their children (FK dependency waves), so orphaned foreign
+    keys are resampled from the final parent keys. Values outside an ENUM are case-matched
+    or resampled, CHECK ranges are clamped, duplicate integer ids are renumbered, NOT NULL
+    gaps take the DEFAULT or a value from another row. Tables without violations are
+    returned as the same objects; `{fix.table for fix in fixes}` are the ones to rewrite.
+    """
+    rng = np.random.default_rng(REPAIR_SEED if seed is None else seed)
+    resolved = _resolve(tables, schema)
+    repaired = dict(tables)
+    fixes = []
+    with span("repair_tables", tables=len(resolved)) as s:
+        for wave in dependency_waves(schema):
+            for table_name in wave:
+                name = resolved.get(table_name)
+                if name is None:
+                    continue
+                table = schema[table_name]
+                repair = _TableRepair(name, repaired[name], rng)
+                present = [column for column in table.columns if column.name in repair.df]
+                for column in present:
+                    if column.enum_values:
+                        _repair_enum(repair, column)
+                    if column.check_min is not None or column.check_max is not None:
+                        _repair_check(repair, column)
+                _repair_primary_key(repair, table)
+                repaired[name] = repair.df  # self-references see this table's own keys
+                for fk, keys in _foreign_keys(table, repair.df, repaired, resolved):
+                    _repair_foreign_key(repair, table, fk, keys)
+                fk_columns = {c for fk in table.foreign_keys for c in fk.columns}
+                for column in present:
+                    if column.not_null and not column.primary_key and column.name not in fk_columns:
+                        _repair_not_null(repair, column)
+                    if column.unique and not column.primary_key:
+                        _repair_unique(repair, column)
+                repair.restore_integers(table)
+                repaired[name] = repair.df
+                fixes += repair.fixes
+        s.set(fixes=len(fixes), rows=sum(f.rows for f in fixes))
+    for fix in fixes:
+        increment("data_repairs_total", fix.rows, kind=fix.kind)
+    return repaired, fixes
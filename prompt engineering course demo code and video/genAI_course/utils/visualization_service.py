@@ -0,0 +1,253 @@
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from dataclasses import dataclass
+import pandas as pd
+import altair as alt
+from utils.talk_to_your_data_service import QueryBudget, governed, as_subquery
+from utils.tracing_service import span
+
+CHART_TOP_N = int(os.getenv("TTYD_CHART_TOP_N", "25"))
+CHART_BINS = int(os.getenv("TTYD_CHART_BINS", "30"))
+CHART_MAX_POINTS = int(os.getenv("TTYD_CHART_MAX_POINTS", "500"))
+CHART_CACHE_SIZE = int(os.getenv("TTYD_CHART_CACHE_SIZE", "128"))
+CHART_TIMEOUT = float(os.getenv("TTYD_CHART_TIMEOUT", "10"))
+
+# y columns whose values should be averaged rather than added when rows are merged; matched
+# against whole name tokens, so "age" hits avg_age but not manager or page_count, and a sum-like
+# token wins (total_salary, salary_sum and employee_count are added up)
+_AVERAGED = {"avg", "average", "mean", "rate", "ratio", "pct", "percent", "percentage", "price", "salary", "score", "age"}
+_SUMMED = {"total", "sum", "count", "cnt", "num"}
+
+
+def _is_averaged(column: str) -> bool:
+    tokens = set(re.findall(r"[a-z]+", re.sub(r"([a-z])([A-Z])", r"\1_\2", column).lower()))
+    return bool(tokens & _AVERAGED) and not tokens & _SUMMED
+
+
+@dataclass
+class ChartSpec:
+    kind: str  # "bar", "count", "line", "histogram" or "scatter"
+    x: str
+    y: str = None
+    aggregate: str = "SUM"
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+# ---------------------------
+# 🔎 Chart Type Inference
+# ---------------------------
+def _is_temporal(series: pd.Series) -> bool:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return True
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return False
+    sample = series.dropna().head(20)
+    if sample.empty or not sample.map(lambda v: isinstance(v, str) and bool(re.match(r"\d{4}-\d{2}-\d{2}", v))).all():
+        return False
+    return pd.to_datetime(sample, errors="coerce", format="ISO8601").notna().all()
+
+
+def _is_category_like(series: pd.Series) -> bool:
+    """Integer codes/ids with few distinct values read better as categories than as a numeric axis."""
+    return (
+        pd.api.types.is_integer_dtype(series)
+        and (series.name.lower().endswith("id") or series.nunique() <= CHART_TOP_N)
+    )
+
+
+def infer_chart(sample: pd.DataFrame):
+    """Pick a chart from the result's column types (a sample of the rows is enough)."""
+    if sample is None or sample.empty:
+        return None
+    temporal, numeric, categorical = [], [], []
+    for column in sample.columns:
+        series = sample[column]
+        if _is_temporal(series):
+            temporal.append(column)
+        elif pd.api.types.is_bool_dtype(series):
+            categorical.append(column)
+        elif pd.api.types.is_numeric_dtype(series):
+            numeric.append(column)
+        else:
+            categorical.append(column)
+
+    def aggregate(column):
+        return "AVG" if _is_averaged(column) else "SUM"
+
+    if temporal and numeric:
+        return ChartSpec("line", temporal[0], numeric[0], aggregate(numeric[0]))
+    if categorical and numeric:
+        return ChartSpec("bar", categorical[0], numeric[0], aggregate(numeric[0]))
+    if len(numeric) >= 2 and _is_category_like(sample[numeric[0]]):
+        return ChartSpec("bar", numeric[0], numeric[1], aggregate(numeric[1]))
+    if len(numeric) >= 2:
+        return ChartSpec("scatter", numeric[0], numeric[1])
+    if numeric:
+        return ChartSpec("histogram", numeric[0])
+    if temporal or categorical:
+        return ChartSpec("count", (categorical or temporal)[0])
+    return None
+
+
+# ---------------------------
+# ⬇️ Aggregation Pushdown
+# ---------------------------
+def chart_query(spec: ChartSpec, sql_query: str) -> str:
+    """Wrap the result query so SQLite returns only the (at most a few hundred) points to draw."""
+    base = f"WITH r AS ({as_subquery(sql_query)})"
+    x = _quote(spec.x)
+    y = _quote(spec.y) if spec.y else None
+    if spec.kind == "bar":
+        return (
+            f"{base} SELECT x, y, COUNT(*) OVER () AS groups FROM "
+            f"(SELECT {x} AS x, {spec.aggregate}({y}) AS y FROM r GROUP BY 1) "
+            f"ORDER BY y DESC LIMIT {CHART_TOP_N}"
+        )
+    if spec.kind == "count":
+        return (
+            f"{base} SELECT x, y, COUNT(*) OVER () AS groups FROM "
+            f"(SELECT {x} AS x, COUNT(*) AS y FROM r GROUP BY 1) "
+            f"ORDER BY y DESC LIMIT {CHART_TOP_N}"
+        )
+    if spec.kind == "histogram":
+        return (
+            f"{base}, b AS (SELECT MIN({x}) AS lo, MAX({x}) AS hi FROM r) "
+            f"SELECT CASE WHEN hi > lo THEN lo + (hi - lo) * bin / {CHART_BINS}.0 ELSE lo END AS x, "
+            f"CASE WHEN hi > lo THEN lo + (hi - lo) * (bin + 1) / {CHART_BINS}.0 ELSE hi END AS x2, y FROM "
+            f"(SELECT CASE WHEN hi > lo THEN MIN(CAST(({x} - lo) * {CHART_BINS} / (hi - lo) AS INTEGER), "
+            f"{CHART_BINS - 1}) ELSE 0 END AS bin, COUNT(*) AS y FROM r, b WHERE {x} IS NOT NULL GROUP BY 1), b "
+            f"ORDER BY 1"
+        )
+    if spec.kind == "line":
+        # Exact points while they fit; otherwise equal-width time buckets averaging the points inside
+        return (
+            f"{base}, g AS (SELECT {x} AS x, {spec.aggregate}({y}) AS y FROM r WHERE {x} IS NOT NULL GROUP BY 1), "
+            f"b AS (SELECT COUNT(*) AS n, MIN(julianday(x)) AS lo, MAX(julianday(x)) AS hi FROM g) "
+            f"SELECT CASE WHEN n <= {CHART_MAX_POINTS} OR hi = lo THEN x ELSE datetime(lo + (hi - lo) * "
+            f"MIN(CAST((julianday(x) - lo) * {CHART_MAX_POINTS} / (hi - lo) AS INTEGER), {CHART_MAX_POINTS - 1}) "
+            f"/ {CHART_MAX_POINTS}.0) END AS x, AVG(y) AS y, MAX(n) AS points FROM g, b GROUP BY 1 ORDER BY 1"
+        )
+    if spec.kind == "scatter":
+        # Random sample; SQLite keeps only the LIMIT rows in its sorter
+        return (
+            f"{base} SELECT {x} AS x, {y} AS y FROM r WHERE {x} IS NOT NULL AND {y} IS NOT NULL "
+            f"ORDER BY random() LIMIT {CHART_MAX_POINTS}"
+        )
+    raise ValueError(f"Unknown chart kind: {spec.kind}")
+
+
+def _chart_data(spec: ChartSpec, sql_query: str, conn, budget: QueryBudget = None):
+    with governed(conn, budget or QueryBudget(timeout=CHART_TIMEOUT)):
+        with closing(conn.execute(chart_query(spec, sql_query))) as cursor:
+            columns = [d[0] for d in cursor.description]
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+
+# ---------------------------
+# 🎨 Rendering (Vega-Lite, drawn in the browser)
+# ---------------------------
+def _chart(spec: ChartSpec, data: pd.DataFrame) -> alt.Chart:
+    y_title = f"{spec.aggregate.lower()}({spec.y})" if spec.y else "count"
+    if spec.kind in ("bar", "count"):
+        data = data.assign(x=data["x"].astype(str))
+        return alt.Chart(data).mark_bar().encode(
+            x=alt.X("x:N", title=spec.x, sort="-y"),
+            y=alt.Y("y:Q", title=y_title),
+            tooltip=[alt.Tooltip("x:N", title=spec.x), alt.Tooltip("y:Q", title=y_title)],
+        )
+    if spec.kind == "histogram":
+        return alt.Chart(data).mark_bar().encode(
+            x=alt.X("x:Q", title=spec.x, bin="binned"),
+            x2="x2:Q",
+            y=alt.Y("y:Q", title="count"),
+        )
+    if spec.kind == "line":
+        return alt.Chart(data).mark_line(point=len(data) <= 50).encode(
+            x=alt.X("x:T", title=spec.x),
+            y=alt.Y("y:Q", title=y_title),
+            tooltip=[alt.Tooltip("x:T", title=spec.x), alt.Tooltip("y:Q", title=y_title)],
+        )
+    return alt.Chart(data).mark_circle(opacity=0.6).encode(
+        x=alt.X("x:Q", title=spec.x),
+        y=alt.Y("y:Q", title=spec.y),
+    )
+
+
+def _caption(spec: ChartSpec, data: pd.DataFrame) -> str:
+    if spec.kind in ("bar", "count") and len(data) and int(data["groups"].iloc[0]) > len(data):
+        return f"Top {len(data)} of {int(data['groups'].iloc[0]):,} {spec.x} values"
+    if spec.kind == "line" and len(data) and int(data["points"].iloc[0]) > len(data):
+        return f"{int(data['points'].iloc[0]):,} points averaged into {len(data)} time buckets"
+    if spec.kind == "scatter" and len(data) >= CHART_MAX_POINTS:
+        return f"Random sample of {len(data)} points"
+    return ""
+
+
+class ChartCache:
+    """Small in-process LRU of rendered chart specs, keyed by SQL + data version."""
+
+    def __init__(self, max_size: int = CHART_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(sql_query: str, data_version: str) -> str:
+        return hashlib.sha1(f"{data_version}:{as_subquery(sql_query)}".encode()).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        return None
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+chart_cache = ChartCache()
+
+
+def build_chart(sql_query: str, conn, sample: pd.DataFrame, data_version: str = "", budget: QueryBudget = None):
+    """Return `(vega_lite_spec, caption)` for a result, or `(None, reason)` when nothing fits a chart.
+
+    `sample` (the capped result already fetched) only decides the chart type; the plotted
+    points are aggregated, binned or sampled by SQLite over the full result.
+    """
+    key = ChartCache.key(sql_query, data_version)
+    with span("chart_cache_lookup") as s:
+        cached = chart_cache.get(key)
+        s.set(cache_hit=cached is not None)
+    if cached is not None:
+        return cached
+
+    with span("chart_infer") as s:
+        spec = infer_chart(sample)
+        s.set(kind=spec.kind if spec else None)
+    if spec is None:
+        return None, "Nothing to plot in this result."
+    with span("chart_query", kind=spec.kind) as s:
+        data = _chart_data(spec, sql_query, conn, budget)
+        s.set(rows=len(data))
+    if data.empty:
+        return None, "The result has no values to plot."
+    with span("chart_render"):
+        result = (_chart(spec, data).properties(height=320).to_dict(), _caption(spec, data))
+    chart_cache.put(key, result)
+    return result